@@ -0,0 +1,147 @@
+from typing import Any, Callable, Iterable
+
+import numpy as np
+
+from braandket import KetSpace, MixedStateTensor, PureStateTensor
+from braandket_synthesis import Apply, CX, Controlled, H, KrausOperation, M, MatrixOperation, Measure, Remapped, \
+    Sequential, ToKraus, ToTensor, X, caching_operators, operators_cache, trait_registry
+
+# a case maps a parameter to a prepared callable, only the callable is timed
+Case = Callable[[Any], Callable[[], Any]]
+
+cases: dict[str, tuple[Case, tuple]] = {}
+
+
+def case(*params: Any) -> Callable[[Case], Case]:
+    def decorator(func: Case) -> Case:
+        cases[func.__name__] = (func, params)
+        return func
+
+    return decorator
+
+
+def qubits(n: int) -> tuple[KetSpace, ...]:
+    return tuple(KetSpace(2, name=f"q{i}") for i in range(n))
+
+
+def random_pure_state(spaces: Iterable[KetSpace], seed: int = 0) -> PureStateTensor:
+    spaces = tuple(spaces)
+    rng = np.random.default_rng(seed)
+    shape = tuple(space.n for space in spaces)
+    values = rng.normal(size=shape) + 1j * rng.normal(size=shape)
+    values /= np.linalg.norm(values)
+    return PureStateTensor(values, spaces, PureStateTensor.of(0, ()).backend)
+
+
+def random_mixed_state(spaces: Iterable[KetSpace], seed: int = 0) -> MixedStateTensor:
+    tensor = random_pure_state(spaces, seed)
+    return MixedStateTensor.of(tensor @ tensor.ct)
+
+
+# dispatch
+
+@case('cached', 'cold')
+def trait_resolution(mode: str):
+    operations = (X(), Controlled(H()), Sequential([X(), H()]), MatrixOperation(np.eye(2)))
+    traits = (Apply, ToTensor, ToKraus, Measure)
+
+    def run():
+        if mode == 'cold':
+            trait_registry.invalidate()
+        for operation in operations:
+            for trait in traits:
+                operation.trait(trait, required=False)
+
+    return run
+
+
+# gate kernels
+
+@case(10, 12, 14, 16, 18, 20, 22, 24)
+def gate_1q(n: int):
+    spaces = qubits(n)
+    tensor = random_pure_state(spaces)
+    apply = H().trait(Apply)
+    return lambda: apply.apply_on_state_tensor(tensor, spaces[n // 2])
+
+
+@case(10, 12, 14, 16, 18, 20, 22, 24)
+def gate_2q(n: int):
+    spaces = qubits(n)
+    tensor = random_pure_state(spaces)
+    apply = MatrixOperation(np.kron(H().matrix, H().matrix)).trait(Apply)
+    return lambda: apply.apply_on_state_tensor(tensor, (spaces[0], spaces[-1]))
+
+
+@case(10, 12, 14, 16, 18, 20, 22, 24)
+def gate_cx(n: int):
+    spaces = qubits(n)
+    tensor = random_pure_state(spaces)
+    apply = CX().trait(Apply)
+    return lambda: apply.apply_on_state_tensor(tensor, (spaces[0], spaces[-1]))
+
+
+# control
+
+@case(1, 2, 3, 4, 5)
+def controlled(k: int):
+    n = 16
+    spaces = qubits(n)
+    tensor = random_pure_state(spaces)
+    apply = Controlled(H(), (1,) * k).trait(Apply)
+    return lambda: apply.apply_on_state_tensor(tensor, (spaces[:k], spaces[-1]))
+
+
+# measurement
+
+@case(1, 2, 4, 8, 12, 16)
+def projective_measurement(m: int):
+    n = 16
+    spaces = qubits(n)
+    tensor = random_pure_state(spaces)
+    measure = M().trait(Measure)
+    return lambda: measure.measure_on_state_tensor(tensor, spaces[:m])
+
+
+# tensors
+
+@case(4, 6, 8)
+def sequential_to_tensor(n: int):
+    spaces = qubits(n)
+    rng = np.random.default_rng(0)
+    steps = []
+    for layer in range(4):
+        for i in range(layer % 2, n - 1, 2):
+            matrix, _ = np.linalg.qr(rng.normal(size=(4, 4)) + 1j * rng.normal(size=(4, 4)))
+            steps.append(Remapped(MatrixOperation(matrix), lambda s, i=i: (s[i], s[i + 1])))
+    to_tensor = Sequential(steps).trait(ToTensor)
+    return lambda: (operators_cache.clear(), to_tensor.to_tensor(spaces))
+
+
+@case(4, 6, 8)
+def sequential_to_tensor_cached(n: int):
+    # a structurally equal circuit, rebuilt for each call, hits the shared operators cache
+    spaces = qubits(n)
+    matrix, _ = np.linalg.qr(np.random.default_rng(0).normal(size=(4, 4)))
+    pairs = tuple((i, i + 1) for layer in range(4) for i in range(layer % 2, n - 1, 2))
+
+    def build():
+        return Sequential(Remapped(MatrixOperation(matrix), lambda s, i=i, j=j: (s[i], s[j])) for i, j in pairs)
+
+    def run():
+        with caching_operators():
+            return build().trait(ToTensor).to_tensor(spaces)
+
+    return run
+
+
+@case(4, 6, 8, 10)
+def mixed_to_kraus(n: int):
+    spaces = qubits(n)
+    tensor = random_mixed_state(spaces)
+    gamma = 0.1
+    damping = KrausOperation((
+        np.asarray([[1, 0], [0, np.sqrt(1 - gamma)]]),
+        np.asarray([[0, np.sqrt(gamma)], [0, 0]])))
+    to_kraus = damping.trait(ToKraus)
+    return lambda: to_kraus.apply_on_state_tensor(tensor, spaces[0])
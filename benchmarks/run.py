@@ -0,0 +1,137 @@
+import argparse
+import datetime
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from cases import cases
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def time_callable(func: Callable[[], Any], *, repeat: int, min_time: float) -> dict[str, Any]:
+    # the number of calls per round is raised until a round takes at least min_time
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= max(2, min(10, int(min_time / max(elapsed, 1e-9)) + 1))
+
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return {'min': min(rounds), 'median': statistics.median(rounds), 'number': number, 'repeat': repeat}
+
+
+def run_cases(
+        pattern: str, *,
+        quick: bool = False,
+        repeat: int = 5,
+        min_time: float = 0.05,
+        max_qubits: Optional[int] = None,
+) -> dict[str, dict[str, Any]]:
+    results = {}
+    for name, (factory, params) in cases.items():
+        for param in params:
+            key = f"{name}[{param}]"
+            if not fnmatch.fnmatch(key, pattern):
+                continue
+            if max_qubits is not None and isinstance(param, int) and name.startswith('gate_') and param > max_qubits:
+                continue
+            func = factory(param)
+            result = time_callable(func, repeat=2 if quick else repeat, min_time=0.01 if quick else min_time)
+            del func
+            results[key] = result
+            print(f"{key:40s} {format_seconds(result['min']):>12s} (median {format_seconds(result['median'])})")
+    return results
+
+
+def compare_results(
+        results: dict[str, dict[str, Any]],
+        baseline: dict[str, dict[str, Any]], *,
+        threshold: float,
+) -> list[str]:
+    # returns the keys slower than threshold times the baseline, comparing the best rounds
+    regressions = []
+    print(f"\n{'case':40s} {'baseline':>12s} {'current':>12s} {'ratio':>8s}")
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:40s} {'-':>12s} {format_seconds(result['min']):>12s} {'new':>8s}")
+            continue
+        ratio = result['min'] / base['min']
+        flag = ''
+        if ratio > threshold:
+            flag = '  slower'
+            regressions.append(key)
+        elif ratio < 1 / threshold:
+            flag = '  faster'
+        print(f"{key:40s} {format_seconds(base['min']):>12s} {format_seconds(result['min']):>12s} {ratio:>8.2f}{flag}")
+    return regressions
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def machine_info() -> dict[str, Any]:
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Runs the benchmarks and compares them against a baseline.")
+    parser.add_argument('pattern', nargs='?', default='*', help="glob on case keys, e.g. 'gate_1q[*]'")
+    parser.add_argument('--output', help="writes the results as JSON to this path")
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, help="compares against a JSON baseline")
+    parser.add_argument('--update-baseline', action='store_true', help="overwrites the committed baseline")
+    parser.add_argument('--threshold', type=float, default=1.25, help="the slowdown ratio reported as regression")
+    parser.add_argument('--max-qubits', type=int, help="skips the gate cases on more qubits")
+    parser.add_argument('--quick', action='store_true', help="fewer and shorter rounds, for smoke testing")
+    args = parser.parse_args(argv)
+
+    results = run_cases(args.pattern, quick=args.quick, max_qubits=args.max_qubits)
+    document = {'machine': machine_info(), 'results': results}
+
+    output = BASELINE_PATH if args.update_baseline else args.output
+    if output is not None:
+        with open(output, 'w') as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+            file.write('\n')
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare_results(results, baseline['results'], threshold=args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than {args.threshold}x the baseline: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
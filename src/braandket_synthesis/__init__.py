@@ -1,5 +1,8 @@
 from .basics import *
+from .compiling import *
 from .operations import *
+from .profiling import *
+from .simulation import *
 from .traits import *
 
 __version__ = '0.2.2'
@@ -1 +1,4 @@
-from .operation_and_trait import Op, QOperation, QOperationTrait, Tr
+from .operation_and_trait import Op, QOperation, QOperationTrait, Tr, intern_operation
+from .operation_and_trait import cache_usage, iter_operation_tree
+from .operation_and_trait import TraitRegistry, find_trait_cls, trait_registry
+from .trait_cache import TraitCache
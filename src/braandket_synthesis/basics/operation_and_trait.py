@@ -1,5 +1,8 @@
 import abc
-from typing import Any, Callable, Generic, Iterable, Optional, TypeVar
+import weakref
+from typing import Any, Callable, Generic, Hashable, Iterable, Iterator, Optional, TypeVar
+
+from .trait_cache import NoValue, TraitCache
 
 Op = TypeVar('Op', bound='QOperation')
 Tr = TypeVar('Tr', bound='QOperationTrait')
@@ -8,14 +11,38 @@ Tr = TypeVar('Tr', bound='QOperationTrait')
 # operation
 
 class QOperation(abc.ABC):
+    NoDefault = object()
+
+    # the default bound of the cache of each operation, None for unbounded
+    cache_max_bytes: Optional[int] = 1 << 26
+
     def __init__(self, *, name: Optional[str] = None):
         self._name = name
-        self._cache: dict[type[Tr], dict[str, Any]] = {}
+        self._cache = TraitCache(self.cache_max_bytes)
+        self._structural_key = QOperation.NoDefault
 
     @property
     def name(self) -> Optional[str]:
         return self._name
 
+    # structure
+
+    def structural_items(self) -> Optional[tuple[Hashable, ...]]:
+        # the content that determines how the operation acts (not its name),
+        # None if the operation does not describe itself, so that it has no structural key
+        return None
+
+    def structural_key(self) -> Optional[tuple[Hashable, ...]]:
+        # equal for operations acting in the same way, None if any nested operation has no structural key,
+        # only used by the caches, the operations themselves are compared by identity
+        key = self._structural_key
+        if key is QOperation.NoDefault:
+            items = self.structural_items()
+            key = None if items is None else structural_items_key(items)
+            key = None if key is None else (type(self), *key)
+            self._structural_key = key
+        return key
+
     # traits
 
     def trait(self, trait_cls: type[Tr], *, required: bool = True) -> Optional[Tr]:
@@ -27,40 +54,91 @@ class QOperation(abc.ABC):
                 return None
         return found_trait_cls(self)
 
+    def children(self) -> tuple['QOperation', ...]:
+        # the operations nested in this one
+        return ()
+
     # cache
 
-    NoDefault = object()
+    @property
+    def cache(self) -> TraitCache:
+        return self._cache
 
     def get_cache(self, trait_cls: type[Tr], key: str, default: Any = NoDefault) -> Any:
-        trait_cls_order = None
-        trait_cache_value = default
-        for cache_trait_cls, cache_trait_dict in self._cache.items():
-            if not issubclass(trait_cls, cache_trait_cls):
-                continue
-            if key not in cache_trait_dict:
-                continue
-            cache_trait_cls_order = trait_cls.mro().index(cache_trait_cls)
-            if trait_cls_order is None or cache_trait_cls_order < trait_cls_order:
-                trait_cls_order = cache_trait_cls_order
-                trait_cache_value = cache_trait_dict[key]
-        if trait_cache_value is self.NoDefault:
-            raise KeyError(f"Not found cache value for {trait_cls} and key {key}")
-        return trait_cache_value
-
-    def set_cache(self, trait_cls: type[Tr], key: str, value: Any):
-        cache_trait_dict = self._cache.get(trait_cls)
-        if cache_trait_dict is None:
-            cache_trait_dict = {}
-            self._cache[trait_cls] = cache_trait_dict
-        cache_trait_dict[key] = value
-
-    def get_or_set_cache(self, trait_cls: type[Tr], key: str, default_func: Callable[[], Any]) -> Any:
-        try:
-            return self.get_cache(trait_cls, key)
-        except KeyError:
+        value = self._cache.get(trait_cls, key)
+        if value is NoValue:
+            if default is self.NoDefault:
+                raise KeyError(f"Not found cache value for {trait_cls} and key {key}")
+            return default
+        return value
+
+    def set_cache(self, trait_cls: type[Tr], key: str, value: Any, *, weak: bool = False):
+        self._cache.set(trait_cls, key, value, weak=weak)
+
+    def get_or_set_cache(self,
+            trait_cls: type[Tr], key: str,
+            default_func: Callable[[], Any], *,
+            weak: bool = False,
+    ) -> Any:
+        value = self._cache.get(trait_cls, key)
+        if value is NoValue:
             value = default_func()
-            self.set_cache(trait_cls, key, value)
-            return value
+            self._cache.set(trait_cls, key, value, weak=weak)
+        return value
+
+    def clear_cache(self, *, recursive: bool = False):
+        for operation in iter_operation_tree(self) if recursive else (self,):
+            operation.cache.clear()
+
+
+def structural_items_key(items: tuple) -> Optional[tuple]:
+    # the nested operations replaced by their structural keys
+    key = []
+    for item in items:
+        if isinstance(item, (QOperation, tuple)):
+            item = item.structural_key() if isinstance(item, QOperation) else structural_items_key(item)
+            if item is None:
+                return None
+        key.append(item)
+    return tuple(key)
+
+
+def iter_operation_tree(operation: QOperation) -> Iterator[QOperation]:
+    # each nested operation once, even if shared by several parents
+    visited = set()
+    pending = [operation]
+    while pending:
+        operation = pending.pop()
+        if id(operation) in visited:
+            continue
+        visited.add(id(operation))
+        yield operation
+        pending.extend(reversed(operation.children()))
+
+
+def cache_usage(operation: QOperation) -> dict[str, int]:
+    # the cache usage summed over the operation tree
+    usage = {'operations': 0, 'entries': 0, 'bytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+    for operation in iter_operation_tree(operation):
+        cache = operation.cache
+        usage['operations'] += 1
+        usage['entries'] += len(cache)
+        usage['bytes'] += cache.bytes
+        usage['hits'] += cache.hits
+        usage['misses'] += cache.misses
+        usage['evictions'] += cache.evictions
+    return usage
+
+
+_interned: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+
+def intern_operation(operation: Op) -> Op:
+    # returns the living operation equal to operation (and with the same name) if any, so that they share the cache
+    key = operation.structural_key()
+    if key is None:
+        return operation
+    return _interned.setdefault((key, operation.name), operation)
 
 
 # trait
@@ -69,6 +147,10 @@ class QOperationTrait(Generic[Op], abc.ABC):
     def __init__(self, operation: Op):
         self._operation = operation
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        trait_registry.invalidate()
+
     @property
     def operation(self) -> Op:
         return self._operation
@@ -78,11 +160,11 @@ class QOperationTrait(Generic[Op], abc.ABC):
     def get_cache(self, key: str, default: Any = QOperation.NoDefault) -> Any:
         return self.operation.get_cache(type(self), key, default)
 
-    def set_cache(self, key: str, value: Any):
-        self.operation.set_cache(type(self), key, value)
+    def set_cache(self, key: str, value: Any, *, weak: bool = False):
+        self.operation.set_cache(type(self), key, value, weak=weak)
 
-    def get_or_set_cache(self, key: str, default_func: Callable[[], Any]) -> Any:
-        return self.operation.get_or_set_cache(type(self), key, default_func)
+    def get_or_set_cache(self, key: str, default_func: Callable[[], Any], *, weak: bool = False) -> Any:
+        return self.operation.get_or_set_cache(type(self), key, default_func, weak=weak)
 
     # operation class resolving
 
@@ -122,7 +204,57 @@ class QOperationTrait(Generic[Op], abc.ABC):
         return resolved_op_cls_order
 
 
+# trait resolving
+
+class TraitRegistry:
+    def __init__(self):
+        self._resolved: dict[tuple[type[Op], type[Tr]], Optional[type[Tr]]] = {}
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def __len__(self) -> int:
+        return len(self._resolved)
+
+    def resolve(self, op_cls: type[Op], trait_cls: type[Tr]) -> Optional[type[Tr]]:
+        key = op_cls, trait_cls
+        try:
+            resolved = self._resolved[key]
+        except KeyError:
+            self._misses += 1
+            resolved = resolve_trait_cls(op_cls, trait_cls)
+            self._resolved[key] = resolved
+            return resolved
+        self._hits += 1
+        return resolved
+
+    def invalidate(self):
+        self._resolved.clear()
+
+    def clear(self):
+        self.invalidate()
+        self._hits = 0
+        self._misses = 0
+
+    def __repr__(self):
+        return f"<TraitRegistry size={len(self)}, hits={self.hits}, misses={self.misses}>"
+
+
+trait_registry = TraitRegistry()
+
+
 def find_trait_cls(op_cls: type[Op], trait_cls: type[Tr]) -> Optional[type[Tr]]:
+    return trait_registry.resolve(op_cls, trait_cls)
+
+
+def resolve_trait_cls(op_cls: type[Op], trait_cls: type[Tr]) -> Optional[type[Tr]]:
     resolved = None
     for tr_cls, tr_cls_order, op_cls_order in iter_trait_cls(op_cls, trait_cls):
         if resolved is not None:
@@ -0,0 +1,137 @@
+import weakref
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator, Mapping, Optional
+
+NoValue = object()
+
+
+class TraitCache:
+    # values cached by (trait class, key), looked up along the MRO of the requesting trait class,
+    # the least recently used entries are evicted when their total bytes exceed max_bytes
+    def __init__(self, max_bytes: Optional[int] = None):
+        self._entries: OrderedDict[tuple[type, Hashable], tuple[Any, int, bool]] = OrderedDict()
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def max_bytes(self) -> Optional[int]:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: Optional[int]):
+        self._max_bytes = max_bytes
+        self.evict()
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, trait_cls: type, key: Hashable) -> Any:
+        # returns NoValue if not found, the entry set by the nearest class in the MRO of trait_cls wins
+        entries = self._entries
+        for cache_trait_cls in lookup_order(trait_cls):
+            entry_key = cache_trait_cls, key
+            entry = entries.get(entry_key)
+            if entry is None:
+                continue
+            value, _, weak = entry
+            if weak:
+                value = value()
+                if value is None:
+                    self._pop(entry_key)
+                    continue
+            entries.move_to_end(entry_key)
+            self._hits += 1
+            return value
+        self._misses += 1
+        return NoValue
+
+    def set(self, trait_cls: type, key: Hashable, value: Any, *, weak: bool = False):
+        # a weak entry does not keep value alive (nor counts its bytes), if value supports weak references
+        entry_key = trait_cls, key
+        self._pop(entry_key)
+        if weak:
+            try:
+                value = weakref.ref(value)
+            except TypeError:
+                weak = False
+        nbytes = 0 if weak else estimate_bytes(value)
+        self._entries[entry_key] = value, nbytes, weak
+        self._bytes += nbytes
+        self.evict()
+
+    def pop(self, trait_cls: type, key: Hashable):
+        self._pop((trait_cls, key))
+
+    def _pop(self, entry_key: tuple[type, Hashable]):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def evict(self, max_bytes: Optional[int] = None):
+        # the most recent entry is kept even if it alone exceeds max_bytes
+        max_bytes = self._max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return
+        while len(self._entries) > 1 and self._bytes > max_bytes:
+            _, (_, nbytes, _) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self._evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def iter_entries(self) -> Iterator[tuple[type, Hashable, int, bool]]:
+        # (trait class, key, bytes, weak) from the least recently used
+        for (trait_cls, key), (_, nbytes, weak) in self._entries.items():
+            yield trait_cls, key, nbytes, weak
+
+    def __repr__(self):
+        return f"<TraitCache entries={len(self)}, bytes={self.bytes}, max_bytes={self.max_bytes}, " \
+               f"hits={self.hits}, misses={self.misses}, evictions={self.evictions}>"
+
+
+_lookup_orders: dict[type, tuple[type, ...]] = {}
+
+
+def lookup_order(trait_cls: type) -> tuple[type, ...]:
+    # the classes of the MRO, computed once for each trait class
+    order = _lookup_orders.get(trait_cls)
+    if order is None:
+        order = tuple(cls for cls in trait_cls.__mro__ if cls is not object)
+        _lookup_orders[trait_cls] = order
+    return order
+
+
+def estimate_bytes(value: Any) -> int:
+    # the bytes of the arrays held by value (including the values of tensors), other objects count none
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_bytes(item) for item in value)
+    if isinstance(value, Mapping):
+        return sum(estimate_bytes(item) for item in value.values())
+    values = getattr(value, 'values', None)
+    if callable(values) and type(value).__module__.startswith('braandket.'):
+        return estimate_bytes(values())
+    return 0
@@ -0,0 +1,3 @@
+from .fusion import FusionStats, fuse
+from .tape import Tape, compile_tape
+from .operator_cache import OperatorCache
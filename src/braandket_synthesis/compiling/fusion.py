@@ -0,0 +1,216 @@
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from braandket import KetSpace, OperatorTensor, prod
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.operations import MatrixOperation, Remapped, Sequential, iter_steps
+from braandket_synthesis.traits import KetSpaces, ToFingerprint, ToTensor
+from braandket_synthesis.utils import iter_structure, layout_of, restore_structure, stable_digest
+from .operator_cache import OperatorCache
+
+
+class FusionStats:
+    def __init__(self, *, original_steps: int, fused_steps: int, merged_steps: int, cancelled_steps: int):
+        self._original_steps = original_steps
+        self._fused_steps = fused_steps
+        self._merged_steps = merged_steps
+        self._cancelled_steps = cancelled_steps
+
+    @property
+    def original_steps(self) -> int:
+        return self._original_steps
+
+    @property
+    def fused_steps(self) -> int:
+        return self._fused_steps
+
+    @property
+    def merged_steps(self) -> int:
+        return self._merged_steps
+
+    @property
+    def cancelled_steps(self) -> int:
+        return self._cancelled_steps
+
+    @property
+    def removed_steps(self) -> int:
+        return self.original_steps - self.fused_steps
+
+    def __repr__(self):
+        return (f"<FusionStats original_steps={self.original_steps}, fused_steps={self.fused_steps}, "
+                f"merged_steps={self.merged_steps}, cancelled_steps={self.cancelled_steps}>")
+
+
+def fuse(
+        operation: QOperation,
+        spaces: KetSpaces, *,
+        max_spaces: int = 2,
+        atol: float = 1e-10,
+        cache: Optional[OperatorCache] = None,
+) -> tuple[Sequential, FusionStats]:
+    # with cache, the step operators and the fused block products are loaded from (or stored to) it
+    fuser = _Fuser(layout_of(spaces).spaces, max_spaces, atol, cache)
+    for step, step_spaces in iter_steps(operation, spaces):
+        fuser.push(step, step_spaces)
+    fuser.flush()
+    return Sequential(fuser.fused_steps), fuser.stats()
+
+
+# mapping
+
+class _IndexMapping:
+    def __init__(self, indices: Any):
+        self._indices = indices
+
+    @property
+    def indices(self) -> Any:
+        return self._indices
+
+    def __call__(self, spaces: KetSpaces) -> KetSpaces:
+        spaces = layout_of(spaces).spaces
+        return restore_structure((spaces[index] for index in iter_structure(self._indices)), self._indices)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _IndexMapping) and self._indices == other._indices
+
+    def __hash__(self) -> int:
+        return hash(self._indices)
+
+
+# fuser
+
+class _Block:
+    # parts are the (step, spaces, tensor, indices) in the order of application, multiplied only when emitted
+    def __init__(self, indices: tuple[int, ...], parts: tuple[tuple[QOperation, KetSpaces, OperatorTensor, Any], ...]):
+        self.indices = indices
+        self.parts = parts
+
+    @property
+    def steps(self) -> tuple[QOperation, ...]:
+        return tuple(Remapped(step, _IndexMapping(indices)) for step, _, _, indices in self.parts)
+
+    def tensor(self) -> OperatorTensor:
+        return OperatorTensor.of(prod(*(tensor for _, _, tensor, _ in reversed(self.parts))))
+
+
+class _Fuser:
+    def __init__(self, spaces: tuple[KetSpace, ...], max_spaces: int, atol: float, cache: Optional[OperatorCache]):
+        self._spaces = spaces
+        self._spaces_index = {space: index for index, space in enumerate(spaces)}
+        self._max_spaces = max_spaces
+        self._atol = atol
+        self._cache = cache
+
+        self._pending: list[_Block] = []
+        self._fused_steps: list[QOperation] = []
+
+        self._original_steps = 0
+        self._merged_steps = 0
+        self._cancelled_steps = 0
+
+    @property
+    def fused_steps(self) -> tuple[QOperation, ...]:
+        return tuple(self._fused_steps)
+
+    def stats(self) -> FusionStats:
+        return FusionStats(
+            original_steps=self._original_steps,
+            fused_steps=len(self._fused_steps),
+            merged_steps=self._merged_steps,
+            cancelled_steps=self._cancelled_steps)
+
+    def push(self, step: QOperation, spaces: KetSpaces):
+        self._original_steps += 1
+        indices = self._index(spaces)
+
+        tensor = self._to_tensor(step, spaces, indices)
+        if tensor is None:
+            # a barrier: everything overlapping is emitted before it
+            self.flush(indices)
+            self._fused_steps.append(Remapped(step, _IndexMapping(indices)))
+            return
+
+        flat_indices = tuple(iter_structure(indices))
+        overlapping = [block for block in self._pending if not set(block.indices).isdisjoint(flat_indices)]
+        merged_indices = _union_indices(*(block.indices for block in overlapping), flat_indices)
+        if len(merged_indices) > self._max_spaces:
+            self.flush(flat_indices)
+            overlapping = []
+            merged_indices = flat_indices
+
+        # the pending blocks are disjoint, so they commute with each other
+        merged_parts = (*(part for block in overlapping for part in block.parts), (step, spaces, tensor, indices))
+        for block in overlapping:
+            self._pending.remove(block)
+        self._pending.append(_Block(merged_indices, merged_parts))
+
+    def flush(self, indices: Optional[Iterable[int]] = None):
+        if indices is None:
+            flushed = self._pending
+        else:
+            indices = frozenset(iter_structure(indices))
+            flushed = [block for block in self._pending if not indices.isdisjoint(block.indices)]
+        for block in flushed:
+            self._emit(block)
+        self._pending = [block for block in self._pending if block not in flushed]
+
+    def _emit(self, block: _Block):
+        spaces = tuple(self._spaces[index] for index in block.indices)
+        key = self._block_key(block, spaces)
+        matrix = self._cache.load(key) if key is not None else None
+        if matrix is not None:
+            num_spaces = ()
+        else:
+            matrix, (*num_spaces, _, _) = block.tensor().flatten(ket_spaces=spaces)
+            if key is not None and len(num_spaces) == 0:
+                self._cache.store(key, np.asarray(matrix))
+        steps = block.steps
+        if np.allclose(matrix, np.eye(np.shape(matrix)[-1]), rtol=0, atol=self._atol):
+            self._cancelled_steps += len(steps)
+            return
+        if len(steps) == 1:
+            self._fused_steps.append(steps[0])
+            return
+        self._merged_steps += len(steps)
+        matrix_operation = MatrixOperation(matrix, num_spaces=num_spaces)
+        self._fused_steps.append(Remapped(matrix_operation, _IndexMapping(block.indices)))
+
+    def _index(self, spaces: KetSpaces) -> Any:
+        flat_indices = []
+        for space in layout_of(spaces).spaces:
+            try:
+                flat_indices.append(self._spaces_index[space])
+            except KeyError:
+                raise ValueError(f"Space {space} of a step is not found in the fused spaces!") from None
+        return restore_structure(flat_indices, spaces)
+
+    def _to_tensor(self, step: QOperation, spaces: KetSpaces, indices: Any) -> Optional[OperatorTensor]:
+        if len(tuple(iter_structure(indices))) > self._max_spaces:
+            return None
+        to_tensor = step.trait(ToTensor, required=False)
+        if to_tensor is None:
+            return None
+        try:
+            if self._cache is not None and self._cache.key(step, spaces) is not None:
+                return self._cache.to_tensor(step, spaces)
+            return to_tensor.to_tensor(spaces)
+        except TypeError:
+            return None  # some nested operation does not support ToTensor
+
+    def _block_key(self, block: _Block, spaces: tuple[KetSpace, ...]) -> Optional[str]:
+        # the fingerprints of the steps in the layout of the block, None if any of them can not be fingerprinted
+        if self._cache is None or len(block.parts) == 1:
+            return None
+        layout = layout_of(spaces)
+        fingerprints = []
+        for step, step_spaces, _, _ in block.parts:
+            fingerprint = step.trait(ToFingerprint).fingerprint(step_spaces, layout)
+            if fingerprint is None:
+                return None
+            fingerprints.append(fingerprint)
+        return stable_digest('fused', *fingerprints, layout.dims)
+
+
+def _union_indices(*indices: tuple[int, ...]) -> tuple[int, ...]:
+    return tuple(dict.fromkeys(index for item in indices for index in item))
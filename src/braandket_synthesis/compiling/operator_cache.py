@@ -0,0 +1,184 @@
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from braandket import Backend, NumpyBackend, OperatorTensor, numpy_backend, prod
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.traits import KetSpaces, ToFingerprint, ToKraus, ToTensor
+from braandket_synthesis.utils import layout_of, stable_digest
+
+ENTRY_SUFFIX = '.npy'
+
+
+class OperatorCache:
+    # compiled operators stored as .npy files in directory, named by the structural key and loaded with mmap,
+    # the least recently used entries are evicted when the total size exceeds max_bytes
+    # (down to 3/4 of max_bytes, so that the directory is not scanned on every store once full)
+    def __init__(self, directory: str, *, max_bytes: int = 1 << 30):
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._size: Optional[int] = None  # the running total of the stored bytes, scanned on the first store
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    # keys
+
+    def key(self, operation: QOperation, spaces: KetSpaces, kind: str = 'tensor', *,
+            dtype: Optional[np.dtype] = None) -> Optional[str]:
+        # None if the operation can not be fingerprinted, so that it is never cached
+        fingerprint = operation.trait(ToFingerprint).fingerprint(spaces)
+        if fingerprint is None:
+            return None
+        dtype_str = '' if dtype is None else np.dtype(dtype).str
+        return stable_digest(kind, fingerprint, layout_of(spaces).dims, dtype_str)
+
+    # operators
+
+    def to_tensor(self, operation: QOperation, spaces: KetSpaces, *,
+            backend: Optional[Backend] = None, dtype: Optional[np.dtype] = None) -> OperatorTensor:
+        # in the own dtype of the tensor, unless dtype is given
+        if backend is not None and not isinstance(backend, NumpyBackend):
+            return operation.trait(ToTensor).to_tensor(spaces, backend=backend)
+        flat_spaces = layout_of(spaces).spaces
+        key = self.key(operation, spaces, 'tensor', dtype=dtype)
+        values = self.load(key) if key is not None else None
+        if values is None:
+            tensor = operation.trait(ToTensor).to_tensor(spaces)
+            values = operator_values(tensor, flat_spaces, dtype)
+            if key is not None:
+                self.store(key, values)
+        return OperatorTensor(values, (*flat_spaces, *(space.ct for space in flat_spaces)), numpy_backend)
+
+    def to_kraus(self, operation: QOperation, spaces: KetSpaces, *,
+            backend: Optional[Backend] = None, dtype: Optional[np.dtype] = None) -> tuple[OperatorTensor, ...]:
+        # the Kraus operators are stacked in one entry
+        if backend is not None and not isinstance(backend, NumpyBackend):
+            return operation.trait(ToKraus).to_kraus(spaces, backend=backend)
+        flat_spaces = layout_of(spaces).spaces
+        key = self.key(operation, spaces, 'kraus', dtype=dtype)
+        values = self.load(key) if key is not None else None
+        if values is None:
+            tensors = operation.trait(ToKraus).to_kraus(spaces)
+            values = np.stack([operator_values(tensor, flat_spaces, dtype) for tensor in tensors])
+            if key is not None:
+                self.store(key, values)
+        tensor_spaces = (*flat_spaces, *(space.ct for space in flat_spaces))
+        return tuple(OperatorTensor(kraus_values, tensor_spaces, numpy_backend) for kraus_values in values)
+
+    # entries
+
+    def path(self, key: str) -> str:
+        return os.path.join(self._directory, key + ENTRY_SUFFIX)
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        path = self.path(key)
+        try:
+            values = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError, OSError):
+            # missing, or truncated by another process
+            self._misses += 1
+            return None
+        try:
+            os.utime(path)  # the modification time orders the entries for eviction
+        except OSError:
+            pass
+        self._hits += 1
+        return values
+
+    def store(self, key: str, values: np.ndarray):
+        # written to a temporary file and then renamed, so that readers never see a partial entry
+        if self._size is None:
+            self._size = self.size()
+        path = self.path(key)
+        try:
+            replaced_bytes = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced_bytes = 0
+        descriptor, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self._directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                np.save(file, np.asarray(values))
+                stored_bytes = file.tell()
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._size += stored_bytes - replaced_bytes
+        if self._size > self._max_bytes:
+            self.evict(self._max_bytes - self._max_bytes // 4)
+
+    def entries(self) -> list[tuple[str, int, float]]:
+        # (key, bytes, last used time) of each entry, the least recently used first
+        entries = []
+        for file_name in os.listdir(self._directory):
+            if not file_name.endswith(ENTRY_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self._directory, file_name))
+            except FileNotFoundError:
+                continue
+            entries.append((file_name[:-len(ENTRY_SUFFIX)], stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def size(self) -> int:
+        return sum(entry_bytes for _, entry_bytes, _ in self.entries())
+
+    def evict(self, max_bytes: Optional[int] = None):
+        max_bytes = self._max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(entry_bytes for _, entry_bytes, _ in entries)
+        for key, entry_bytes, _ in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            total -= entry_bytes
+            self._evictions += 1
+        self._size = total
+
+    def clear(self):
+        self.evict(0)
+
+    def __len__(self) -> int:
+        return len(self.entries())
+
+    def __repr__(self):
+        return f"<OperatorCache directory={self.directory}, max_bytes={self.max_bytes}, " \
+               f"hits={self.hits}, misses={self.misses}, evictions={self.evictions}>"
+
+
+def operator_values(tensor: OperatorTensor, spaces: tuple, dtype: Optional[np.dtype] = None) -> np.ndarray:
+    # ordered as [*spaces, *bra_spaces], the spaces missing in tensor (acted as identity) are filled in
+    missing_spaces = tuple(space for space in spaces if space not in tensor.spaces)
+    if missing_spaces:
+        tensor = OperatorTensor.of(tensor @ prod(*(space.identity() for space in missing_spaces)))
+    values = tensor.values(*spaces, *(space.ct for space in spaces))
+    return np.asarray(values, dtype=dtype)
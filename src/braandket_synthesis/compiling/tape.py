@@ -0,0 +1,334 @@
+import abc
+from typing import Any, Iterable, Optional, Union
+
+import numpy as np
+
+from braandket import Backend, KetSpace, MixedStateTensor, NumSpace, NumpyBackend, PureStateTensor
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.kernels import apply_diagonal_on_values, apply_matrix_on_values, apply_permutation_on_values
+from braandket_synthesis.operations import Controlled, DesiredMeasurement, MatrixOperation, MeasurementResult, \
+    ProjectiveMeasurement, iter_steps
+from braandket_synthesis.operations.measurement.desired import desired_measure
+from braandket_synthesis.operations.measurement.projective import projective_measure
+from braandket_synthesis.traits import Apply, IsDiagonal, KetSpaces, ToMonomial
+from braandket_synthesis.utils import iter_structure, iter_zip_structures, layout_of
+
+
+class TapeState:
+    def __init__(self, *,
+            values: np.ndarray,
+            spaces: tuple[KetSpace, ...],
+            num_spaces: tuple[NumSpace, ...],
+            mixed: bool,
+            backend: Backend,
+            slots: int,
+    ):
+        # values are ordered as [*num_spaces, *spaces] (and then [*bra_spaces] if mixed)
+        self.values = values
+        self.spaces = spaces
+        self.num_spaces = num_spaces
+        self.mixed = mixed
+        self.backend = backend
+        self.results: list[Optional[MeasurementResult]] = [None] * slots
+
+    @property
+    def ket_base(self) -> int:
+        return len(self.num_spaces)
+
+    @property
+    def bra_base(self) -> int:
+        return len(self.num_spaces) + len(self.spaces)
+
+    def tensor(self) -> Union[PureStateTensor, MixedStateTensor]:
+        if self.mixed:
+            spaces = (*self.num_spaces, *self.spaces, *(space.ct for space in self.spaces))
+            return MixedStateTensor(self.values, spaces, self.backend)
+        return PureStateTensor(self.values, (*self.num_spaces, *self.spaces), self.backend)
+
+    def set_tensor(self, tensor: Union[PureStateTensor, MixedStateTensor]):
+        num_spaces = tuple(space for space in tensor.spaces if isinstance(space, NumSpace))
+        self.num_spaces = (
+            *(space for space in self.num_spaces if space in num_spaces),
+            *(space for space in num_spaces if space not in self.num_spaces))
+        self.mixed = isinstance(tensor, MixedStateTensor)
+        if self.mixed:
+            self.values = tensor.values(*self.num_spaces, *self.spaces, *(space.ct for space in self.spaces))
+        else:
+            self.values = tensor.values(*self.num_spaces, *self.spaces)
+
+
+# instructions
+
+class TapeInstruction(abc.ABC):
+    @abc.abstractmethod
+    def run(self, state: TapeState):
+        pass
+
+
+class KernelInstruction(TapeInstruction, abc.ABC):
+    # acts on one side of the state (ket axes, or bra axes with conjugate=True)
+    @abc.abstractmethod
+    def apply(self, values: np.ndarray, base: int, conjugate: bool) -> np.ndarray:
+        pass
+
+    def run(self, state: TapeState):
+        state.values = self.apply(state.values, state.ket_base, False)
+        if state.mixed:
+            state.values = self.apply(state.values, state.bra_base, True)
+
+
+class MatrixInstruction(KernelInstruction):
+    def __init__(self, matrix: np.ndarray, axes: tuple[int, ...]):
+        self.matrix = matrix
+        self.conjugate_matrix = np.conj(matrix)
+        self.axes = axes
+
+    def apply(self, values: np.ndarray, base: int, conjugate: bool) -> np.ndarray:
+        matrix = self.conjugate_matrix if conjugate else self.matrix
+        return apply_matrix_on_values(values, matrix, tuple(base + axis for axis in self.axes))
+
+    def __repr__(self):
+        return f"<MatrixInstruction axes={self.axes}>"
+
+
+class DiagonalInstruction(KernelInstruction):
+    def __init__(self, diagonal: np.ndarray, axes: tuple[int, ...]):
+        self.diagonal = diagonal
+        self.conjugate_diagonal = np.conj(diagonal)
+        self.axes = axes
+
+    def apply(self, values: np.ndarray, base: int, conjugate: bool) -> np.ndarray:
+        diagonal = self.conjugate_diagonal if conjugate else self.diagonal
+        return apply_diagonal_on_values(values, diagonal, tuple(base + axis for axis in self.axes))
+
+    def __repr__(self):
+        return f"<DiagonalInstruction axes={self.axes}>"
+
+
+class PermutationInstruction(KernelInstruction):
+    def __init__(self, sources: Optional[np.ndarray], phases: Optional[np.ndarray], axes: tuple[int, ...]):
+        self.sources = sources
+        self.phases = phases
+        self.conjugate_phases = None if phases is None else np.conj(phases)
+        self.axes = axes
+
+    def apply(self, values: np.ndarray, base: int, conjugate: bool) -> np.ndarray:
+        phases = self.conjugate_phases if conjugate else self.phases
+        return apply_permutation_on_values(values, self.sources, phases, tuple(base + axis for axis in self.axes))
+
+    def __repr__(self):
+        return f"<PermutationInstruction axes={self.axes}>"
+
+
+class ControlledInstruction(KernelInstruction):
+    def __init__(self, control_axes: tuple[int, ...], keys: tuple[int, ...], instructions: Iterable[KernelInstruction]):
+        # the axes of instructions are numbered with control_axes removed
+        self.control_axes = control_axes
+        self.keys = keys
+        self.instructions = tuple(instructions)
+
+    def apply(self, values: np.ndarray, base: int, conjugate: bool) -> np.ndarray:
+        slices = [slice(None)] * np.ndim(values)
+        for axis, key in zip(self.control_axes, self.keys):
+            slices[base + axis] = key
+        slices = tuple(slices)
+
+        sub_values = values[slices]
+        for instruction in self.instructions:
+            sub_values = instruction.apply(sub_values, base, conjugate)
+
+        dtype = np.result_type(values, sub_values)
+        if not values.flags.writeable or dtype != values.dtype:
+            values = np.array(values, dtype=dtype)
+        values[slices] = sub_values
+        return values
+
+    def __repr__(self):
+        return f"<ControlledInstruction control_axes={self.control_axes}, keys={self.keys}, " \
+               f"instructions={self.instructions}>"
+
+
+class ProjectiveMeasurementInstruction(TapeInstruction):
+    def __init__(self, operation: QOperation, spaces: KetSpaces, slot: int):
+        self.operation = operation
+        self.layout = layout_of(spaces)
+        self.slot = slot
+
+    def run(self, state: TapeState):
+        tensor, values, prob = projective_measure(state.tensor(), self.layout.spaces)
+        state.set_tensor(tensor)
+        values = self.layout.restore(values)
+        state.results[self.slot] = MeasurementResult(values=values, probability=prob, operation=self.operation)
+
+    def __repr__(self):
+        return f"<ProjectiveMeasurementInstruction slot={self.slot}>"
+
+
+class DesiredMeasurementInstruction(TapeInstruction):
+    def __init__(self, operation: DesiredMeasurement, spaces: KetSpaces, slot: int):
+        self.operation = operation
+        self.flat_spaces = layout_of(spaces).spaces
+        self.flat_values = tuple(iter_structure(operation.values))
+        self.slot = slot
+
+    def run(self, state: TapeState):
+        tensor, prob = desired_measure(state.tensor(), self.flat_spaces, self.flat_values)
+        state.set_tensor(tensor)
+        values = self.operation.values
+        state.results[self.slot] = MeasurementResult(values=values, probability=prob, operation=self.operation)
+
+    def __repr__(self):
+        return f"<DesiredMeasurementInstruction slot={self.slot}>"
+
+
+class GenericInstruction(TapeInstruction):
+    # falls back to the Apply trait of the operation
+    def __init__(self, operation: QOperation, spaces: KetSpaces):
+        self.operation = operation
+        self.spaces = spaces
+        self.apply_trait = operation.trait(Apply)
+
+    def run(self, state: TapeState):
+        state.set_tensor(self.apply_trait.apply_on_state_tensor(state.tensor(), self.spaces))
+
+    def __repr__(self):
+        return f"<GenericInstruction operation={self.operation}>"
+
+
+# tape
+
+class Tape:
+    def __init__(self, *,
+            spaces: tuple[KetSpace, ...],
+            instructions: Iterable[TapeInstruction],
+            slots: int,
+            dtype: np.dtype,
+    ):
+        self._spaces = spaces
+        self._instructions = tuple(instructions)
+        self._slots = slots
+        self._dtype = dtype
+
+    @property
+    def spaces(self) -> tuple[KetSpace, ...]:
+        return self._spaces
+
+    @property
+    def instructions(self) -> tuple[TapeInstruction, ...]:
+        return self._instructions
+
+    @property
+    def slots(self) -> int:
+        return self._slots
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._dtype
+
+    def run(self,
+            tensor: Union[PureStateTensor, MixedStateTensor]
+    ) -> tuple[Union[PureStateTensor, MixedStateTensor], tuple[MeasurementResult, ...]]:
+        if not isinstance(tensor, (PureStateTensor, MixedStateTensor)):
+            raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+        # the spaces of tensor not on the tape are kept after the tape spaces
+        ket_spaces = tuple(space for space in tensor.spaces if isinstance(space, KetSpace))
+        spaces = (*self.spaces, *(space for space in ket_spaces if space not in self.spaces))
+        num_spaces = tuple(space for space in tensor.spaces if isinstance(space, NumSpace))
+        state = TapeState(
+            values=np.empty(()),
+            spaces=spaces,
+            num_spaces=num_spaces,
+            mixed=isinstance(tensor, MixedStateTensor),
+            backend=tensor.backend,
+            slots=self.slots)
+        state.set_tensor(tensor)
+
+        # a fresh copy, so that the instructions can write in place
+        state.values = np.array(state.values, dtype=np.result_type(state.values, self.dtype))
+        for instruction in self.instructions:
+            instruction.run(state)
+        return state.tensor(), tuple(state.results)
+
+    def __repr__(self):
+        return f"<Tape spaces={self.spaces}, instructions={self.instructions}>"
+
+
+def compile_tape(
+        operation: QOperation,
+        spaces: KetSpaces,
+        backend: Optional[Backend] = None, *,
+        state_spaces: Optional[Iterable[KetSpace]] = None,
+) -> Tape:
+    # state_spaces fixes the axes order of the tape, defaults to the flattened spaces
+    flat_spaces = layout_of(spaces).spaces if state_spaces is None else tuple(state_spaces)
+    axes = {space: axis for axis, space in enumerate(flat_spaces)}
+    use_kernels = backend is None or isinstance(backend, NumpyBackend)
+
+    instructions = []
+    slots = 0
+    dtypes = [np.float64]
+    for step, step_spaces in iter_steps(operation, spaces):
+        if isinstance(step, ProjectiveMeasurement):
+            instructions.append(ProjectiveMeasurementInstruction(step, step_spaces, slots))
+            slots += 1
+            continue
+        if isinstance(step, DesiredMeasurement):
+            instructions.append(DesiredMeasurementInstruction(step, step_spaces, slots))
+            slots += 1
+            continue
+
+        instruction = lower_kernel(step, step_spaces, axes) if use_kernels else None
+        if instruction is None:
+            instruction = GenericInstruction(step, step_spaces)
+        else:
+            dtypes.extend(iter_kernel_dtypes(instruction))
+        instructions.append(instruction)
+
+    return Tape(spaces=flat_spaces, instructions=instructions, slots=slots, dtype=np.result_type(*dtypes))
+
+
+def lower_kernel(operation: QOperation, spaces: KetSpaces, axes: dict[KetSpace, int]) -> Optional[KernelInstruction]:
+    if isinstance(operation, MatrixOperation):
+        if len(operation.num_spaces) > 0:
+            return None  # batched operations are left to the generic instruction
+        op_axes = tuple(axes[space] for space in layout_of(spaces).spaces)
+        monomial = operation.trait(ToMonomial).to_monomial()
+        if monomial is not None:
+            sources, phases = monomial
+            return PermutationInstruction(sources, phases, op_axes)
+        if operation.trait(IsDiagonal).is_diagonal():
+            diagonal = np.diagonal(operation.matrix, axis1=-2, axis2=-1).copy()
+            return DiagonalInstruction(diagonal, op_axes)
+        return MatrixInstruction(np.asarray(operation.matrix), op_axes)
+
+    if isinstance(operation, Controlled):
+        control_spaces, target_spaces = spaces
+        controls = tuple(iter_zip_structures(control_spaces, operation.keys))
+        control_axes = tuple(axes[space] for space, _ in controls)
+        sub_axes = {
+            space: axis - sum(1 for control_axis in control_axes if control_axis < axis)
+            for space, axis in axes.items() if axis not in control_axes}
+
+        instructions = []
+        for step, step_spaces in iter_steps(operation.bullet, target_spaces):
+            instruction = lower_kernel(step, step_spaces, sub_axes)
+            if instruction is None:
+                return None
+            instructions.append(instruction)
+        return ControlledInstruction(control_axes, tuple(key for _, key in controls), instructions)
+
+    return None
+
+
+def iter_kernel_dtypes(instruction: KernelInstruction) -> Iterable[Any]:
+    if isinstance(instruction, MatrixInstruction):
+        yield instruction.matrix.dtype
+    elif isinstance(instruction, DiagonalInstruction):
+        yield instruction.diagonal.dtype
+    elif isinstance(instruction, PermutationInstruction):
+        if instruction.phases is not None:
+            yield instruction.phases.dtype
+    elif isinstance(instruction, ControlledInstruction):
+        for sub_instruction in instruction.instructions:
+            yield from iter_kernel_dtypes(sub_instruction)
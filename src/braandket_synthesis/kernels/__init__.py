@@ -0,0 +1,15 @@
+from .chunked import iter_chunks, map_chunks, streaming_collapse, streaming_marginal_probabilities
+from .controlled import apply_controlled_on_mixed_state, apply_controlled_on_pure_state, \
+    apply_controlled_on_state_tensor
+from .diagonal import apply_diagonal_on_mixed_state, apply_diagonal_on_pure_state, apply_diagonal_on_state_tensor, \
+    apply_diagonal_on_values
+from .expectation import diagonal_expectation_values, matrix_expectation_values, monomial_expectation_values, \
+    parity_count, pauli_expectation_values, reduced_density_values, walsh_hadamard
+from .matrix import apply_matrix_on_mixed_state, apply_matrix_on_pure_state, apply_matrix_on_state_tensor, \
+    apply_matrix_on_values
+from .permutation import apply_permutation_on_mixed_state, apply_permutation_on_pure_state, \
+    apply_permutation_on_state_tensor, apply_permutation_on_values, monomial_form, simplify_monomial
+from .projection import block_index, block_probabilities, choose_values, collapse_mixed_state, collapse_outcomes, \
+    collapse_pure_state, collapse_state_tensor, embed_on_values, marginal_probabilities, norm_values, \
+    outcome_indices, outcome_probabilities, project_on_values
+from .utils import apply_on_both_sides, apply_on_ket_side, broadcast_num_spaces
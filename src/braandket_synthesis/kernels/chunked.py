@@ -0,0 +1,108 @@
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+
+# the chunks are tuples of slices, keeping all the axes of values (fixed axes get length-1 slices)
+Chunk = tuple[slice, ...]
+
+
+def iter_chunks(shape: tuple[int, ...], full_axes: Iterable[int], max_size: int) -> Iterator[Chunk]:
+    # blocks of at most max_size elements (unless full_axes alone exceed it), each spanning full_axes entirely;
+    # the leading other axes are fixed first, so that each chunk is made of the longest contiguous runs
+    full_axes = set(full_axes)
+    size = int(np.prod(shape, dtype=np.int64))
+    outer_axes = []
+    for axis in range(len(shape)):
+        if size <= max_size:
+            break
+        if axis in full_axes:
+            continue
+        size //= shape[axis]
+        outer_axes.append(axis)
+
+    if len(outer_axes) == 0:
+        yield tuple(slice(None) for _ in shape)
+        return
+
+    # the last fixed axis is taken in blocks, as large as the budget allows
+    *fixed_axes, block_axis = outer_axes
+    block = max(1, min(shape[block_axis], max_size // max(size, 1)))
+    for index in np.ndindex(*(shape[axis] for axis in fixed_axes)):
+        chunk = [slice(None)] * len(shape)
+        for axis, i in zip(fixed_axes, index):
+            chunk[axis] = slice(i, i + 1)
+        for start in range(0, shape[block_axis], block):
+            chunk[block_axis] = slice(start, min(start + block, shape[block_axis]))
+            yield tuple(chunk)
+
+
+def map_chunks(
+        values: np.ndarray,
+        func: Callable[[np.ndarray, Chunk], np.ndarray],
+        full_axes: Iterable[int],
+        max_size: int,
+):
+    # replaces each chunk of values (e.g. a np.memmap) in place with func(chunk_values, chunk)
+    for chunk in iter_chunks(np.shape(values), full_axes, max_size):
+        values[chunk] = func(np.array(values[chunk]), chunk)
+
+
+def chunk_ranges(chunk: Chunk, shape: tuple[int, ...], axes: Iterable[int]) -> tuple[np.ndarray, ...]:
+    # the indices covered by a chunk along axes, broadcastable against the chunk values
+    ranges = []
+    for axis in axes:
+        start, stop, _ = chunk[axis].indices(shape[axis])
+        broadcast_shape = [1] * len(shape)
+        broadcast_shape[axis] = stop - start
+        ranges.append(np.reshape(np.arange(start, stop), broadcast_shape))
+    return tuple(ranges)
+
+
+def streaming_marginal_probabilities(
+        values: np.ndarray,
+        axes: Iterable[int],
+        max_size: int,
+        bra_base: Optional[int] = None,
+) -> np.ndarray:
+    # the probabilities on axes (ordered as given), summing |values|^2 chunk by chunk;
+    # for density matrices (with the bra axes from bra_base), the diagonal is gathered instead
+    axes = tuple(axes)
+    if bra_base is None:
+        shape = np.shape(values)
+        read = lambda chunk: np.abs(np.asarray(values[chunk])) ** 2
+    else:
+        shape = np.shape(values)[:bra_base]
+        size = int(np.prod(shape, dtype=np.int64))
+        flat_values = np.reshape(values, (-1,))
+
+        def read(chunk: Chunk) -> np.ndarray:
+            ket_indices = np.ravel_multi_index(np.ix_(*(
+                np.arange(*chunk[axis].indices(n)) for axis, n in enumerate(shape))), shape)
+            return np.real(np.asarray(flat_values[ket_indices * (size + 1)]))
+
+    probs = np.zeros(tuple(shape[axis] for axis in sorted(axes)))
+    other_axes = tuple(axis for axis in range(len(shape)) if axis not in axes)
+    for chunk in iter_chunks(shape, (), max_size):
+        probs[tuple(chunk[axis] for axis in sorted(axes))] += np.sum(read(chunk), axis=other_axes)
+    return np.transpose(probs, np.argsort(np.argsort(axes)))
+
+
+def streaming_collapse(
+        values: np.ndarray,
+        axes: Iterable[int],
+        indices: Iterable[int],
+        scale: float,
+        max_size: int,
+):
+    # zeroes the entries except those with indices on axes, and multiplies the others by scale, in place
+    axes = tuple(axes)
+    indices = tuple(indices)
+    shape = np.shape(values)
+
+    def collapse(chunk_values: np.ndarray, chunk: Chunk) -> np.ndarray:
+        mask = True
+        for axis_range, index in zip(chunk_ranges(chunk, shape, axes), indices):
+            mask = mask & (axis_range == index)
+        return np.where(mask, chunk_values * scale, 0)
+
+    map_chunks(values, collapse, (), max_size)
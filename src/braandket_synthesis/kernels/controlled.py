@@ -0,0 +1,70 @@
+from typing import Callable, Iterable, Union
+
+import numpy as np
+
+from braandket import KetSpace, MixedStateTensor, PureStateTensor
+from .utils import apply_on_both_sides, broadcast_num_spaces, index_spaces
+
+
+def apply_controlled_on_state_tensor(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        controls: Iterable[tuple[KetSpace, int]],
+        func: Callable[[PureStateTensor], PureStateTensor],
+) -> Union[PureStateTensor, MixedStateTensor]:
+    if isinstance(tensor, PureStateTensor):
+        return apply_controlled_on_pure_state(tensor, controls, func)
+    elif isinstance(tensor, MixedStateTensor):
+        return apply_controlled_on_mixed_state(tensor, controls, func)
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+def apply_controlled_on_pure_state(
+        tensor: PureStateTensor,
+        controls: Iterable[tuple[KetSpace, int]],
+        func: Callable[[PureStateTensor], PureStateTensor],
+) -> PureStateTensor:
+    controls = tuple(controls)
+    control_spaces = tuple(space for space, _ in controls)
+
+    # only the amplitudes where controls equal keys are passed to func
+    slices = control_slices(tensor, controls)
+    sub_spaces = tuple(space for space in tensor.spaces if space not in control_spaces)
+    sub_tensor = func(PureStateTensor(tensor.values()[slices], sub_spaces, tensor.backend))
+    if not isinstance(sub_tensor, PureStateTensor):
+        raise TypeError(f"Expected the controlled application to result in PureStateTensor, got {type(sub_tensor)}!")
+
+    # func may have broadcast the slice with new num spaces (batched operations)
+    new_num_spaces = tuple(space for space in sub_tensor.spaces if space not in sub_spaces)
+    if len(new_num_spaces) > 0:
+        tensor = broadcast_num_spaces(tensor, new_num_spaces)
+        slices = control_slices(tensor, controls)
+        sub_spaces = (*new_num_spaces, *sub_spaces)
+
+    values = tensor.values()
+    sub_values = sub_tensor.values(*sub_spaces)
+    new_values = np.array(values, dtype=np.result_type(values, sub_values))
+    new_values[slices] = sub_values
+    return PureStateTensor(new_values, tensor.spaces, tensor.backend)
+
+
+def apply_controlled_on_mixed_state(
+        tensor: MixedStateTensor,
+        controls: Iterable[tuple[KetSpace, int]],
+        func: Callable[[PureStateTensor], PureStateTensor],
+) -> MixedStateTensor:
+    controls = tuple(controls)
+    return apply_on_both_sides(tensor, lambda pure: apply_controlled_on_pure_state(pure, controls, func))
+
+
+def control_slices(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        controls: Iterable[tuple[KetSpace, int]],
+) -> tuple[Union[int, slice], ...]:
+    controls = tuple(controls)
+    control_axes = index_spaces(tensor, (space for space, _ in controls))
+
+    slices = [slice(None)] * len(tensor.spaces)
+    for axis, (_, key) in zip(control_axes, controls):
+        slices[axis] = key
+    return tuple(slices)
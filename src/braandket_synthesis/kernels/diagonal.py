@@ -0,0 +1,69 @@
+from typing import Iterable, Union
+
+import numpy as np
+
+from braandket import KetSpace, MixedStateTensor, NumSpace, PureStateTensor
+from .utils import broadcast_num_spaces, broadcast_on_axes, index_spaces
+
+
+def apply_diagonal_on_state_tensor(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        diagonal: np.ndarray,
+        spaces: Iterable[KetSpace],
+        num_spaces: Iterable[NumSpace] = (),
+) -> Union[PureStateTensor, MixedStateTensor]:
+    if isinstance(tensor, PureStateTensor):
+        return apply_diagonal_on_pure_state(tensor, diagonal, spaces, num_spaces)
+    elif isinstance(tensor, MixedStateTensor):
+        return apply_diagonal_on_mixed_state(tensor, diagonal, spaces, num_spaces)
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+def apply_diagonal_on_pure_state(
+        tensor: PureStateTensor,
+        diagonal: np.ndarray,
+        spaces: Iterable[KetSpace],
+        num_spaces: Iterable[NumSpace] = (),
+) -> PureStateTensor:
+    num_spaces = tuple(num_spaces)
+    tensor = broadcast_num_spaces(tensor, num_spaces)
+    axes = index_spaces(tensor, spaces)
+    num_axes = index_spaces(tensor, num_spaces)
+    values = apply_diagonal_on_values(tensor.values(), diagonal, axes, num_axes)
+    return PureStateTensor(values, tensor.spaces, tensor.backend)
+
+
+def apply_diagonal_on_mixed_state(
+        tensor: MixedStateTensor,
+        diagonal: np.ndarray,
+        spaces: Iterable[KetSpace],
+        num_spaces: Iterable[NumSpace] = (),
+) -> MixedStateTensor:
+    spaces = tuple(spaces)
+    num_spaces = tuple(num_spaces)
+    tensor = broadcast_num_spaces(tensor, num_spaces)
+    ket_axes = index_spaces(tensor, spaces)
+    bra_axes = index_spaces(tensor, (space.ct for space in spaces))
+    num_axes = index_spaces(tensor, num_spaces)
+    values = apply_diagonal_on_values(tensor.values(), diagonal, ket_axes, num_axes)
+    values = apply_diagonal_on_values(values, np.conj(diagonal), bra_axes, num_axes)
+    return MixedStateTensor(values, tensor.spaces, tensor.backend)
+
+
+def apply_diagonal_on_values(
+        values: np.ndarray,
+        diagonal: np.ndarray,
+        axes: Iterable[int],
+        num_axes: Iterable[int] = (),
+) -> np.ndarray:
+    return values * broadcast_diagonal(diagonal, np.shape(values), axes, num_axes)
+
+
+def broadcast_diagonal(
+        diagonal: np.ndarray,
+        shape: tuple[int, ...],
+        axes: Iterable[int],
+        num_axes: Iterable[int] = (),
+) -> np.ndarray:
+    return broadcast_on_axes(diagonal, shape, (*num_axes, *axes))
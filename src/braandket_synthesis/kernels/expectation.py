@@ -0,0 +1,202 @@
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+from braandket import KetSpace, MixedStateTensor, NumSpace, PureStateTensor
+from .projection import marginal_probabilities
+from .utils import broadcast_num_spaces
+
+
+# the expectation values are shaped as [*num_spaces, *other_num_spaces],
+# where other_num_spaces are the other num spaces of the tensor, in their order in the tensor
+
+def expectation_num_spaces(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        num_spaces: Iterable[NumSpace] = (),
+) -> tuple[NumSpace, ...]:
+    num_spaces = tuple(num_spaces)
+    other_num_spaces = tuple(space for space in tensor.spaces
+                             if isinstance(space, NumSpace) and space not in num_spaces)
+    return *num_spaces, *other_num_spaces
+
+
+def matrix_expectation_values(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        matrix: np.ndarray,
+        spaces: Iterable[KetSpace],
+        num_spaces: Iterable[NumSpace] = (),
+) -> np.ndarray:
+    # tr(O rho) or <psi|O|psi>, without applying O on the whole state
+    spaces = tuple(spaces)
+    num_spaces = tuple(num_spaces)
+    tensor = broadcast_num_spaces(tensor, num_spaces)
+    all_num_spaces = expectation_num_spaces(tensor, num_spaces)
+    num_shape = tuple(space.n for space in all_num_spaces)
+    size = int(np.prod([space.n for space in spaces], dtype=int))
+    matrix = np.reshape(matrix, (*(space.n for space in num_spaces),
+                                 *(1 for _ in all_num_spaces[len(num_spaces):]), size, size))
+
+    rest_spaces = tuple(space for space in tensor.ket_spaces if space not in spaces)
+    if isinstance(tensor, PureStateTensor):
+        values = np.reshape(tensor.values(*all_num_spaces, *spaces, *rest_spaces), (*num_shape, size, -1))
+        return np.einsum('...ir,...ij,...jr->...', np.conj(values), matrix, values, optimize=True)
+    elif isinstance(tensor, MixedStateTensor):
+        reduced = reduced_density_values(tensor, spaces, all_num_spaces)
+        return np.einsum('...ij,...ji->...', matrix, reduced)
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+def diagonal_expectation_values(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        diagonal: np.ndarray,
+        spaces: Iterable[KetSpace],
+        num_spaces: Iterable[NumSpace] = (),
+) -> np.ndarray:
+    # only the probabilities on spaces are needed
+    spaces = tuple(spaces)
+    num_spaces = tuple(num_spaces)
+    tensor = broadcast_num_spaces(tensor, num_spaces)
+    all_num_spaces = expectation_num_spaces(tensor, num_spaces)
+    num_shape = tuple(space.n for space in all_num_spaces)
+    probs = np.reshape(marginal_probabilities(tensor, spaces, all_num_spaces), (*num_shape, -1))
+    diagonal = np.reshape(diagonal, (*(space.n for space in num_spaces),
+                                     *(1 for _ in all_num_spaces[len(num_spaces):]), -1))
+    return np.sum(probs * diagonal, axis=-1)
+
+
+def monomial_expectation_values(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        sources: Optional[np.ndarray],
+        phases: Optional[np.ndarray],
+        spaces: Iterable[KetSpace],
+) -> np.ndarray:
+    # O[i, sources[i]] = phases[i], a gather of the state instead of a matrix product
+    spaces = tuple(spaces)
+    size = int(np.prod([space.n for space in spaces], dtype=int))
+    phases = np.ones(size) if phases is None else np.asarray(phases)
+    if sources is None:
+        return diagonal_expectation_values(tensor, phases, spaces)
+    all_num_spaces = expectation_num_spaces(tensor)
+    num_shape = tuple(space.n for space in all_num_spaces)
+
+    if isinstance(tensor, PureStateTensor):
+        rest_spaces = tuple(space for space in tensor.ket_spaces if space not in spaces)
+        values = np.reshape(tensor.values(*all_num_spaces, *spaces, *rest_spaces), (*num_shape, size, -1))
+        return np.einsum('...ir,i,...ir->...', np.conj(values), phases, values[..., sources, :])
+    elif isinstance(tensor, MixedStateTensor):
+        reduced = reduced_density_values(tensor, spaces, all_num_spaces)
+        return np.sum(reduced[..., sources, np.arange(size)] * phases, axis=-1)
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+def reduced_density_values(
+        tensor: MixedStateTensor,
+        spaces: tuple[KetSpace, ...],
+        num_spaces: tuple[NumSpace, ...],
+) -> np.ndarray:
+    # the density matrix on spaces, traced over the others, shaped as [*num_shape, size, size]
+    rest_spaces = tuple(space for space in tensor.ket_spaces if space not in spaces)
+    num_shape = tuple(space.n for space in num_spaces)
+    size = int(np.prod([space.n for space in spaces], dtype=int))
+    rest_size = int(np.prod([space.n for space in rest_spaces], dtype=int))
+    values = tensor.values(*num_spaces, *spaces, *rest_spaces, *(space.ct for space in (*spaces, *rest_spaces)))
+    values = np.reshape(values, (*num_shape, size, rest_size, size, rest_size))
+    return np.einsum('...irjr->...ij', values)
+
+
+# Pauli strings
+
+def pauli_expectation_values(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        x_masks: np.ndarray,
+        z_masks: np.ndarray,
+        coefficients: np.ndarray,
+        spaces: Iterable[KetSpace],
+) -> np.ndarray:
+    # sum_t coefficients[t] <P_t>, where P_t = i^|x_t & z_t| X^x_t Z^z_t on the qubit spaces (masks as integers,
+    # with the first space as the most significant bit), so that P|c> = i^|x & z| (-1)^|z & c| |c ^ x>;
+    # the terms are grouped by their X mask, each group reading the state once
+    spaces = tuple(spaces)
+    if any(space.n != 2 for space in spaces):
+        raise ValueError(f"Pauli strings act on qubits only, got spaces={spaces}!")
+    n = len(spaces)
+    size = 1 << n
+    all_num_spaces = expectation_num_spaces(tensor)
+    num_shape = tuple(space.n for space in all_num_spaces)
+    indices = np.arange(size)
+
+    if isinstance(tensor, PureStateTensor):
+        # c -> c ^ x reverses the axes of the flipped qubits, so each group reads a view of the conjugated state
+        rest_spaces = tuple(space for space in tensor.ket_spaces if space not in spaces)
+        values = np.reshape(tensor.values(*all_num_spaces, *spaces, *rest_spaces), (*num_shape, *(2,) * n, -1))
+        conj_values = np.conj(values)
+
+        def pair_values(x: int) -> np.ndarray:
+            # s[c] = sum_r conj(psi[c ^ x, r]) psi[c, r]
+            flipped_axes = tuple(len(num_shape) + i for i in range(n) if (x >> (n - 1 - i)) & 1)
+            s = np.einsum('...r,...r->...', np.flip(conj_values, flipped_axes), values)
+            return np.reshape(s, (*num_shape, size))
+    elif isinstance(tensor, MixedStateTensor):
+        reduced = reduced_density_values(tensor, spaces, all_num_spaces)
+
+        def pair_values(x: int) -> np.ndarray:
+            # s[c] = rho[c, c ^ x]
+            return reduced[..., indices, indices ^ x]
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+    x_masks = np.asarray(x_masks, dtype=np.int64)
+    z_masks = np.asarray(z_masks, dtype=np.int64)
+    coefficients = np.asarray(coefficients)
+    phases = (1j ** (parity_count(x_masks & z_masks) % 4)) * coefficients
+
+    total = np.zeros(num_shape, dtype=complex)
+    order = np.argsort(x_masks, kind='stable')
+    group_starts = np.flatnonzero(np.diff(x_masks[order], prepend=-1))
+    for start, stop in zip(group_starts, (*group_starts[1:], len(order))):
+        terms = order[start:stop]
+        s = pair_values(int(x_masks[terms[0]]))
+        if 2 * len(terms) >= n:
+            # all the Z masks at once, in n passes over s
+            transformed = walsh_hadamard(s)
+            total += np.sum(transformed[..., z_masks[terms]] * phases[terms], axis=-1)
+        else:
+            for term in terms:
+                total += parity_sum(s, int(z_masks[term])) * phases[term]
+    return total
+
+
+def parity_sum(values: np.ndarray, z: int) -> np.ndarray:
+    # sum_c values[c] (-1)^|z & c| along the last axis (of length 2^n), folding one bit at a time from the lowest
+    *batch_shape, size = np.shape(values)
+    while size > 1:
+        values = np.reshape(values, (*batch_shape, size // 2, 2))
+        values = values[..., 0] - values[..., 1] if z & 1 else values[..., 0] + values[..., 1]
+        z >>= 1
+        size //= 2
+    return np.reshape(values, batch_shape)
+
+
+def walsh_hadamard(values: np.ndarray) -> np.ndarray:
+    # W[z] = sum_c values[c] (-1)^|z & c| along the last axis (of length 2^n), unnormalized
+    *batch_shape, size = np.shape(values)
+    h = 1
+    while h < size:
+        values = np.reshape(values, (*batch_shape, size // (2 * h), 2, h))
+        values = np.stack((values[..., 0, :] + values[..., 1, :], values[..., 0, :] - values[..., 1, :]), axis=-2)
+        h *= 2
+    return np.reshape(values, (*batch_shape, size))
+
+
+def parity_count(values: np.ndarray) -> np.ndarray:
+    # the number of set bits of non-negative integers
+    values = np.asarray(values, dtype=np.int64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    counts = np.zeros(np.shape(values), dtype=np.int64)
+    while np.any(values):
+        counts += values & 1
+        values = values >> 1
+    return counts
@@ -0,0 +1,79 @@
+from typing import Iterable, Union
+
+import numpy as np
+
+from braandket import KetSpace, MixedStateTensor, NumSpace, PureStateTensor
+from .utils import broadcast_num_spaces, index_spaces
+
+
+def apply_matrix_on_state_tensor(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        matrix: np.ndarray,
+        spaces: Iterable[KetSpace],
+        num_spaces: Iterable[NumSpace] = (),
+) -> Union[PureStateTensor, MixedStateTensor]:
+    if isinstance(tensor, PureStateTensor):
+        return apply_matrix_on_pure_state(tensor, matrix, spaces, num_spaces)
+    elif isinstance(tensor, MixedStateTensor):
+        return apply_matrix_on_mixed_state(tensor, matrix, spaces, num_spaces)
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+def apply_matrix_on_pure_state(
+        tensor: PureStateTensor,
+        matrix: np.ndarray,
+        spaces: Iterable[KetSpace],
+        num_spaces: Iterable[NumSpace] = (),
+) -> PureStateTensor:
+    num_spaces = tuple(num_spaces)
+    tensor = broadcast_num_spaces(tensor, num_spaces)
+    axes = index_spaces(tensor, spaces)
+    num_axes = index_spaces(tensor, num_spaces)
+    values = apply_matrix_on_values(tensor.values(), matrix, axes, num_axes)
+    return PureStateTensor(values, tensor.spaces, tensor.backend)
+
+
+def apply_matrix_on_mixed_state(
+        tensor: MixedStateTensor,
+        matrix: np.ndarray,
+        spaces: Iterable[KetSpace],
+        num_spaces: Iterable[NumSpace] = (),
+) -> MixedStateTensor:
+    spaces = tuple(spaces)
+    num_spaces = tuple(num_spaces)
+    tensor = broadcast_num_spaces(tensor, num_spaces)
+    ket_axes = index_spaces(tensor, spaces)
+    bra_axes = index_spaces(tensor, (space.ct for space in spaces))
+    num_axes = index_spaces(tensor, num_spaces)
+    values = apply_matrix_on_values(tensor.values(), matrix, ket_axes, num_axes)
+    values = apply_matrix_on_values(values, np.conj(matrix), bra_axes, num_axes)
+    return MixedStateTensor(values, tensor.spaces, tensor.backend)
+
+
+def apply_matrix_on_values(
+        values: np.ndarray,
+        matrix: np.ndarray,
+        axes: Iterable[int],
+        num_axes: Iterable[int] = (),
+) -> np.ndarray:
+    axes = tuple(axes)
+    num_axes = tuple(num_axes)
+    k = len(axes)
+    values_shape = np.shape(values)
+    shape = tuple(values_shape[axis] for axis in axes)
+    num_shape = tuple(values_shape[axis] for axis in num_axes)
+    operator = np.reshape(matrix, num_shape + shape + shape)
+
+    if len(num_axes) == 0:
+        # contracting only the target axes, the result has them in front
+        values = np.tensordot(operator, values, axes=(tuple(range(k, 2 * k)), axes))
+        return np.moveaxis(values, tuple(range(k)), axes)
+
+    # batched operator, its num axes are shared with the values
+    ndim = len(values_shape)
+    out_labels = tuple(range(ndim, ndim + k))
+    result_labels = list(range(ndim))
+    for axis, out_label in zip(axes, out_labels):
+        result_labels[axis] = out_label
+    return np.einsum(operator, (*num_axes, *out_labels, *axes), values, tuple(range(ndim)), result_labels)
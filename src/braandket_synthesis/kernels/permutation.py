@@ -0,0 +1,107 @@
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+from braandket import KetSpace, MixedStateTensor, PureStateTensor
+from .utils import index_spaces
+
+
+def apply_permutation_on_state_tensor(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        sources: Optional[np.ndarray],
+        phases: Optional[np.ndarray],
+        spaces: Iterable[KetSpace],
+) -> Union[PureStateTensor, MixedStateTensor]:
+    if isinstance(tensor, PureStateTensor):
+        return apply_permutation_on_pure_state(tensor, sources, phases, spaces)
+    elif isinstance(tensor, MixedStateTensor):
+        return apply_permutation_on_mixed_state(tensor, sources, phases, spaces)
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+def apply_permutation_on_pure_state(
+        tensor: PureStateTensor,
+        sources: Optional[np.ndarray],
+        phases: Optional[np.ndarray],
+        spaces: Iterable[KetSpace],
+) -> PureStateTensor:
+    axes = index_spaces(tensor, spaces)
+    values = apply_permutation_on_values(tensor.values(), sources, phases, axes)
+    return PureStateTensor(values, tensor.spaces, tensor.backend)
+
+
+def apply_permutation_on_mixed_state(
+        tensor: MixedStateTensor,
+        sources: Optional[np.ndarray],
+        phases: Optional[np.ndarray],
+        spaces: Iterable[KetSpace],
+) -> MixedStateTensor:
+    spaces = tuple(spaces)
+    ket_axes = index_spaces(tensor, spaces)
+    bra_axes = index_spaces(tensor, (space.ct for space in spaces))
+    values = apply_permutation_on_values(tensor.values(), sources, phases, ket_axes)
+    values = apply_permutation_on_values(values, sources, None if phases is None else np.conj(phases), bra_axes)
+    return MixedStateTensor(values, tensor.spaces, tensor.backend)
+
+
+def apply_permutation_on_values(
+        values: np.ndarray,
+        sources: Optional[np.ndarray],
+        phases: Optional[np.ndarray],
+        axes: Iterable[int],
+) -> np.ndarray:
+    # new_values[i] = phases[i] * values[sources[i]] on the flattened axes, a gather without multiply-adds
+    if sources is None and phases is None:
+        return values
+    axes = tuple(axes)
+    front = tuple(range(len(axes)))
+    values = np.moveaxis(values, axes, front)
+    shape = np.shape(values)
+    values = np.reshape(values, (int(np.prod(shape[:len(axes)], dtype=int)), -1))
+    if sources is not None:
+        values = values[sources]
+    if phases is not None:
+        values = values * np.reshape(phases, (-1, 1))
+    return np.moveaxis(np.reshape(values, shape), front, axes)
+
+
+def monomial_form(matrix) -> Optional[tuple[Optional[np.ndarray], Optional[np.ndarray]]]:
+    # (sources, phases) such that matrix[i, sources[i]] = phases[i] is the only non-zero of row i,
+    # sources is None for the identity and phases is None if they are all exactly 1,
+    # sparse matrices (with tocoo()) are accepted
+    if hasattr(matrix, 'tocoo'):
+        coo = matrix.tocoo()
+        rows, cols, data = np.asarray(coo.row), np.asarray(coo.col), np.asarray(coo.data)
+        nonzero = data != 0
+        rows, cols, data = rows[nonzero], cols[nonzero], data[nonzero]
+        n = coo.shape[-1]
+    else:
+        matrix = np.asarray(matrix)
+        if np.ndim(matrix) != 2:
+            return None
+        rows, cols = np.nonzero(matrix)
+        data = matrix[rows, cols]
+        n = np.shape(matrix)[-1]
+
+    if matrix.shape[-2] != n or len(rows) != n:
+        return None
+    sources = np.full((n,), -1, dtype=np.intp)
+    sources[rows] = cols
+    if np.any(sources < 0) or len(np.unique(sources)) != n:
+        return None
+
+    phases = np.zeros((n,), dtype=data.dtype)
+    phases[rows] = data
+    return simplify_monomial(sources, phases)
+
+
+def simplify_monomial(
+        sources: Optional[np.ndarray],
+        phases: Optional[np.ndarray],
+) -> tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    if sources is not None and np.array_equal(sources, np.arange(len(sources))):
+        sources = None
+    if phases is not None and np.all(phases == 1):
+        phases = None
+    return sources, phases
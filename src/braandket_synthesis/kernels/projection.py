@@ -0,0 +1,285 @@
+from typing import Iterable, Union
+
+import numpy as np
+
+from braandket import KetSpace, MixedStateTensor, NumSpace, PureStateTensor
+from braandket_synthesis.utils import get_rng
+from .utils import broadcast_on_axes, index_spaces
+
+
+def collapse_state_tensor(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: Iterable[KetSpace],
+        values: Iterable[Union[int, np.ndarray]],
+        prob: Union[float, np.ndarray],
+        num_spaces: Iterable[NumSpace] = (),
+) -> Union[PureStateTensor, MixedStateTensor]:
+    if isinstance(tensor, PureStateTensor):
+        return collapse_pure_state(tensor, spaces, values, prob, num_spaces)
+    elif isinstance(tensor, MixedStateTensor):
+        return collapse_mixed_state(tensor, spaces, values, prob, num_spaces)
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+def collapse_pure_state(
+        tensor: PureStateTensor,
+        spaces: Iterable[KetSpace],
+        values: Iterable[Union[int, np.ndarray]],
+        prob: Union[float, np.ndarray],
+        num_spaces: Iterable[NumSpace] = (),
+) -> PureStateTensor:
+    values = tuple(values)
+    num_axes = index_spaces(tensor, num_spaces)
+    axes = index_spaces(tensor, spaces)
+    if all(np.ndim(value) == 0 for value in values):
+        new_values = embed_on_values(tensor.values(), axes, values, inverse_or_zero(np.sqrt(prob)), num_axes)
+        return PureStateTensor(new_values, tensor.spaces, tensor.backend)
+    new_values = project_on_values(tensor.values(), axes, values, num_axes)
+    new_values = new_values * inverse_or_zero(np.sqrt(broadcast_on_axes(prob, np.shape(new_values), num_axes)))
+    return PureStateTensor(new_values, tensor.spaces, tensor.backend)
+
+
+def collapse_mixed_state(
+        tensor: MixedStateTensor,
+        spaces: Iterable[KetSpace],
+        values: Iterable[Union[int, np.ndarray]],
+        prob: Union[float, np.ndarray],
+        num_spaces: Iterable[NumSpace] = (),
+) -> MixedStateTensor:
+    spaces = tuple(spaces)
+    values = tuple(values)
+    num_axes = index_spaces(tensor, num_spaces)
+    axes = index_spaces(tensor, spaces)
+    bra_axes = index_spaces(tensor, (space.ct for space in spaces))
+    if all(np.ndim(value) == 0 for value in values):
+        new_values = embed_on_values(
+            tensor.values(), (*axes, *bra_axes), (*values, *values), inverse_or_zero(prob), num_axes)
+        return MixedStateTensor(new_values, tensor.spaces, tensor.backend)
+    new_values = project_on_values(tensor.values(), axes, values, num_axes)
+    new_values = project_on_values(new_values, bra_axes, values, num_axes)
+    new_values = new_values * inverse_or_zero(broadcast_on_axes(prob, np.shape(new_values), num_axes))
+    return MixedStateTensor(new_values, tensor.spaces, tensor.backend)
+
+
+def project_on_values(
+        values: np.ndarray,
+        axes: Iterable[int],
+        indices: Iterable[Union[int, np.ndarray]],
+        num_axes: Iterable[int] = (),
+) -> np.ndarray:
+    # zeroing all the entries except those with the specified indices on axes
+    num_axes = tuple(num_axes)
+    shape = np.shape(values)
+    mask = True
+    for axis, index in zip(axes, indices):
+        axis_range = broadcast_on_axes(np.arange(shape[axis]), shape, (axis,))
+        axis_index = broadcast_on_axes(index, shape, num_axes if np.ndim(index) > 0 else ())
+        mask = mask & (axis_range == axis_index)
+    return np.where(mask, values, 0)
+
+
+def embed_on_values(
+        values: np.ndarray,
+        axes: Iterable[int],
+        indices: Iterable[int],
+        scale: Union[float, np.ndarray],
+        num_axes: Iterable[int] = (),
+) -> np.ndarray:
+    # zeroing all the entries except the block with the (scalar) indices on axes, which is multiplied by scale,
+    # only the block is read and written, instead of masking the whole values
+    block = block_index(np.ndim(values), axes, indices)
+    selected = values[block]
+    new_values = np.zeros(np.shape(values), dtype=np.result_type(values, scale))
+    new_values[block] = selected * broadcast_on_axes(scale, np.shape(selected), tuple(num_axes))
+    return new_values
+
+
+def block_index(ndim: int, axes: Iterable[int], indices: Iterable[int]) -> tuple[slice, ...]:
+    # selects the block with the (scalar) indices on axes, keeping the axes as of size 1
+    block = [slice(None)] * ndim
+    for axis, index in zip(axes, indices):
+        block[axis] = slice(int(index), int(index) + 1)
+    return tuple(block)
+
+
+def inverse_or_zero(values: Union[float, np.ndarray]) -> np.ndarray:
+    # 1 / values, but 0 where values is 0, so that the outcomes of zero probability collapse to zero states
+    values = np.asarray(values)
+    return np.divide(1, values, where=values != 0, out=np.zeros(np.shape(values), dtype=np.result_type(values, 1.0)))
+
+
+def block_probabilities(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: Iterable[KetSpace],
+        values: Iterable[int],
+        num_spaces: Iterable[NumSpace] = (),
+) -> np.ndarray:
+    # the (unnormalized) probability of the (scalar) values on spaces, shaped as [*num_spaces],
+    # reading only the block that embed_on_values keeps when collapsing
+    spaces = tuple(spaces)
+    values = tuple(values)
+    num_spaces = tuple(num_spaces)
+    num_axes = index_spaces(tensor, num_spaces)
+    if isinstance(tensor, PureStateTensor):
+        selected = tensor.values()[block_index(len(tensor.spaces), index_spaces(tensor, spaces), values)]
+        other_axes = tuple(axis for axis in range(np.ndim(selected)) if axis not in num_axes)
+        probs = np.sum(np.real(np.conj(selected) * selected), axis=other_axes)
+        return np.transpose(probs, np.argsort(np.argsort(num_axes)))
+    elif isinstance(tensor, MixedStateTensor):
+        axes = (*index_spaces(tensor, spaces), *index_spaces(tensor, (space.ct for space in spaces)))
+        selected = tensor.values()[block_index(len(tensor.spaces), axes, (*values, *values))]
+        rest_spaces = tuple(space for space in tensor.ket_spaces if space not in spaces)
+        rest_axes = index_spaces(tensor, rest_spaces)
+        rest_bra_axes = index_spaces(tensor, (space.ct for space in rest_spaces))
+        num_shape = tuple(space.n for space in num_spaces)
+        rest_size = int(np.prod([space.n for space in rest_spaces], dtype=int))
+        selected = np.transpose(selected, (*num_axes, *rest_axes, *rest_bra_axes, *axes))
+        selected = np.reshape(selected, (*num_shape, rest_size, rest_size))
+        return np.real(np.trace(selected, axis1=-2, axis2=-1))
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+def norm_values(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        num_spaces: Iterable[NumSpace] = (),
+) -> np.ndarray:
+    # the squared norm (trace for mixed states) for each batch, the axes are ordered as num_spaces
+    num_spaces = tuple(num_spaces)
+    num_shape = tuple(space.n for space in num_spaces)
+    if isinstance(tensor, PureStateTensor):
+        # reducing in the original axes order avoids copying a transposed state
+        values = tensor.values()
+        if len(num_spaces) == 0:
+            return np.real(np.vdot(values, values))
+        num_axes = index_spaces(tensor, num_spaces)
+        other_axes = tuple(axis for axis in range(np.ndim(values)) if axis not in num_axes)
+        squared = np.sum(np.real(np.conj(values) * values), axis=other_axes)
+        return np.transpose(squared, np.argsort(np.argsort(num_axes)))
+    elif isinstance(tensor, MixedStateTensor):
+        ket_spaces = tensor.ket_spaces
+        size = int(np.prod([space.n for space in ket_spaces]))
+        values = tensor.values(*num_spaces, *ket_spaces, *(space.ct for space in ket_spaces))
+        values = np.reshape(values, (*num_shape, size, size))
+        return np.real(np.trace(values, axis1=-2, axis2=-1))
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+def marginal_probabilities(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: Iterable[KetSpace],
+        num_spaces: Iterable[NumSpace] = (),
+) -> np.ndarray:
+    # the (unnormalized) probabilities of outcomes on spaces, shaped as [*num_spaces, *spaces]
+    spaces = tuple(spaces)
+    num_spaces = tuple(num_spaces)
+    num_shape = tuple(space.n for space in num_spaces)
+    shape = tuple(space.n for space in spaces)
+    size = int(np.prod(shape, dtype=int))
+    if isinstance(tensor, PureStateTensor):
+        values = np.reshape(tensor.values(*num_spaces, *spaces), (*num_shape, size, -1))
+        probs = np.sum(np.real(np.conj(values) * values), axis=-1)
+    elif isinstance(tensor, MixedStateTensor):
+        rest_spaces = tuple(space for space in tensor.ket_spaces if space not in spaces)
+        values = tensor.values(*num_spaces, *spaces, *rest_spaces, *(space.ct for space in (*spaces, *rest_spaces)))
+        rest_size = int(np.prod([space.n for space in rest_spaces], dtype=int))
+        values = np.reshape(values, (*num_shape, size, rest_size, size, rest_size))
+        probs = np.real(np.einsum('...ijij->...i', values))
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+    return np.reshape(probs, (*num_shape, *shape))
+
+
+def choose_values(probs: np.ndarray, num_ndim: int) -> tuple[tuple[np.ndarray, ...], np.ndarray]:
+    # probs: [*batch_shape, *values_shape], one value is chosen for each batch
+    batch_shape, values_shape = np.shape(probs)[:num_ndim], np.shape(probs)[num_ndim:]
+    probs = np.reshape(probs, (*batch_shape, -1))
+    probs = probs / np.sum(probs, axis=-1, keepdims=True)
+
+    # randoms in [0, cdf[-1]), counting cdf <= randoms as np.searchsorted(..., side='right') does for each batch,
+    # so that the outcomes with zero probability (empty intervals in cdf) are never chosen
+    cdf = np.cumsum(probs, axis=-1)
+    randoms = get_rng().random((*batch_shape, 1)) * cdf[..., -1:]
+    last_i = np.shape(probs)[-1] - 1 - np.argmax(probs[..., ::-1] > 0, axis=-1)  # in case the product rounds up
+    case_i = np.minimum(np.sum(cdf <= randoms, axis=-1), last_i)
+
+    values = np.unravel_index(case_i, values_shape)
+    prob = np.take_along_axis(probs, case_i[..., None], axis=-1)[..., 0]
+    return tuple(values), prob
+
+
+# batched outcomes
+
+def outcome_indices(spaces: Iterable[KetSpace], outcomes: np.ndarray) -> np.ndarray:
+    # the flat indices of outcomes ([k, len(spaces)]) in the [*spaces] shaped probabilities
+    shape = tuple(space.n for space in spaces)
+    outcomes = np.asarray(outcomes, dtype=np.intp)
+    if np.ndim(outcomes) != 2 or np.shape(outcomes)[1] != len(shape):
+        raise ValueError(f"outcomes is expected to have shape (k, {len(shape)}), got {np.shape(outcomes)}!")
+    return np.ravel_multi_index(tuple(outcomes.T), shape)
+
+
+def outcome_probabilities(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: Iterable[KetSpace],
+        outcomes: np.ndarray,
+        num_spaces: Iterable[NumSpace] = (),
+) -> np.ndarray:
+    # the (unnormalized) probabilities of k outcomes ([k, len(spaces)]), shaped as [*num_spaces, k],
+    # gathered from the marginal probabilities computed in one pass
+    spaces = tuple(spaces)
+    num_spaces = tuple(num_spaces)
+    num_shape = tuple(space.n for space in num_spaces)
+    probs = np.reshape(marginal_probabilities(tensor, spaces, num_spaces), (*num_shape, -1))
+    return probs[..., outcome_indices(spaces, outcomes)]
+
+
+def collapse_outcomes(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: Iterable[KetSpace],
+        outcomes: np.ndarray,
+        probs: np.ndarray,
+        outcome_space: NumSpace,
+        num_spaces: Iterable[NumSpace] = (),
+) -> Union[PureStateTensor, MixedStateTensor]:
+    # the states collapsed on each of the k outcomes, batched along outcome_space (of size k),
+    # with spaces ordered as [*num_spaces, outcome_space, *spaces, *other_spaces],
+    # probs is shaped as [*num_spaces, k], the outcomes of zero probability result in zero states
+    spaces = tuple(spaces)
+    num_spaces = tuple(num_spaces)
+    num_shape = tuple(space.n for space in num_spaces)
+    indices = outcome_indices(spaces, outcomes)
+    k = len(indices)
+    if outcome_space.n != k:
+        raise ValueError(f"outcome_space={outcome_space} does not match the number of outcomes {k}!")
+    size = int(np.prod([space.n for space in spaces], dtype=int))
+    rest_spaces = tuple(space for space in tensor.ket_spaces if space not in spaces)
+    rest_size = int(np.prod([space.n for space in rest_spaces], dtype=int))
+    probs = np.asarray(probs)
+    nonzero = probs > 0
+
+    if isinstance(tensor, PureStateTensor):
+        values = np.reshape(tensor.values(*num_spaces, *spaces, *rest_spaces), (*num_shape, size, rest_size))
+        scale = np.divide(1, np.sqrt(probs), where=nonzero, out=np.zeros(np.shape(probs)))
+        selected = values[..., indices, :] * scale[..., None]  # [*num_shape, k, rest_size]
+        new_values = np.zeros((*num_shape, k, size, rest_size), dtype=np.result_type(values, scale))
+        new_values[..., np.arange(k), indices, :] = selected
+        new_spaces = (*num_spaces, outcome_space, *spaces, *rest_spaces)
+        new_shape = tuple(space.n for space in new_spaces)
+        return PureStateTensor(np.reshape(new_values, new_shape), new_spaces, tensor.backend)
+    elif isinstance(tensor, MixedStateTensor):
+        bra_spaces = tuple(space.ct for space in spaces)
+        rest_bra_spaces = tuple(space.ct for space in rest_spaces)
+        values = tensor.values(*num_spaces, *spaces, *bra_spaces, *rest_spaces, *rest_bra_spaces)
+        values = np.reshape(values, (*num_shape, size, size, rest_size, rest_size))
+        scale = np.divide(1, probs, where=nonzero, out=np.zeros(np.shape(probs)))
+        selected = values[..., indices, indices, :, :] * scale[..., None, None]  # [*num_shape, k, rest, rest]
+        new_values = np.zeros((*num_shape, k, size, size, rest_size, rest_size), dtype=np.result_type(values, scale))
+        new_values[..., np.arange(k), indices, indices, :, :] = selected
+        new_spaces = (*num_spaces, outcome_space, *spaces, *bra_spaces, *rest_spaces, *rest_bra_spaces)
+        new_shape = tuple(space.n for space in new_spaces)
+        return MixedStateTensor(np.reshape(new_values, new_shape), new_spaces, tensor.backend)
+    else:
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
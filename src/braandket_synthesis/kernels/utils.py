@@ -0,0 +1,68 @@
+from typing import Callable, Iterable, Union
+
+import numpy as np
+
+from braandket import MixedStateTensor, NumSpace, PureStateTensor
+
+
+def index_spaces(tensor: Union[PureStateTensor, MixedStateTensor], spaces: Iterable) -> tuple[int, ...]:
+    tensor_spaces = tensor.spaces
+    axes = []
+    for space in spaces:
+        try:
+            axes.append(tensor_spaces.index(space))
+        except ValueError:
+            raise ValueError(f"Space {space} is not found in the tensor!") from None
+    return tuple(axes)
+
+
+def apply_on_ket_side(
+        tensor: MixedStateTensor,
+        func: Callable[[PureStateTensor], PureStateTensor],
+) -> MixedStateTensor:
+    # the bra spaces are relabeled as num spaces, so that func sees a (batched) pure state
+    bra_num_spaces = {space.ct: NumSpace(space.n) for space in tensor.ket_spaces}
+    pure_spaces = tuple(bra_num_spaces.get(space, space) for space in tensor.spaces)
+    pure_tensor = func(PureStateTensor(tensor.values(), pure_spaces, tensor.backend))
+    if not isinstance(pure_tensor, PureStateTensor):
+        raise TypeError(f"Expected the one-sided application to result in PureStateTensor, got {type(pure_tensor)}!")
+
+    num_bra_spaces = {num_space: bra_space for bra_space, num_space in bra_num_spaces.items()}
+    mixed_spaces = tuple(num_bra_spaces.get(space, space) for space in pure_tensor.spaces)
+    return MixedStateTensor(pure_tensor.values(), mixed_spaces, tensor.backend)
+
+
+def apply_on_both_sides(
+        tensor: MixedStateTensor,
+        func: Callable[[PureStateTensor], PureStateTensor],
+) -> MixedStateTensor:
+    # rho -> A rho A^dagger = (A (A rho)^dagger)^dagger
+    tensor = apply_on_ket_side(tensor, func)
+    tensor = apply_on_ket_side(MixedStateTensor.of(tensor.ct), func)
+    return MixedStateTensor.of(tensor.ct)
+
+
+def broadcast_num_spaces(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        num_spaces: Iterable[NumSpace],
+) -> Union[PureStateTensor, MixedStateTensor]:
+    missing_spaces = tuple(space for space in num_spaces if space not in tensor.spaces)
+    if len(missing_spaces) == 0:
+        return tensor
+
+    # the new num spaces are prepended as broadcast (read-only) axes
+    values = tensor.values()
+    values_shape = np.shape(values)
+    values = np.reshape(values, (1,) * len(missing_spaces) + values_shape)
+    values = np.broadcast_to(values, tuple(space.n for space in missing_spaces) + values_shape)
+    return type(tensor)(values, (*missing_spaces, *tensor.spaces), tensor.backend)
+
+
+def broadcast_on_axes(array: np.ndarray, shape: tuple[int, ...], axes: Iterable[int]) -> np.ndarray:
+    axes = tuple(axes)
+    array = np.reshape(array, tuple(shape[axis] for axis in axes))
+
+    # reordering the axes as they are in shape, then inserting the broadcast axes
+    array = np.transpose(array, np.argsort(axes))
+    broadcast_shape = tuple((size if axis in axes else 1) for axis, size in enumerate(shape))
+    return np.reshape(array, broadcast_shape)
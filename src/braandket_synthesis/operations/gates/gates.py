@@ -3,6 +3,7 @@ from typing import Any, Optional, Union
 
 import numpy as np
 
+from braandket import NumSpace, NumericTensor
 from braandket_synthesis.operations.measurement import DesiredMeasurement, ProjectiveMeasurement
 from braandket_synthesis.operations.numeric import QubitsMatrixOperation
 from braandket_synthesis.operations.structural import Controlled
@@ -77,16 +78,16 @@ NOT = X
 # single qubit gates with parameter
 
 class Rx(QuantumGateWithParam):
-    def __init__(self, theta: Union[np.ndarray, float], *, name: Optional[str] = None):
+    def __init__(self, theta: Union[NumericTensor, np.ndarray, float], *, name: Optional[str] = None):
         self._theta = theta
-        half_theta = self.theta / 2
-        super().__init__(np.asarray([
+        half_theta = param_values(theta) / 2
+        super().__init__(batched_matrix([
             [np.cos(half_theta) * +1, np.sin(half_theta) * -1j],
             [np.sin(half_theta) * -1j, np.cos(half_theta) * +1]
-        ]), name=name)
+        ]), num_spaces=param_num_spaces(theta), name=name)
 
     @property
-    def theta(self) -> Union[np.ndarray, float]:
+    def theta(self) -> Union[NumericTensor, np.ndarray, float]:
         return self._theta
 
     @property
@@ -95,16 +96,16 @@ class Rx(QuantumGateWithParam):
 
 
 class Ry(QuantumGateWithParam):
-    def __init__(self, theta: Union[np.ndarray, float], *, name: Optional[str] = None):
+    def __init__(self, theta: Union[NumericTensor, np.ndarray, float], *, name: Optional[str] = None):
         self._theta = theta
-        half_theta = self.theta / 2
-        super().__init__(np.asarray([
+        half_theta = param_values(theta) / 2
+        super().__init__(batched_matrix([
             [np.cos(half_theta) * +1, np.sin(half_theta) * -1],
             [np.sin(half_theta) * +1, np.cos(half_theta) * +1]
-        ]), name=name)
+        ]), num_spaces=param_num_spaces(theta), name=name)
 
     @property
-    def theta(self) -> Union[np.ndarray, float]:
+    def theta(self) -> Union[NumericTensor, np.ndarray, float]:
         return self._theta
 
     @property
@@ -113,16 +114,17 @@ class Ry(QuantumGateWithParam):
 
 
 class Rz(QuantumGateWithParam):
-    def __init__(self, theta: Union[np.ndarray, float], *, name: Optional[str] = None):
+    def __init__(self, theta: Union[NumericTensor, np.ndarray, float], *, name: Optional[str] = None):
         self._theta = theta
-        half_theta_j = self.theta / 2 * 1j
-        super().__init__(np.asarray([
-            [np.exp(-half_theta_j), 0],
-            [0, np.exp(+half_theta_j)]
-        ]), name=name)
+        half_theta_j = param_values(theta) / 2 * 1j
+        zero = np.zeros_like(half_theta_j)
+        super().__init__(batched_matrix([
+            [np.exp(-half_theta_j), zero],
+            [zero, np.exp(+half_theta_j)]
+        ]), num_spaces=param_num_spaces(theta), name=name)
 
     @property
-    def theta(self) -> Union[np.ndarray, float]:
+    def theta(self) -> Union[NumericTensor, np.ndarray, float]:
         return self._theta
 
     @property
@@ -130,6 +132,25 @@ class Rz(QuantumGateWithParam):
         return {'theta': self.theta}
 
 
+# batched parameters
+
+def param_values(param: Union[NumericTensor, np.ndarray, float]) -> np.ndarray:
+    if isinstance(param, NumericTensor):
+        return np.asarray(param.values())
+    return np.asarray(param)
+
+
+def param_num_spaces(param: Union[NumericTensor, np.ndarray, float]) -> Optional[tuple[NumSpace, ...]]:
+    if isinstance(param, NumericTensor):
+        return param.spaces
+    return None  # new num spaces are created for the batch axes (if any)
+
+
+def batched_matrix(rows: list[list[np.ndarray]]) -> np.ndarray:
+    # moving the matrix axes behind the batch axes of the elements
+    return np.moveaxis(np.asarray(rows), (0, 1), (-2, -1))
+
+
 # controlled qubit gates
 
 class CX(Controlled[X]):
@@ -1,3 +1,3 @@
-from .desired import DesiredMeasurement
+from .desired import DesiredMeasurement, desired_measure_batched
 from .projective import ProjectiveMeasurement
 from .result import MeasurementResult
@@ -1,9 +1,13 @@
 from typing import Iterable, Optional, Union
 
-from braandket import MixedStateTensor, PureStateTensor, prod
+import numpy as np
+
+from braandket import MixedStateTensor, NumSpace, PureStateTensor
 from braandket_synthesis.basics import QOperation
-from braandket_synthesis.traits import KetSpaces, Measure
-from braandket_synthesis.utils import iter_structure
+from braandket_synthesis.kernels import block_probabilities, collapse_mixed_state, collapse_outcomes, \
+    collapse_pure_state, outcome_probabilities
+from braandket_synthesis.traits import IsClifford, KetSpaces, Measure, ToFingerprint, fingerprint_axes
+from braandket_synthesis.utils import SpaceLayout, iter_structure, layout_of, stable_digest
 from .result import MeasurementResult
 
 
@@ -16,22 +20,35 @@ class DesiredMeasurement(QOperation):
     def values(self) -> Union[int, tuple]:
         return self._values
 
+    def structural_items(self) -> Optional[tuple]:
+        return stable_digest(self.values),
+
 
 class DesiredMeasurementMeasure(Measure[DesiredMeasurement, MeasurementResult[DesiredMeasurement]]):
     def measure_on_state_tensor(self,
             tensor: Union[PureStateTensor, MixedStateTensor],
             spaces: KetSpaces
     ) -> tuple[Union[PureStateTensor, MixedStateTensor], MeasurementResult[DesiredMeasurement]]:
-        spaces = tuple(iter_structure(spaces))
-        values = tuple(iter_structure(self.operation.values))
-        tensor, prob = desired_measure(tensor, spaces, values)
+        values = self.get_or_set_cache('flat_values', lambda: tuple(iter_structure(self.operation.values)))
+        tensor, prob = desired_measure(tensor, layout_of(spaces).spaces, values)
         return tensor, MeasurementResult(values=self.operation.values, probability=prob, operation=self.operation)
 
 
+class DesiredMeasurementIsClifford(IsClifford[DesiredMeasurement]):
+    def is_clifford(self) -> Optional[bool]:
+        return True
+
+
+class DesiredMeasurementToFingerprint(ToFingerprint[DesiredMeasurement]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        values = self.get_or_set_cache('flat_values', lambda: tuple(iter_structure(self.operation.values)))
+        return stable_digest('desired', values, fingerprint_axes(spaces, layout))
+
+
 def desired_measure(
         tensor: Union[PureStateTensor, MixedStateTensor],
         spaces: Iterable[KetSpaces], values: Iterable[int],
-) -> tuple[Union[PureStateTensor, MixedStateTensor], float]:
+) -> tuple[Union[PureStateTensor, MixedStateTensor], Union[float, np.ndarray]]:
     if isinstance(tensor, PureStateTensor):
         tensor, prob = desired_measure_on_pure_state(tensor, spaces, values)
     elif isinstance(tensor, MixedStateTensor):
@@ -45,38 +62,57 @@ def desired_measure_on_pure_state(
         tensor: PureStateTensor,
         spaces: Iterable[KetSpaces],
         values: Iterable[int],
-) -> tuple[PureStateTensor, float]:
+) -> tuple[PureStateTensor, Union[float, np.ndarray]]:
     spaces = tuple(spaces)
     values = tuple(values)
+    num_spaces = tuple(space for space in tensor.spaces if isinstance(space, NumSpace))
 
-    component = tensor.component(((space, value) for space, value in zip(spaces, values)))
-    prob = float(component.norm())
-    component = component.normalize()
+    prob = block_probabilities(tensor, spaces, values, num_spaces)
+    tensor = collapse_pure_state(tensor, spaces, values, prob, num_spaces)
 
-    ket_tensor = PureStateTensor.of(prod(*(
-        space.eigenstate(value, backend=tensor.backend)
-        for space, value in zip(spaces, values)
-    )))
-    tensor = PureStateTensor.of(ket_tensor @ component)
-
-    return tensor, prob
+    return tensor, batched_or_scalar(prob)
 
 
 def desired_measure_on_mixed_state(
         tensor: MixedStateTensor,
         spaces: Iterable[KetSpaces], values: Iterable[int],
-) -> tuple[MixedStateTensor, float]:
+) -> tuple[MixedStateTensor, Union[float, np.ndarray]]:
     spaces = tuple(spaces)
     values = tuple(values)
+    num_spaces = tuple(space for space in tensor.spaces if isinstance(space, NumSpace))
 
-    component = tensor.component(((space, value) for space, value in zip(spaces, values)))
-    prob = float(component.norm())
-    component = component.normalize()
+    prob = block_probabilities(tensor, spaces, values, num_spaces)
+    tensor = collapse_mixed_state(tensor, spaces, values, prob, num_spaces)
 
-    ket_tensor = PureStateTensor.of(prod(*(
-        space.eigenstate(value, backend=tensor.backend)
-        for space, value in zip(spaces, values)
-    )))
-    tensor = MixedStateTensor.of(ket_tensor @ component @ ket_tensor.ct)
+    return tensor, batched_or_scalar(prob)
 
-    return tensor, prob
+
+def desired_measure_batched(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: KetSpaces,
+        outcomes: Iterable[Union[int, tuple]], *,
+        collapse: bool = False,
+        outcome_space: Optional[NumSpace] = None,
+) -> tuple[Optional[Union[PureStateTensor, MixedStateTensor]], np.ndarray]:
+    # the probabilities of many desired outcomes at once, shaped as [*num_spaces, k] (num_spaces of tensor),
+    # each outcome is structured as spaces, or a row of an array shaped as [k, number of flat spaces];
+    # if collapse, the collapsed states are also returned, batched along outcome_space (created if not given)
+    spaces = layout_of(spaces).spaces
+    if isinstance(outcomes, np.ndarray) and np.ndim(outcomes) == 2:
+        outcomes = outcomes.astype(np.intp, copy=False)
+    else:
+        outcomes = np.asarray([tuple(iter_structure(outcome)) for outcome in outcomes], dtype=np.intp)
+        outcomes = np.reshape(outcomes, (-1, len(spaces)))
+    num_spaces = tuple(space for space in tensor.spaces if isinstance(space, NumSpace))
+
+    probs = outcome_probabilities(tensor, spaces, outcomes, num_spaces)
+    if not collapse:
+        return None, probs
+    if outcome_space is None:
+        outcome_space = NumSpace(len(outcomes))
+    tensor = collapse_outcomes(tensor, spaces, outcomes, probs, outcome_space, num_spaces)
+    return tensor, probs
+
+
+def batched_or_scalar(prob: np.ndarray) -> Union[float, np.ndarray]:
+    return float(prob) if np.ndim(prob) == 0 else prob
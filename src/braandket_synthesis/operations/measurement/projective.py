@@ -1,17 +1,19 @@
-import itertools
-from typing import Iterable, Union
+from typing import Iterable, Optional, Union
 
 import numpy as np
 
-from braandket import MixedStateTensor, PureStateTensor, prod
+from braandket import MixedStateTensor, NumSpace, PureStateTensor
 from braandket_synthesis.basics import QOperation
-from braandket_synthesis.traits import KetSpaces, Measure
-from braandket_synthesis.utils import iter_structure, restore_structure
+from braandket_synthesis.kernels import choose_values, collapse_mixed_state, collapse_pure_state, \
+    marginal_probabilities
+from braandket_synthesis.traits import IsClifford, KetSpaces, Measure, ToFingerprint, fingerprint_axes
+from braandket_synthesis.utils import SpaceLayout, layout_of, stable_digest
 from .result import MeasurementResult
 
 
 class ProjectiveMeasurement(QOperation):
-    pass
+    def structural_items(self) -> Optional[tuple]:
+        return ()
 
 
 class ProjectiveMeasurementMeasure(Measure[ProjectiveMeasurement, MeasurementResult[ProjectiveMeasurement]]):
@@ -19,16 +21,26 @@ class ProjectiveMeasurementMeasure(Measure[ProjectiveMeasurement, MeasurementRes
             tensor: Union[PureStateTensor, MixedStateTensor],
             spaces: KetSpaces
     ) -> tuple[Union[PureStateTensor, MixedStateTensor], MeasurementResult[ProjectiveMeasurement]]:
-        spaces = tuple(iter_structure(spaces))
-        tensor, values, prob = projective_measure(tensor, spaces)
-        values = restore_structure(values, spaces)
+        layout = layout_of(spaces)
+        tensor, values, prob = projective_measure(tensor, layout.spaces)
+        values = layout.restore(values)
         return tensor, MeasurementResult(values=values, probability=prob, operation=self.operation)
 
 
+class ProjectiveMeasurementIsClifford(IsClifford[ProjectiveMeasurement]):
+    def is_clifford(self) -> Optional[bool]:
+        return True
+
+
+class ProjectiveMeasurementToFingerprint(ToFingerprint[ProjectiveMeasurement]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        return stable_digest('projective', fingerprint_axes(spaces, layout))
+
+
 def projective_measure(
         tensor: Union[PureStateTensor, MixedStateTensor],
         spaces: Iterable[KetSpaces],
-) -> tuple[Union[PureStateTensor, MixedStateTensor], tuple[int, ...], float]:
+) -> tuple[Union[PureStateTensor, MixedStateTensor], tuple[Union[int, np.ndarray], ...], Union[float, np.ndarray]]:
     if isinstance(tensor, PureStateTensor):
         tensor, values, prob = projective_measure_on_pure_state(tensor, spaces)
     elif isinstance(tensor, MixedStateTensor):
@@ -41,54 +53,33 @@ def projective_measure(
 def projective_measure_on_pure_state(
         tensor: PureStateTensor,
         spaces: Iterable[KetSpaces]
-) -> tuple[PureStateTensor, tuple[int, ...], float]:
+) -> tuple[PureStateTensor, tuple[Union[int, np.ndarray], ...], Union[float, np.ndarray]]:
     spaces = tuple(spaces)
+    num_spaces = tuple(space for space in tensor.spaces if isinstance(space, NumSpace))
 
-    cases_values = tuple(itertools.product(*(range(space.n) for space in spaces)))
-    cases_component = tuple(tensor.component(zip(spaces, case_values)) for case_values in cases_values)
-    cases_prob = tuple(float(component.norm()) for component in cases_component)
-    cases_component = tuple(component.normalize() for component in cases_component)
-
-    cases_prob = np.asarray(cases_prob)
-    cases_prob /= cases_prob.sum()
-
-    case_i = np.random.choice(len(cases_values), p=cases_prob)
-    values = cases_values[case_i]
-    component = cases_component[case_i]
-    prob = cases_prob[case_i]
-
-    ket_tensor = PureStateTensor.of(prod(*(
-        space.eigenstate(value, backend=tensor.backend)
-        for space, value in zip(spaces, values)
-    )))
-    tensor = PureStateTensor.of(ket_tensor @ component)
-
-    return tensor, values, prob
+    probs = marginal_probabilities(tensor, spaces, num_spaces)
+    values, prob = choose_values(probs, len(num_spaces))
+    tensor = collapse_pure_state(tensor, spaces, values, prob, num_spaces)
+    return tensor, *batched_or_scalar(values, prob)
 
 
 def projective_measure_on_mixed_state(
         tensor: MixedStateTensor,
         spaces: Iterable[KetSpaces]
-) -> tuple[MixedStateTensor, tuple[int, ...], float]:
+) -> tuple[MixedStateTensor, tuple[Union[int, np.ndarray], ...], Union[float, np.ndarray]]:
     spaces = tuple(spaces)
+    num_spaces = tuple(space for space in tensor.spaces if isinstance(space, NumSpace))
 
-    cases_values = tuple(itertools.product(*(range(space.n) for space in spaces)))
-    cases_component = tuple(tensor.component(zip(spaces, case_values)) for case_values in cases_values)
-    cases_prob = tuple(float(component.norm()) for component in cases_component)
-    cases_component = tuple(component.normalize() for component in cases_component)
+    probs = marginal_probabilities(tensor, spaces, num_spaces)
+    values, prob = choose_values(probs, len(num_spaces))
+    tensor = collapse_mixed_state(tensor, spaces, values, prob, num_spaces)
+    return tensor, *batched_or_scalar(values, prob)
 
-    cases_prob = np.asarray(cases_prob)
-    cases_prob /= cases_prob.sum()
 
-    case_i = np.random.choice(len(cases_values), p=cases_prob)
-    values = cases_values[case_i]
-    component = cases_component[case_i]
-    prob = cases_prob[case_i]
-
-    ket_tensor = PureStateTensor.of(prod(*(
-        space.eigenstate(value, backend=tensor.backend)
-        for space, value in zip(spaces, values)
-    )))
-    tensor = MixedStateTensor.of(ket_tensor @ component @ ket_tensor.ct)
-
-    return tensor, values, prob
+def batched_or_scalar(
+        values: tuple[np.ndarray, ...],
+        prob: np.ndarray,
+) -> tuple[tuple[Union[int, np.ndarray], ...], Union[float, np.ndarray]]:
+    if np.ndim(prob) == 0:
+        return tuple(int(value) for value in values), float(prob)
+    return values, prob
@@ -1,12 +1,14 @@
 from typing import Generic, Union
 
+import numpy as np
+
 from braandket_synthesis import Op
 
 
 class MeasurementResult(Generic[Op]):
     def __init__(self, *,
             values: Union[int, tuple],
-            probability: float,
+            probability: Union[float, np.ndarray],
             operation: Op,
     ):
         self._value = values
@@ -18,7 +20,7 @@ class MeasurementResult(Generic[Op]):
         return self._value
 
     @property
-    def probability(self) -> float:
+    def probability(self) -> Union[float, np.ndarray]:
         return self._probability
 
     @property
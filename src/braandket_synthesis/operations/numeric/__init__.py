@@ -1,2 +1,5 @@
+from .kraus import KrausOperation
 from .matrix import MatrixOperation
+from .pauli_sum import PauliSum
+from .permutation import PermutationOperation
 from .qubits_matrix import QubitsMatrixOperation
@@ -0,0 +1,70 @@
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+from braandket import Backend, MixedStateTensor, NumpyBackend, OperatorTensor, PureStateTensor
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.kernels import apply_matrix_on_mixed_state, apply_matrix_on_pure_state
+from braandket_synthesis.traits import Apply, KetSpaces, ToFingerprint, ToKraus, cached_operators, fingerprint_axes, \
+    is_sampling_kraus, sample_kraus_branch
+from braandket_synthesis.utils import SpaceLayout, layout_of, stable_digest
+
+
+class KrausOperation(QOperation):
+    def __init__(self, matrices: Iterable[np.ndarray], *, name: Optional[str] = None):
+        super().__init__(name=name)
+
+        matrices = tuple(np.asarray(matrix) for matrix in matrices)
+        shapes = set(np.shape(matrix) for matrix in matrices)
+        if len(shapes) > 1:
+            raise ValueError(f"Kraus matrices should have the same shape, got {shapes}!")
+        for shape in shapes:
+            if len(shape) != 2 or shape[0] != shape[1]:
+                raise ValueError(f"expected matrix shape (N, N), got {shape}")
+
+        self._matrices = matrices
+
+    @property
+    def matrices(self) -> tuple[np.ndarray, ...]:
+        return self._matrices
+
+    def structural_items(self) -> Optional[tuple]:
+        return stable_digest(self.matrices),
+
+
+class KrausOperationApply(Apply[KrausOperation]):
+    def apply_on_state_tensor(self,
+            tensor: Union[PureStateTensor, MixedStateTensor],
+            spaces: KetSpaces
+    ) -> Union[PureStateTensor, MixedStateTensor]:
+        matrices = self.operation.matrices
+        if not isinstance(tensor.backend, NumpyBackend) or len(matrices) == 0:
+            return self.operation.trait(ToKraus).apply_on_state_tensor(tensor, spaces)
+        spaces = layout_of(spaces).spaces
+
+        if isinstance(tensor, PureStateTensor):
+            if len(matrices) == 1:
+                return apply_matrix_on_pure_state(tensor, matrices[0], spaces)
+            if is_sampling_kraus():
+                return sample_kraus_branch(tensor, (
+                    apply_matrix_on_pure_state(tensor, matrix, spaces) for matrix in matrices))
+            tensor = MixedStateTensor.of(tensor @ tensor.ct)
+
+        if isinstance(tensor, MixedStateTensor):
+            # the kernels keep the axes order, so the branches can be summed directly
+            values = sum(apply_matrix_on_mixed_state(tensor, matrix, spaces).values() for matrix in matrices)
+            return MixedStateTensor(values, tensor.spaces, tensor.backend)
+        raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+
+
+class KrausOperationToKraus(ToKraus[KrausOperation]):
+    @cached_operators
+    def to_kraus(self, spaces: KetSpaces, *, backend: Optional[Backend] = None) -> tuple[OperatorTensor, ...]:
+        spaces = layout_of(spaces).spaces
+        return tuple(OperatorTensor.from_matrix(matrix, spaces, backend=backend) for matrix in self.operation.matrices)
+
+
+class KrausOperationToFingerprint(ToFingerprint[KrausOperation]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        matrices_digest = self.get_or_set_cache('matrices_digest', lambda: stable_digest(self.operation.matrices))
+        return stable_digest('kraus', matrices_digest, fingerprint_axes(spaces, layout))
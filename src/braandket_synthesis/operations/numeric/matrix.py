@@ -1,24 +1,155 @@
-from typing import Optional
+from typing import Iterable, Optional, Union
 
 import numpy as np
 
-from braandket import Backend, OperatorTensor
+from braandket import Backend, MixedStateTensor, NumSpace, NumpyBackend, OperatorTensor, PureStateTensor
 from braandket_synthesis.basics import QOperation
-from braandket_synthesis.traits import KetSpaces, ToTensor
-from braandket_synthesis.utils import iter_structure
+from braandket_synthesis.kernels import apply_diagonal_on_state_tensor, apply_matrix_on_state_tensor, \
+    apply_permutation_on_state_tensor, diagonal_expectation_values, matrix_expectation_values, monomial_form
+from braandket_synthesis.traits import Apply, Expectation, IsClifford, IsDiagonal, IsHermitian, KetSpaces, Monomial, \
+    ToFingerprint, ToKraus, ToMonomial, ToTensor, cached_operators, fingerprint_axes
+from braandket_synthesis.utils import SpaceLayout, conjugation_table, layout_of, stable_digest
 
 
 class MatrixOperation(QOperation):
-    def __init__(self, matrix: np.ndarray, *, name: Optional[str] = None):
+    def __init__(self,
+            matrix: Optional[np.ndarray], *,
+            num_spaces: Optional[Iterable[NumSpace]] = None,
+            name: Optional[str] = None
+    ):
         super().__init__(name=name)
+
+        # matrix is None for the subclasses building it lazily with build_matrix (e.g. PermutationOperation)
+        if matrix is None:
+            if type(self).build_matrix is MatrixOperation.build_matrix:
+                raise ValueError(f"{type(self).__name__} is expected to be given a matrix!")
+            self._matrix = None
+            self._num_spaces = () if num_spaces is None else tuple(num_spaces)
+            return
+
+        # sparse matrices (with tocoo()) are densified, see PermutationOperation for a sparse representation
+        if hasattr(matrix, 'tocoo'):
+            matrix = matrix.toarray()
+
+        # a read-only copy, so that the structural key (a digest of matrix) stays valid
+        if isinstance(matrix, (np.ndarray, list, tuple)):
+            matrix = np.array(matrix)
+            matrix.setflags(write=False)
+
+        # the leading axes of matrix (if any) are batch axes
+        num_shape = np.shape(matrix)[:-2]
+        if num_spaces is None:
+            num_spaces = tuple(NumSpace(n) for n in num_shape)
+        else:
+            num_spaces = tuple(num_spaces)
+            if tuple(space.n for space in num_spaces) != num_shape:
+                raise ValueError(f"num_spaces={num_spaces} does not match the batch shape {num_shape} of matrix!")
+
         self._matrix = matrix
+        self._num_spaces = num_spaces
 
     @property
     def matrix(self) -> np.ndarray:
-        return self._matrix
+        if self._matrix is not None:
+            return self._matrix
+        # a lazy matrix is kept in the cache of the operation, unless it alone exceeds the cache bound
+        matrix = self.get_cache(MatrixOperation, 'matrix', None)
+        if matrix is None:
+            matrix = self.build_matrix()
+            matrix.setflags(write=False)
+            if self.cache.max_bytes is None or matrix.nbytes <= self.cache.max_bytes:
+                self.set_cache(MatrixOperation, 'matrix', matrix)
+        return matrix
+
+    def build_matrix(self) -> np.ndarray:
+        # the dense matrix of the subclasses constructed without one
+        raise NotImplementedError
+
+    @property
+    def num_spaces(self) -> tuple[NumSpace, ...]:
+        return self._num_spaces
+
+    def structural_items(self) -> Optional[tuple]:
+        return stable_digest(np.asarray(self.matrix)), self.num_spaces
+
+
+class MatrixOperationApply(Apply[MatrixOperation]):
+    def apply_on_state_tensor(self,
+            tensor: Union[PureStateTensor, MixedStateTensor],
+            spaces: KetSpaces
+    ) -> Union[PureStateTensor, MixedStateTensor]:
+        if not isinstance(tensor.backend, NumpyBackend):
+            return self.operation.trait(ToKraus).apply_on_state_tensor(tensor, spaces)
+        spaces = layout_of(spaces).spaces
+        monomial = self.operation.trait(ToMonomial).to_monomial()
+        if monomial is not None:
+            sources, phases = monomial
+            return apply_permutation_on_state_tensor(tensor, sources, phases, spaces)
+        if self.operation.trait(IsDiagonal).is_diagonal():
+            diagonal = self.get_or_set_cache('diagonal', lambda: (
+                np.diagonal(self.operation.matrix, axis1=-2, axis2=-1).copy()))
+            return apply_diagonal_on_state_tensor(tensor, diagonal, spaces, self.operation.num_spaces)
+        return apply_matrix_on_state_tensor(tensor, self.operation.matrix, spaces, self.operation.num_spaces)
 
 
 class MatrixOperationToTensor(ToTensor[MatrixOperation]):
+    @cached_operators
     def to_tensor(self, spaces: KetSpaces, *, backend: Optional[Backend] = None) -> OperatorTensor:
-        spaces = tuple(iter_structure(spaces))
-        return OperatorTensor.from_matrix(self.operation.matrix, spaces, backend=backend)
+        spaces = layout_of(spaces).spaces
+        return OperatorTensor.from_matrix(self.operation.matrix, spaces, self.operation.num_spaces, backend=backend)
+
+
+class MatrixOperationExpectation(Expectation[MatrixOperation]):
+    def expectation_on_state_tensor(self,
+            tensor: Union[PureStateTensor, MixedStateTensor],
+            spaces: KetSpaces
+    ) -> np.ndarray:
+        spaces = layout_of(spaces).spaces
+        if self.operation.trait(IsDiagonal).is_diagonal():
+            diagonal = self.operation.trait(Apply).get_or_set_cache('diagonal', lambda: (
+                np.diagonal(self.operation.matrix, axis1=-2, axis2=-1).copy()))
+            values = diagonal_expectation_values(tensor, diagonal, spaces, self.operation.num_spaces)
+        else:
+            values = matrix_expectation_values(tensor, self.operation.matrix, spaces, self.operation.num_spaces)
+        return self.hermitian_values(values)
+
+
+class MatrixOperationIsDiagonal(IsDiagonal[MatrixOperation]):
+    def is_diagonal(self) -> Optional[bool]:
+        return self.get_or_set_cache('is_diagonal', lambda: is_diagonal_matrix(self.operation.matrix))
+
+
+class MatrixOperationIsHermitian(IsHermitian[MatrixOperation]):
+    def is_hermitian(self) -> Optional[bool]:
+        return self.get_or_set_cache('is_hermitian', lambda: is_hermitian_matrix(self.operation.matrix))
+
+
+class MatrixOperationToMonomial(ToMonomial[MatrixOperation]):
+    def to_monomial(self) -> Optional[Monomial]:
+        return self.get_or_set_cache('monomial', lambda: (
+            None if len(self.operation.num_spaces) > 0 else monomial_form(self.operation.matrix)))
+
+
+class MatrixOperationIsClifford(IsClifford[MatrixOperation]):
+    def is_clifford(self) -> Optional[bool]:
+        return self.get_or_set_cache('is_clifford', lambda: (
+            len(self.operation.num_spaces) == 0 and conjugation_table(self.operation.matrix) is not None))
+
+
+class MatrixOperationToFingerprint(ToFingerprint[MatrixOperation]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        if len(self.operation.num_spaces) > 0:
+            return None  # the batch spaces are identified by themselves, not by their positions
+        matrix_digest = self.get_or_set_cache('matrix_digest', lambda: stable_digest(self.operation.matrix))
+        return stable_digest('matrix', matrix_digest, fingerprint_axes(spaces, layout))
+
+
+def is_diagonal_matrix(matrix: np.ndarray) -> bool:
+    matrix = np.asarray(matrix)
+    off_diagonal = matrix[..., ~np.eye(*matrix.shape[-2:], dtype=bool)]
+    return not np.any(off_diagonal)
+
+
+def is_hermitian_matrix(matrix: np.ndarray) -> bool:
+    matrix = np.asarray(matrix)
+    return bool(np.allclose(matrix, np.conj(np.swapaxes(matrix, -1, -2))))
@@ -0,0 +1,127 @@
+from typing import Iterable, Mapping, Optional, Union
+
+import numpy as np
+
+from braandket import Backend, MixedStateTensor, OperatorTensor, PureStateTensor
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.kernels import parity_count, pauli_expectation_values
+from braandket_synthesis.traits import Expectation, IsDiagonal, IsHermitian, KetSpaces, ToFingerprint, ToTensor, \
+    cached_operators, fingerprint_axes
+from braandket_synthesis.utils import SpaceLayout, layout_of, stable_digest
+
+PAULI_MASKS = {'I': (0, 0), 'X': (1, 0), 'Y': (1, 1), 'Z': (0, 1)}  # (x, z) bits, with Y = i X Z
+
+
+class PauliSum(QOperation):
+    # a weighted sum of Pauli strings (e.g. a Hamiltonian) on n qubits, such as {'XXI': 0.5, 'IZZ': -1.0},
+    # stored as X and Z bit masks (the first qubit as the most significant bit), the repeated strings are summed
+    def __init__(self,
+            terms: Union[Mapping[str, complex], Iterable[tuple[str, complex]]], *,
+            name: Optional[str] = None
+    ):
+        super().__init__(name=name)
+
+        if isinstance(terms, Mapping):
+            terms = terms.items()
+        merged_terms: dict[str, complex] = {}
+        for string, coefficient in terms:
+            string = str(string)
+            if any(char not in PAULI_MASKS for char in string):
+                raise ValueError(f"Pauli string {string!r} is expected to consist of 'I', 'X', 'Y' and 'Z'!")
+            merged_terms[string] = merged_terms.get(string, 0) + coefficient
+        if len(merged_terms) == 0:
+            raise ValueError("PauliSum expects at least one term!")
+        lengths = set(len(string) for string in merged_terms)
+        if len(lengths) != 1:
+            raise ValueError(f"All the Pauli strings are expected to have the same length, got lengths {lengths}!")
+        n, = lengths
+        if n > 62:
+            raise ValueError(f"Pauli strings on more than 62 qubits are not supported, got {n}!")
+
+        x_masks, z_masks = [], []
+        for string in merged_terms:
+            x_mask, z_mask = 0, 0
+            for char in string:
+                x_bit, z_bit = PAULI_MASKS[char]
+                x_mask, z_mask = (x_mask << 1) | x_bit, (z_mask << 1) | z_bit
+            x_masks.append(x_mask)
+            z_masks.append(z_mask)
+
+        self._n = n
+        self._strings = tuple(merged_terms)
+        self._x_masks = np.asarray(x_masks, dtype=np.int64)
+        self._z_masks = np.asarray(z_masks, dtype=np.int64)
+        self._coefficients = np.asarray(tuple(merged_terms.values()))
+
+    @property
+    def n(self) -> int:
+        return self._n
+
+    @property
+    def terms(self) -> tuple[tuple[str, complex], ...]:
+        return tuple(zip(self._strings, self._coefficients.tolist()))
+
+    @property
+    def x_masks(self) -> np.ndarray:
+        return self._x_masks
+
+    @property
+    def z_masks(self) -> np.ndarray:
+        return self._z_masks
+
+    @property
+    def coefficients(self) -> np.ndarray:
+        return self._coefficients
+
+    def structural_items(self) -> Optional[tuple]:
+        return self.n, stable_digest(self.x_masks, self.z_masks, self.coefficients)
+
+    def qubit_spaces(self, spaces: KetSpaces) -> tuple:
+        spaces = layout_of(spaces).spaces
+        if len(spaces) != self.n or any(space.n != 2 for space in spaces):
+            raise ValueError(f"{self} is expected to act on {self.n} qubits, got spaces={spaces}!")
+        return spaces
+
+
+class PauliSumExpectation(Expectation[PauliSum]):
+    def expectation_on_state_tensor(self,
+            tensor: Union[PureStateTensor, MixedStateTensor],
+            spaces: KetSpaces
+    ) -> np.ndarray:
+        operation = self.operation
+        values = pauli_expectation_values(
+            tensor, operation.x_masks, operation.z_masks, operation.coefficients, operation.qubit_spaces(spaces))
+        return self.hermitian_values(values)
+
+
+class PauliSumToTensor(ToTensor[PauliSum]):
+    @cached_operators
+    def to_tensor(self, spaces: KetSpaces, *, backend: Optional[Backend] = None) -> OperatorTensor:
+        # P|c> = i^|x & z| (-1)^|z & c| |c ^ x>, all the terms scattered at once
+        operation = self.operation
+        spaces = operation.qubit_spaces(spaces)
+        size = 1 << operation.n
+        indices = np.arange(size)
+        x_masks, z_masks = operation.x_masks[:, None], operation.z_masks[:, None]
+        phases = 1j ** (parity_count(x_masks & z_masks) % 4) * operation.coefficients[:, None]
+        signs = 1 - 2 * (parity_count(indices & z_masks) & 1)
+        matrix = np.zeros((size, size), dtype=complex)
+        np.add.at(matrix, (indices ^ x_masks, np.broadcast_to(indices, (len(x_masks), size))), phases * signs)
+        return OperatorTensor.from_matrix(matrix, spaces, backend=backend)
+
+
+class PauliSumIsHermitian(IsHermitian[PauliSum]):
+    def is_hermitian(self) -> Optional[bool]:
+        return bool(np.all(np.isreal(self.operation.coefficients)))
+
+
+class PauliSumIsDiagonal(IsDiagonal[PauliSum]):
+    def is_diagonal(self) -> Optional[bool]:
+        return bool(np.all(self.operation.x_masks == 0))
+
+
+class PauliSumToFingerprint(ToFingerprint[PauliSum]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        terms_digest = self.get_or_set_cache('terms_digest', lambda: stable_digest(
+            self.operation.x_masks, self.operation.z_masks, self.operation.coefficients))
+        return stable_digest('pauli_sum', terms_digest, fingerprint_axes(spaces, layout))
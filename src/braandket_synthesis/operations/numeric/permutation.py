@@ -0,0 +1,129 @@
+from typing import Callable, Iterable, Optional, Union
+
+import numpy as np
+
+from braandket import MixedStateTensor, PureStateTensor
+from braandket_synthesis.kernels import monomial_expectation_values, monomial_form, simplify_monomial
+from braandket_synthesis.traits import Expectation, IsClifford, IsDiagonal, IsHermitian, IsUnitary, KetSpaces, \
+    Monomial, ToFingerprint, ToMonomial, fingerprint_axes
+from braandket_synthesis.utils import SpaceLayout, layout_of, monomial_conjugation_table, stable_digest
+from .matrix import MatrixOperation
+
+
+class PermutationOperation(MatrixOperation):
+    # the operator maps |sources[i]> to phases[i] |i>, without storing the dense matrix
+    def __init__(self,
+            sources: Iterable[int],
+            phases: Optional[Iterable[complex]] = None, *,
+            name: Optional[str] = None
+    ):
+        super().__init__(None, name=name)
+
+        sources = np.asarray(sources, dtype=np.intp)
+        if np.ndim(sources) != 1 or not np.array_equal(np.sort(sources), np.arange(len(sources))):
+            raise ValueError(f"sources is expected to be a permutation of range({len(sources)})!")
+        if phases is not None:
+            phases = np.asarray(phases)
+            if np.shape(phases) != np.shape(sources):
+                raise ValueError(f"phases is expected to have shape {np.shape(sources)}, got {np.shape(phases)}!")
+
+        self._size = len(sources)
+        self._sources, self._phases = simplify_monomial(sources, phases)
+
+    @classmethod
+    def from_matrix(cls, matrix, *, name: Optional[str] = None) -> 'PermutationOperation':
+        # matrix can be dense or sparse (with tocoo()), with exactly one non-zero in each row and column
+        monomial = monomial_form(matrix)
+        if monomial is None:
+            raise ValueError("The matrix is not a permutation matrix (with phases)!")
+        sources, phases = monomial
+        size = matrix.shape[-1]
+        return cls(np.arange(size) if sources is None else sources, phases, name=name)
+
+    @classmethod
+    def from_function(cls,
+            func: Callable[[int], int],
+            size: int, *,
+            name: Optional[str] = None
+    ) -> 'PermutationOperation':
+        # maps |i> to |func(i)>, e.g. a reversible arithmetic circuit
+        targets = np.fromiter((func(i) for i in range(size)), dtype=np.intp, count=size)
+        if not np.array_equal(np.sort(targets), np.arange(size)):
+            raise ValueError(f"func is expected to be a bijection on range({size})!")
+        sources = np.empty_like(targets)
+        sources[targets] = np.arange(size)
+        return cls(sources, name=name)
+
+    @property
+    def size(self) -> int:
+        # the dimension of the operator
+        return self._size
+
+    @property
+    def sources(self) -> np.ndarray:
+        return np.arange(self._size) if self._sources is None else self._sources
+
+    @property
+    def phases(self) -> np.ndarray:
+        return np.ones(self._size, dtype=int) if self._phases is None else self._phases
+
+    @property
+    def monomial(self) -> Monomial:
+        return self._sources, self._phases
+
+    def structural_items(self) -> Optional[tuple]:
+        return self.size, stable_digest(self.monomial)
+
+    def build_matrix(self) -> np.ndarray:
+        # only for the traits falling back to the dense matrix (e.g. ToTensor)
+        matrix = np.zeros((self._size, self._size), dtype=self.phases.dtype)
+        matrix[np.arange(self._size), self.sources] = self.phases
+        return matrix
+
+
+class PermutationOperationToMonomial(ToMonomial[PermutationOperation]):
+    def to_monomial(self) -> Optional[Monomial]:
+        return self.operation.monomial
+
+
+class PermutationOperationIsDiagonal(IsDiagonal[PermutationOperation]):
+    def is_diagonal(self) -> Optional[bool]:
+        sources, _ = self.operation.monomial
+        return sources is None
+
+
+class PermutationOperationIsUnitary(IsUnitary[PermutationOperation]):
+    def is_unitary(self) -> Optional[bool]:
+        _, phases = self.operation.monomial
+        return phases is None or bool(np.allclose(np.abs(phases), 1))
+
+
+class PermutationOperationIsHermitian(IsHermitian[PermutationOperation]):
+    def is_hermitian(self) -> Optional[bool]:
+        # O[i, s_i] = ph_i is hermitian iff s is an involution with ph_(s_i) = conj(ph_i)
+        return self.get_or_set_cache('is_hermitian', lambda: bool(
+            np.array_equal(self.operation.sources[self.operation.sources], np.arange(self.operation.size)) and
+            np.allclose(self.operation.phases[self.operation.sources], np.conj(self.operation.phases))))
+
+
+class PermutationOperationIsClifford(IsClifford[PermutationOperation]):
+    def is_clifford(self) -> Optional[bool]:
+        return self.get_or_set_cache('is_clifford', lambda: monomial_conjugation_table(
+            *self.operation.monomial, size=self.operation.size) is not None)
+
+
+class PermutationOperationExpectation(Expectation[PermutationOperation]):
+    def expectation_on_state_tensor(self,
+            tensor: Union[PureStateTensor, MixedStateTensor],
+            spaces: KetSpaces
+    ) -> np.ndarray:
+        sources, phases = self.operation.monomial
+        values = monomial_expectation_values(tensor, sources, phases, layout_of(spaces).spaces)
+        return self.hermitian_values(values)
+
+
+class PermutationOperationToFingerprint(ToFingerprint[PermutationOperation]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        # without building the dense matrix
+        monomial_digest = self.get_or_set_cache('monomial_digest', lambda: stable_digest(self.operation.monomial))
+        return stable_digest('permutation', monomial_digest, fingerprint_axes(spaces, layout))
@@ -1,20 +1,25 @@
-from typing import Optional
+from typing import Iterable, Optional
 
 import numpy as np
 
+from braandket import NumSpace
 from .matrix import MatrixOperation
 
 
 class QubitsMatrixOperation(MatrixOperation):
-    def __init__(self, matrix: np.ndarray, *, name: Optional[str] = None):
+    def __init__(self,
+            matrix: np.ndarray, *,
+            num_spaces: Optional[Iterable[NumSpace]] = None,
+            name: Optional[str] = None
+    ):
         shape = np.shape(matrix)
-        if len(shape) != 2 or shape[0] != shape[1]:
-            raise ValueError(f"expected matrix shape (2**n, 2**n), got {shape}")
-        N = shape[0]
+        if len(shape) < 2 or shape[-2] != shape[-1]:
+            raise ValueError(f"expected matrix shape (..., 2**n, 2**n), got {shape}")
+        N = shape[-1]
         n = log2int(N, strict=True)
         if n is None:
-            raise ValueError(f"expected matrix shape (2**n, 2**n), got {shape}")
-        super().__init__(matrix, name=name)
+            raise ValueError(f"expected matrix shape (..., 2**n, 2**n), got {shape}")
+        super().__init__(matrix, num_spaces=num_spaces, name=name)
         self._n = n
 
     @property
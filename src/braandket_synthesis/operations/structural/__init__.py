@@ -1,3 +1,4 @@
 from .controlled import Controlled
+from .power import Power
 from .remapped import Remapped
-from .sequential import Sequential
+from .sequential import Sequential, iter_steps, plan_sequential
@@ -1,9 +1,15 @@
 from typing import Generic, Iterable, Optional, Union
 
-from braandket import Backend, MixedStateTensor, OperatorTensor, PureStateTensor, prod, sum
-from braandket_synthesis.basics import Op, QOperation
-from braandket_synthesis.traits import Apply, KetSpaces, ToTensor
-from braandket_synthesis.utils import iter_structure, iter_zip_structures
+import numpy as np
+
+from braandket import Backend, KetSpace, MixedStateTensor, NumpyBackend, OperatorTensor, PureStateTensor, prod, sum
+from braandket_synthesis.basics import Op, QOperation, QOperationTrait
+from braandket_synthesis.kernels import apply_controlled_on_state_tensor
+from braandket_synthesis.operations.numeric import MatrixOperation
+from braandket_synthesis.traits import Apply, IsClifford, IsDiagonal, IsHermitian, KetSpaces, ToFingerprint, ToTensor, \
+    cached_operators, fingerprint_axes
+from braandket_synthesis.utils import SpaceLayout, conjugation_table, iter_structure, layout_of, stable_digest, \
+    structure_of
 
 
 class Controlled(QOperation, Generic[Op]):
@@ -25,51 +31,109 @@ class Controlled(QOperation, Generic[Op]):
     def keys(self) -> Union[int, Iterable]:
         return self._keys
 
+    def structural_items(self) -> Optional[tuple]:
+        return self.bullet, tuple(int(key) for key in iter_structure(self.keys))
+
+    def children(self) -> tuple[QOperation, ...]:
+        return self.bullet,
+
 
 class ControlledApply(Apply[Controlled]):
     def apply_on_state_tensor(self,
             tensor: Union[PureStateTensor, MixedStateTensor],
             spaces: KetSpaces
     ) -> Union[PureStateTensor, MixedStateTensor]:
-        control_spaces, target_spaces = spaces
-
-        control_i_tensor = prod(*(
-            sp.identity() for sp in iter_structure(control_spaces)))
-        control_on_tensor = prod(*(
-            sp.projector(k) for sp, k in iter_zip_structures(control_spaces, self.operation.keys)))
-        control_off_tensor = control_i_tensor - control_on_tensor
-
-        target_on_tensor = self.operation.bullet.trait(Apply).apply_on_state_tensor(tensor, target_spaces)
-        target_off_tensor = tensor
+        control_spaces, target_spaces = structure_of(spaces)
+        controls = tuple(zip(layout_of(control_spaces).spaces, flat_keys(self)))
 
-        if isinstance(tensor, PureStateTensor):
-            return PureStateTensor.of(sum(
-                control_on_tensor @ target_on_tensor,
-                control_off_tensor @ target_off_tensor
-            ))
-        elif isinstance(tensor, MixedStateTensor):
-            return MixedStateTensor.of(sum(
-                control_on_tensor @ target_on_tensor @ control_on_tensor,
-                control_off_tensor @ target_off_tensor @ control_off_tensor
-            ))
-        else:
-            raise TypeError(f"Expected type of tensor PureStateTensor or MixedStateTensor, got {type(tensor)}!")
+        bullet_apply = self.operation.bullet.trait(Apply)
+        return apply_controlled_on_state_tensor(tensor, controls, lambda sub_tensor: (
+            bullet_apply.apply_on_state_tensor(sub_tensor, target_spaces)))
 
 
 class ControlledToTensor(ToTensor[Controlled]):
+    @cached_operators
     def to_tensor(self, spaces: KetSpaces, *, backend: Optional[Backend] = None) -> OperatorTensor:
-        control_spaces, target_spaces = spaces
-
-        control_i_tensor = prod(*(
-            sp.identity() for sp in iter_structure(control_spaces)))
-        control_on_tensor = prod(*(
-            sp.projector(k) for sp, k in iter_zip_structures(control_spaces, self.operation.keys)))
+        control_spaces, target_spaces = structure_of(spaces)
+        controls = tuple(zip(layout_of(control_spaces).spaces, flat_keys(self)))
+
+        target_operator = self.operation.bullet.trait(ToTensor).to_tensor(target_spaces, backend=backend)
+        target_ket_spaces = layout_of(target_spaces).spaces
+        if isinstance(target_operator.backend, NumpyBackend) and \
+                all(space in target_operator.spaces for space in target_ket_spaces):
+            # writing the bullet block into an identity, without the projector algebra
+            target_matrix, (*num_spaces, _, _) = target_operator.flatten(ket_spaces=target_ket_spaces)
+            matrix = controlled_matrix(target_matrix, controls)
+            ket_spaces = (*(space for space, _ in controls), *target_ket_spaces)
+            return OperatorTensor.from_matrix(matrix, ket_spaces, num_spaces, backend=backend)
+
+        control_i_tensor = prod(*(sp.identity() for sp, _ in controls))
+        control_on_tensor = prod(*(sp.projector(k) for sp, k in controls))
         control_off_tensor = control_i_tensor - control_on_tensor
 
-        target_on_operator = self.operation.bullet.trait(ToTensor).to_tensor(target_spaces, backend=backend)
+        target_on_operator = target_operator
         target_off_operator = 1
 
         return OperatorTensor.of(sum(
             control_on_tensor @ target_on_operator,
             control_off_tensor @ target_off_operator
         ))
+
+
+class ControlledIsDiagonal(IsDiagonal[Controlled]):
+    def is_diagonal(self) -> Optional[bool]:
+        return self.operation.bullet.trait(IsDiagonal).is_diagonal()
+
+
+class ControlledIsHermitian(IsHermitian[Controlled]):
+    def is_hermitian(self) -> Optional[bool]:
+        # the identity blocks are hermitian, so it is decided by the bullet block
+        return self.operation.bullet.trait(IsHermitian).is_hermitian()
+
+
+class ControlledIsClifford(IsClifford[Controlled]):
+    def is_clifford(self) -> Optional[bool]:
+        return self.get_or_set_cache('is_clifford', self._is_clifford)
+
+    def _is_clifford(self) -> Optional[bool]:
+        # only decidable for a matrix bullet with qubit controls
+        bullet = self.operation.bullet
+        if not isinstance(bullet, MatrixOperation) or len(bullet.num_spaces) > 0:
+            return None
+        keys = flat_keys(self)
+        if not all(key in (0, 1) for key in keys):
+            return None
+        matrix = controlled_matrix(bullet.matrix, ((KetSpace(2), key) for key in keys))
+        return conjugation_table(matrix) is not None
+
+
+class ControlledToFingerprint(ToFingerprint[Controlled]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        if layout is None:
+            layout = layout_of(spaces)
+        control_spaces, target_spaces = structure_of(spaces)
+        bullet_fingerprint = self.operation.bullet.trait(ToFingerprint).fingerprint(target_spaces, layout)
+        if bullet_fingerprint is None:
+            return None
+        control_axes = fingerprint_axes(control_spaces, layout)
+        return stable_digest('controlled', control_axes, flat_keys(self), bullet_fingerprint)
+
+
+def flat_keys(trait: QOperationTrait[Controlled]) -> tuple[int, ...]:
+    return trait.get_or_set_cache('flat_keys', lambda: tuple(iter_structure(trait.operation.keys)))
+
+
+def controlled_matrix(target_matrix: np.ndarray, controls: Iterable[tuple[KetSpace, int]]) -> np.ndarray:
+    # target_matrix: [*num_shape, N, N], the result is ordered as [*num_shape, controls + target, controls + target]
+    controls = tuple(controls)
+    control_shape = tuple(space.n for space, _ in controls)
+    control_n = int(np.prod(control_shape, dtype=int))
+    control_i = int(np.ravel_multi_index(tuple(key for _, key in controls), control_shape)) if controls else 0
+
+    *num_shape, target_n, _ = np.shape(target_matrix)
+    matrix = np.zeros((*num_shape, control_n, target_n, control_n, target_n), dtype=target_matrix.dtype)
+    for i in range(control_n):
+        if i != control_i:
+            matrix[..., i, :, i, :] = np.eye(target_n)
+    matrix[..., control_i, :, control_i, :] = target_matrix
+    return np.reshape(matrix, (*num_shape, control_n * target_n, control_n * target_n))
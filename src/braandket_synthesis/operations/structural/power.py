@@ -0,0 +1,300 @@
+import math
+import operator
+from typing import Generic, Optional, Union
+
+import numpy as np
+
+from braandket import Backend, MixedStateTensor, NumpyBackend, OperatorTensor, PureStateTensor, prod
+from braandket_synthesis.basics import Op, QOperation
+from braandket_synthesis.kernels import apply_diagonal_on_state_tensor, apply_matrix_on_state_tensor
+from braandket_synthesis.traits import Apply, IsClifford, IsDiagonal, IsUnitary, KetSpaces, Measure, ToFingerprint, \
+    ToTensor, cached_operators
+from braandket_synthesis.utils import SpaceLayout, layout_of, stable_digest, structure_of
+
+# the share of the trait cache of the original operation that its powers (the matrix, squares and eig) may take,
+# operators too large for it are never powered, only applied repeatedly
+POWER_CACHE_SHARE = 0.5
+
+# the size limit when the trait cache is unbounded
+POWER_MAX_SIZE = 1 << 12
+
+# the eigendecomposition is preferred over squaring when more matrix products than this are needed
+EIG_MIN_MATMULS = 8
+
+
+class Power(QOperation, Generic[Op]):
+    def __init__(self, original: Op, k: int, *, name: Optional[str] = None):
+        super().__init__(name=name)
+
+        # check
+        if not isinstance(original, QOperation):
+            raise TypeError(f"original={original} is not a QOperation!")
+        k = operator.index(k)
+        if k < 0:
+            raise ValueError(f"k={k} is expected to be non-negative!")
+
+        self._original = original
+        self._k = k
+
+    @property
+    def original(self) -> Op:
+        return self._original
+
+    @property
+    def k(self) -> int:
+        return self._k
+
+    def structural_items(self) -> Optional[tuple]:
+        return self.original, self.k
+
+    def children(self) -> tuple[QOperation, ...]:
+        return self.original,
+
+
+class PowerMeasure(Measure[Power, Optional[tuple]]):
+    # the result is the tuple of the results of the k repetitions, or None if the original measures nothing
+    def measure_on_state_tensor(self,
+            tensor: Union[PureStateTensor, MixedStateTensor],
+            spaces: KetSpaces
+    ) -> tuple[Union[PureStateTensor, MixedStateTensor], Optional[tuple]]:
+        original, k = self.operation.original, self.operation.k
+        powers = power_matrices(original, spaces) if isinstance(tensor.backend, NumpyBackend) else None
+        if powers is None:
+            results = []
+            original_measure = original.trait(Measure)
+            for _ in range(k):
+                tensor, result = original_measure.measure_on_state_tensor(tensor, spaces)
+                results.append(result)
+            if all(result is None for result in results):
+                return tensor, None
+            return tensor, tuple(results)
+
+        if k == 0:
+            return tensor, None
+        if prefers_powering(powers, k, tensor):
+            flat_spaces = layout_of(spaces).spaces
+            if powers.diagonal:
+                tensor = apply_diagonal_on_state_tensor(tensor, powers.diagonal_power(k), flat_spaces, powers.num_spaces)
+            else:
+                tensor = apply_matrix_on_state_tensor(tensor, powers.power(k), flat_spaces, powers.num_spaces)
+            refresh_power_matrices(original, spaces, powers)
+            return tensor, None
+
+        original_apply = original.trait(Apply)
+        for _ in range(k):
+            tensor = original_apply.apply_on_state_tensor(tensor, spaces)
+        return tensor, None
+
+
+class PowerToTensor(ToTensor[Power]):
+    @cached_operators
+    def to_tensor(self, spaces: KetSpaces, *, backend: Optional[Backend] = None) -> OperatorTensor:
+        original, k = self.operation.original, self.operation.k
+        if backend is not None and not isinstance(backend, NumpyBackend):
+            return power_tensor(original.trait(ToTensor).to_tensor(spaces, backend=backend), k, backend)
+
+        powers = power_matrices(original, spaces)
+        if powers is None:
+            # too large to be powered as a matrix, or some nested operation does not support ToTensor
+            return power_tensor(original.trait(ToTensor).to_tensor(spaces), k, backend)
+        matrix = powers.power(k)
+        refresh_power_matrices(original, spaces, powers)
+        return OperatorTensor.from_matrix(matrix, layout_of(spaces).spaces, powers.num_spaces, backend=backend)
+
+
+class PowerIsDiagonal(IsDiagonal[Power]):
+    def is_diagonal(self) -> Optional[bool]:
+        if self.operation.k == 0 or self.operation.original.trait(IsDiagonal).is_diagonal():
+            return True
+        return None  # a power of a non-diagonal operator can still be diagonal
+
+
+class PowerIsUnitary(IsUnitary[Power]):
+    def is_unitary(self) -> Optional[bool]:
+        if self.operation.k == 0 or self.operation.original.trait(IsUnitary).is_unitary():
+            return True
+        return None
+
+
+class PowerIsClifford(IsClifford[Power]):
+    def is_clifford(self) -> Optional[bool]:
+        if self.operation.k == 0 or self.operation.original.trait(IsClifford).is_clifford():
+            return True
+        return None  # e.g. T^2 = S
+
+
+class PowerToFingerprint(ToFingerprint[Power]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        if layout is None:
+            layout = layout_of(spaces)
+        original_fingerprint = self.operation.original.trait(ToFingerprint).fingerprint(spaces, layout)
+        if original_fingerprint is None:
+            return None
+        return stable_digest('power', self.operation.k, original_fingerprint)
+
+
+# powers
+
+class PowerMatrices:
+    # the powers of a (batched) matrix, by repeated squaring with the squares kept for reuse,
+    # or by its eigendecomposition when many products would be needed,
+    # only as many squares (and the eig) as fit in max_bytes are kept
+    def __init__(self, matrix: np.ndarray, num_spaces: tuple, diagonal: bool, max_bytes: Optional[int] = None):
+        self._num_spaces = num_spaces
+        self._diagonal = np.diagonal(matrix, axis1=-2, axis2=-1).copy() if diagonal else None
+        self._squares = [matrix]  # matrix^(2^i)
+        self._eig = None
+        self._eig_checked = False
+        self._max_bytes = max_bytes
+
+    @property
+    def num_spaces(self) -> tuple:
+        return self._num_spaces
+
+    @property
+    def diagonal(self) -> bool:
+        return self._diagonal is not None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._squares[0]
+
+    @property
+    def nbytes(self) -> int:
+        nbytes = sum(square.nbytes for square in self._squares)
+        if self._eig is not None:
+            nbytes += sum(array.nbytes for array in self._eig)
+        return nbytes
+
+    def fits(self, nbytes: int) -> bool:
+        return self._max_bytes is None or self.nbytes + nbytes <= self._max_bytes
+
+    def matmuls(self, k: int) -> int:
+        # the matrix products needed for the k-th power by squaring, with the kept squares
+        if self.diagonal or k <= 1:
+            return 0
+        new_squares = max(0, k.bit_length() - len(self._squares))
+        return new_squares + bin(k).count('1') - 1
+
+    def diagonal_power(self, k: int) -> np.ndarray:
+        return self._diagonal ** k
+
+    def power(self, k: int) -> np.ndarray:
+        if self.diagonal:
+            diagonal = self.diagonal_power(k)
+            return diagonal[..., :, None] * np.eye(np.shape(diagonal)[-1], dtype=diagonal.dtype)
+        if k == 0:
+            n = np.shape(self.matrix)[-1]
+            return np.broadcast_to(np.eye(n, dtype=self.matrix.dtype), np.shape(self.matrix)).copy()
+        if self.matmuls(k) >= EIG_MIN_MATMULS:
+            eig = self.eig()
+            if eig is not None:
+                values, vectors, inverse_vectors = eig
+                return vectors @ (values[..., :, None] ** k * inverse_vectors)
+        return self.squaring_power(k)
+
+    def squaring_power(self, k: int) -> np.ndarray:
+        result = None
+        square = None
+        for i in range(k.bit_length()):
+            if i < len(self._squares):
+                square = self._squares[i]
+            else:
+                square = square @ square
+                if i == len(self._squares) and self.fits(square.nbytes):
+                    self._squares.append(square)
+            if (k >> i) & 1:
+                result = square if result is None else result @ square
+        return result
+
+    def eig(self) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        # None if the matrix is not (well-conditioned) diagonalizable, or its eig does not fit
+        if not self._eig_checked and self.fits(3 * self.matrix.nbytes):
+            self._eig_checked = True
+            values, vectors = np.linalg.eig(self.matrix)
+            if np.all(np.linalg.cond(vectors) < 1e8):
+                self._eig = values, vectors, np.linalg.inv(vectors)
+        return self._eig
+
+
+def power_matrices(original: QOperation, spaces: KetSpaces) -> Optional[PowerMatrices]:
+    # kept in the cache of original, so that all its powers (e.g. U^(2^j) in phase estimation) share the squares,
+    # None if original has no operator, or is too large to be powered as a matrix
+    layout = layout_of(spaces)
+    max_bytes = power_max_bytes(original)
+    if layout.size > power_max_size(max_bytes):
+        return None
+    key = 'power_matrices', structure_of(spaces)
+    try:
+        powers = original.get_cache(PowerToTensor, key, None)
+    except TypeError:
+        key = None  # unhashable spaces (e.g. lists), not kept
+        powers = None
+    if powers is not None:
+        return powers
+
+    to_tensor = original.trait(ToTensor, required=False)
+    if to_tensor is None:
+        return None
+    try:
+        tensor = to_tensor.to_tensor(spaces)
+    except TypeError:
+        return None  # some nested operation does not support ToTensor
+    missing_spaces = tuple(space for space in layout.spaces if space not in tensor.spaces)
+    if missing_spaces:
+        tensor = OperatorTensor.of(tensor @ prod(*(space.identity() for space in missing_spaces)))
+    matrix, (*num_spaces, _, _) = tensor.flatten(ket_spaces=layout.spaces)
+    diagonal = bool(original.trait(IsDiagonal).is_diagonal())
+    matrix = np.asarray(matrix)
+    if max_bytes is not None and matrix.nbytes > max_bytes:
+        return None  # batched over num spaces, larger than its size suggests
+    powers = PowerMatrices(matrix, tuple(num_spaces), diagonal, max_bytes)
+    if key is not None:
+        original.set_cache(PowerToTensor, key, powers)
+    return powers
+
+
+def power_max_bytes(original: QOperation) -> Optional[int]:
+    cache_max_bytes = original.cache.max_bytes
+    if cache_max_bytes is None:
+        return None
+    return int(cache_max_bytes * POWER_CACHE_SHARE)
+
+
+def power_max_size(max_bytes: Optional[int]) -> int:
+    # the largest matrix (of complex128) fitting in max_bytes
+    if max_bytes is None:
+        return POWER_MAX_SIZE
+    return math.isqrt(max_bytes // np.dtype(np.complex128).itemsize)
+
+
+def refresh_power_matrices(original: QOperation, spaces: KetSpaces, powers: PowerMatrices):
+    # sets the entry again, so that the cache accounts for the squares added since
+    try:
+        original.set_cache(PowerToTensor, ('power_matrices', structure_of(spaces)), powers)
+    except TypeError:
+        pass
+
+
+def prefers_powering(powers: PowerMatrices, k: int, tensor: Union[PureStateTensor, MixedStateTensor]) -> bool:
+    # compares the estimated multiplications of applying original k times with powering it and applying once
+    if powers.diagonal:
+        return True
+    n = np.shape(powers.matrix)[-1]
+    size = int(np.size(tensor.values()))
+    repeated_cost = k * size * n
+    powering_cost = min(powers.matmuls(k), EIG_MIN_MATMULS) * n ** 3 + size * n
+    return powering_cost <= repeated_cost
+
+
+def power_tensor(tensor: OperatorTensor, k: int, backend: Optional[Backend]) -> OperatorTensor:
+    # by repeated squaring of operator tensors, for other backends
+    result = None
+    square = tensor
+    while k > 0:
+        if k & 1:
+            result = square if result is None else OperatorTensor.of(result @ square)
+        k >>= 1
+        if k > 0:
+            square = OperatorTensor.of(square @ square)
+    return result if result is not None else OperatorTensor.of(prod(backend=backend))
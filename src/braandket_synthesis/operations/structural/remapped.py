@@ -1,8 +1,10 @@
-from typing import Callable, Generic, Optional, Union
+import types
+from typing import Any, Callable, Generic, Hashable, Optional, Union
 
 from braandket import Backend, MixedStateTensor, OperatorTensor, PureStateTensor
 from braandket_synthesis.basics import Op, QOperation
-from braandket_synthesis.traits import KetSpaces, Measure, R, ToTensor
+from braandket_synthesis.traits import IsClifford, IsDiagonal, KetSpaces, Measure, R, ToFingerprint, ToTensor
+from braandket_synthesis.utils import SpaceLayout, layout_of, structure_of
 
 
 class Remapped(QOperation, Generic[Op]):
@@ -24,15 +26,64 @@ class Remapped(QOperation, Generic[Op]):
     def mapping(self) -> Callable[[KetSpaces], KetSpaces]:
         return self._mapping
 
+    def structural_items(self) -> Optional[tuple]:
+        return self.original, mapping_key(self.mapping)
+
+    def children(self) -> tuple[QOperation, ...]:
+        return self.original,
+
 
 class RemappedMeasure(Measure[Remapped, R]):
     def measure_on_state_tensor(self,
             tensor: Union[PureStateTensor, MixedStateTensor],
             spaces: KetSpaces
     ) -> tuple[Union[PureStateTensor, MixedStateTensor], R]:
-        return self.operation.trait(Measure).measure_on_state_tensor(tensor, self.operation.mapping(spaces))
+        return self.operation.original.trait(Measure).measure_on_state_tensor(
+            tensor, self.operation.mapping(structure_of(spaces)))
 
 
 class RemappedToTensor(ToTensor[Remapped]):
     def to_tensor(self, spaces: KetSpaces, *, backend: Optional[Backend] = None) -> OperatorTensor:
-        return self.operation.original.trait(ToTensor).to_tensor(self.operation.mapping(spaces), backend=backend)
+        return self.operation.original.trait(ToTensor).to_tensor(
+            self.operation.mapping(structure_of(spaces)), backend=backend)
+
+
+class RemappedIsDiagonal(IsDiagonal[Remapped]):
+    def is_diagonal(self) -> Optional[bool]:
+        return self.operation.original.trait(IsDiagonal).is_diagonal()
+
+
+class RemappedIsClifford(IsClifford[Remapped]):
+    def is_clifford(self) -> Optional[bool]:
+        return self.operation.original.trait(IsClifford).is_clifford()
+
+
+class RemappedToFingerprint(ToFingerprint[Remapped]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        # the mapping is identified by where it sends the spaces, so it is transparent
+        if layout is None:
+            layout = layout_of(spaces)
+        return self.operation.original.trait(ToFingerprint).fingerprint(
+            self.operation.mapping(structure_of(spaces)), layout)
+
+
+def mapping_key(mapping: Callable[[KetSpaces], KetSpaces]) -> Hashable:
+    # functions made by the same code with equal defaults and closure values are equal (e.g. lambdas in a loop),
+    # unless they read any global (or builtin) names, which may be rebound later;
+    # other mappings are compared by themselves (i.e. by identity, unless they define their own equality)
+    if not isinstance(mapping, types.FunctionType) or reads_names(mapping.__code__):
+        return mapping
+    try:
+        closure = tuple(cell.cell_contents for cell in mapping.__closure__ or ())
+        kwdefaults = tuple(sorted((mapping.__kwdefaults__ or {}).items()))
+        key: Any = (mapping.__code__, id(mapping.__globals__), mapping.__defaults__, kwdefaults, closure)
+        hash(key)
+    except (TypeError, ValueError):
+        return mapping  # unhashable contents, or an empty cell
+    return key
+
+
+def reads_names(code: types.CodeType) -> bool:
+    # co_names holds the global and attribute names, including those of the nested code (e.g. comprehensions)
+    return len(code.co_names) > 0 or any(
+        reads_names(const) for const in code.co_consts if isinstance(const, types.CodeType))
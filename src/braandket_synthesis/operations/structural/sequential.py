@@ -1,8 +1,12 @@
-from typing import Generic, Iterable, Optional, Union
+import operator
+from typing import Generic, Iterable, Iterator, Optional, Union
 
 from braandket import Backend, MixedStateTensor, OperatorTensor, PureStateTensor, prod
 from braandket_synthesis.basics import Op, QOperation
-from braandket_synthesis.traits import KetSpaces, Measure, ToTensor
+from braandket_synthesis.traits import IsClifford, IsDiagonal, KetSpaces, Measure, ToFingerprint, ToTensor, \
+    cached_operators
+from braandket_synthesis.utils import ContractionPlan, SpaceLayout, layout_of, plan_chain, stable_digest, structure_of
+from .remapped import Remapped
 
 
 class Sequential(QOperation, Generic[Op]):
@@ -21,6 +25,12 @@ class Sequential(QOperation, Generic[Op]):
     def steps(self) -> tuple[Op, ...]:
         return self._steps
 
+    def structural_items(self) -> Optional[tuple]:
+        return self.steps
+
+    def children(self) -> tuple[QOperation, ...]:
+        return self.steps
+
 
 class SequentialMeasure(Measure[Sequential, tuple]):
     def measure_on_state_tensor(self,
@@ -35,8 +45,62 @@ class SequentialMeasure(Measure[Sequential, tuple]):
 
 
 class SequentialToTensor(ToTensor[Sequential]):
+    @cached_operators
     def to_tensor(self, spaces: KetSpaces, *, backend: Optional[Backend] = None) -> OperatorTensor:
-        return OperatorTensor.of(prod(*(
-            step.trait(ToTensor).to_tensor(spaces, backend=backend)
-            for step in self.operation.steps
-        )))
+        # the operator of the later steps is on the left
+        steps = tuple(iter_steps(self.operation, spaces))[::-1]
+        if len(steps) == 0:
+            return OperatorTensor.of(prod(backend=backend))
+        plan = plan_steps(steps)
+        return OperatorTensor.of(plan.contract(
+            lambda i: steps[i][0].trait(ToTensor).to_tensor(steps[i][1], backend=backend),
+            operator.matmul))
+
+
+class SequentialIsDiagonal(IsDiagonal[Sequential]):
+    def is_diagonal(self) -> Optional[bool]:
+        for step in self.operation.steps:
+            if not step.trait(IsDiagonal).is_diagonal():
+                return None  # a product of non-diagonal steps can still be diagonal
+        return True
+
+
+class SequentialIsClifford(IsClifford[Sequential]):
+    def is_clifford(self) -> Optional[bool]:
+        for step in self.operation.steps:
+            if not step.trait(IsClifford).is_clifford():
+                return None  # a product of non-Clifford steps can still be Clifford
+        return True
+
+
+class SequentialToFingerprint(ToFingerprint[Sequential]):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        if layout is None:
+            layout = layout_of(spaces)
+        step_fingerprints = []
+        for step, step_spaces in iter_steps(self.operation, spaces):
+            step_fingerprint = step.trait(ToFingerprint).fingerprint(step_spaces, layout)
+            if step_fingerprint is None:
+                return None
+            step_fingerprints.append(step_fingerprint)
+        return stable_digest('sequential', tuple(step_fingerprints))
+
+
+def iter_steps(operation: QOperation, spaces: KetSpaces) -> Iterator[tuple[QOperation, KetSpaces]]:
+    if isinstance(operation, Sequential):
+        for step in operation.steps:
+            yield from iter_steps(step, spaces)
+    elif isinstance(operation, Remapped):
+        yield from iter_steps(operation.original, operation.mapping(structure_of(spaces)))
+    else:
+        yield operation, spaces
+
+
+def plan_sequential(operation: QOperation, spaces: KetSpaces) -> ContractionPlan:
+    # estimates the contraction of ToTensor without running it
+    return plan_steps(tuple(iter_steps(operation, spaces))[::-1])
+
+
+def plan_steps(steps: Iterable[tuple[QOperation, KetSpaces]]) -> ContractionPlan:
+    supports = (layout_of(step_spaces).spaces for _, step_spaces in steps)
+    return plan_chain(supports, lambda space: space.n)
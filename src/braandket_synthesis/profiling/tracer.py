@@ -0,0 +1,246 @@
+import functools
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from braandket import MixedStateTensor, OperatorTensor, PureStateTensor
+from braandket_synthesis.basics import QOperation, QOperationTrait
+from braandket_synthesis.operations import KrausOperation, MatrixOperation
+from braandket_synthesis.traits import Apply, IsDiagonal, KetSpaces, ToMonomial
+from braandket_synthesis.utils import layout_of
+
+# the trait methods wrapped while tracing, with the index of the state tensor in their arguments (if any)
+TRACED_METHODS = {
+    'apply_on_state_tensor': 0,
+    'measure_on_state_tensor': 0,
+    'to_tensor': None,
+}
+
+Metric = str  # one of 'time', 'flops' and 'bytes'
+
+
+class TraceNode:
+    def __init__(self, *, operation: QOperation, method: str, kind: Optional[str], size: int):
+        self.operation = operation
+        self.method = method
+        self.kind = kind  # 'pure', 'mixed' or None (for to_tensor)
+        self.size = size  # the number of elements of the input state, or of the output operator
+        self.flops = 0  # estimated, excluding the children
+        self.bytes = 0  # the size of the output state or operator
+        self.time = 0.0  # wall time, including the children
+        self.children: list['TraceNode'] = []
+
+    @property
+    def label(self) -> str:
+        return self.operation.name or type(self.operation).__name__
+
+    @property
+    def self_time(self) -> float:
+        return max(0.0, self.time - sum(child.time for child in self.children))
+
+    @property
+    def total_flops(self) -> int:
+        return self.flops + sum(child.total_flops for child in self.children)
+
+    @property
+    def total_bytes(self) -> int:
+        return self.bytes + sum(child.total_bytes for child in self.children)
+
+    def iter_nodes(self) -> Iterator['TraceNode']:
+        yield self
+        for child in self.children:
+            yield from child.iter_nodes()
+
+    def __repr__(self):
+        return f"<TraceNode label={self.label}, method={self.method}, kind={self.kind}, size={self.size}, " \
+               f"time={self.time:.6f}, flops={self.flops}, bytes={self.bytes}, children={len(self.children)}>"
+
+
+class Tracer:
+    # records the nested trait calls while entered, in the current context (thread or task) only
+    def __init__(self):
+        self._roots: list[TraceNode] = []
+        self._stack: list[TraceNode] = []
+        self._token: Optional[Token] = None
+
+    @property
+    def roots(self) -> tuple[TraceNode, ...]:
+        return tuple(self._roots)
+
+    def iter_nodes(self) -> Iterator[TraceNode]:
+        for root in self._roots:
+            yield from root.iter_nodes()
+
+    def __enter__(self) -> 'Tracer':
+        if _active_tracer.get() is not None:
+            raise RuntimeError("Another tracer is already active!")
+        install_tracing()
+        self._token = _active_tracer.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stack.clear()
+        _active_tracer.reset(self._token)
+        self._token = None
+
+    def _record(self, method: Callable, method_name: str, trait: QOperationTrait, args: tuple, kwargs: dict) -> Any:
+        operation = trait.operation
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None and parent.operation is operation:
+            # a trait delegating to another trait of the same operation (e.g. Apply to Measure)
+            return method(trait, *args, **kwargs)
+
+        tensor_index = TRACED_METHODS[method_name]
+        tensor = args[tensor_index] if tensor_index is not None else None
+        node = TraceNode(
+            operation=operation, method=method_name,
+            kind=state_kind(tensor), size=state_size(tensor))
+        (parent.children if parent is not None else self._roots).append(node)
+
+        self._stack.append(node)
+        start = time.perf_counter()
+        try:
+            output = method(trait, *args, **kwargs)
+        finally:
+            node.time = time.perf_counter() - start
+            self._stack.pop()
+
+        output_tensor = output[0] if isinstance(output, tuple) else output
+        node.bytes = state_bytes(output_tensor)
+        if tensor is None:
+            node.size = state_size(output_tensor)
+        else:
+            spaces = args[tensor_index + 1] if len(args) > tensor_index + 1 else kwargs.get('spaces')
+            node.flops = estimate_flops(operation, tensor, spaces)
+        return output
+
+    # reports
+
+    def folded(self, metric: Metric = 'time') -> str:
+        # one line per call stack, as "root;child;leaf value", the input of flamegraph.pl and speedscope
+        weights: dict[str, int] = {}
+
+        def visit(node: TraceNode, prefix: str):
+            stack = f"{prefix};{node.label}" if prefix else node.label
+            weight = node_weight(node, metric)
+            if weight > 0:
+                weights[stack] = weights.get(stack, 0) + weight
+            for child in node.children:
+                visit(child, stack)
+
+        for root in self._roots:
+            visit(root, '')
+        return ''.join(f"{stack} {weight}\n" for stack, weight in weights.items())
+
+    def write_folded(self, path: str, metric: Metric = 'time'):
+        with open(path, 'w') as file:
+            file.write(self.folded(metric))
+
+    def totals(self) -> dict[str, dict[str, Union[int, float]]]:
+        # aggregated by label, with the time excluding the children
+        totals = {}
+        for node in self.iter_nodes():
+            total = totals.setdefault(node.label, {'calls': 0, 'time': 0.0, 'flops': 0, 'bytes': 0})
+            total['calls'] += 1
+            total['time'] += node.self_time
+            total['flops'] += node.flops
+            total['bytes'] += node.bytes
+        return totals
+
+    def __repr__(self):
+        return f"<Tracer roots={len(self._roots)}, active={_active_tracer.get() is self}>"
+
+
+# the tracer entered in the current context, looked up by the wrappers of the traced methods
+_active_tracer: ContextVar[Optional[Tracer]] = ContextVar('_active_tracer', default=None)
+
+
+def install_tracing():
+    # wraps the traced methods of the trait classes defined so far, each only once and kept afterwards,
+    # so that a trait class defined later is covered from the next time a tracer is entered
+    for trait_cls in iter_trait_classes(Apply):
+        for method_name in TRACED_METHODS:
+            method = trait_cls.__dict__.get(method_name)
+            if method is None or getattr(method, '__isabstractmethod__', False) or hasattr(method, '__traced__'):
+                continue
+            setattr(trait_cls, method_name, traced_method(method, method_name))
+
+
+def traced_method(method: Callable, method_name: str) -> Callable:
+    @functools.wraps(method)
+    def wrapper(trait: QOperationTrait, *args, **kwargs):
+        tracer = _active_tracer.get()
+        if tracer is None:
+            return method(trait, *args, **kwargs)
+        return tracer._record(method, method_name, trait, args, kwargs)
+
+    wrapper.__traced__ = method
+    return wrapper
+
+
+def node_weight(node: TraceNode, metric: Metric) -> int:
+    if metric == 'time':
+        return int(round(node.self_time * 1e6))  # microseconds
+    if metric == 'flops':
+        return node.flops
+    if metric == 'bytes':
+        return node.bytes
+    raise ValueError(f"Unexpected metric: {metric}")
+
+
+def iter_trait_classes(cls: type) -> Iterable[type]:
+    visited = set()
+    pending = [cls]
+    while pending:
+        trait_cls = pending.pop()
+        if trait_cls in visited:
+            continue
+        visited.add(trait_cls)
+        yield trait_cls
+        pending.extend(trait_cls.__subclasses__())
+
+
+def state_kind(tensor: Any) -> Optional[str]:
+    if isinstance(tensor, PureStateTensor):
+        return 'pure'
+    if isinstance(tensor, MixedStateTensor):
+        return 'mixed'
+    return None
+
+
+def state_size(tensor: Any) -> int:
+    if isinstance(tensor, (PureStateTensor, MixedStateTensor, OperatorTensor)):
+        return int(np.size(tensor.values()))
+    return 0
+
+
+def state_bytes(tensor: Any) -> int:
+    if isinstance(tensor, (PureStateTensor, MixedStateTensor, OperatorTensor)):
+        return int(getattr(tensor.values(), 'nbytes', 0))
+    return 0
+
+
+def estimate_flops(
+        operation: QOperation,
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: Optional[KetSpaces],
+) -> int:
+    # real floating-point operations of the numeric kernels, structural operations count none by themselves
+    if spaces is None or not isinstance(operation, (MatrixOperation, KrausOperation)):
+        return 0
+    size = state_size(tensor)
+    sides = 2 if isinstance(tensor, MixedStateTensor) else 1
+    n = layout_of(spaces).size
+
+    if isinstance(operation, KrausOperation):
+        return sides * len(operation.matrices) * 8 * size * n
+
+    monomial = operation.trait(ToMonomial).to_monomial()
+    if monomial is not None:
+        _, phases = monomial
+        return 0 if phases is None else sides * 6 * size
+    if operation.trait(IsDiagonal).is_diagonal():
+        return sides * 6 * size
+    return sides * 8 * size * n
@@ -0,0 +1,5 @@
+from .parallel import sample_parallel
+from .sampling import sample
+from .stabilizer import StabilizerTableau, compile_stabilizer, run_stabilizer, sample_stabilizer
+from .trajectories import TrajectoriesResult, run_trajectories
+from .out_of_core import MemmapState, run_out_of_core
@@ -0,0 +1,228 @@
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+from braandket import KetSpace, MixedStateTensor, PureStateTensor, numpy_backend
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.compiling.tape import ControlledInstruction, DesiredMeasurementInstruction, \
+    KernelInstruction, ProjectiveMeasurementInstruction, TapeInstruction, compile_tape
+from braandket_synthesis.kernels import choose_values, iter_chunks, map_chunks, streaming_collapse, \
+    streaming_marginal_probabilities
+from braandket_synthesis.operations import MeasurementResult
+from braandket_synthesis.traits import KetSpaces
+from braandket_synthesis.utils import Rng, get_rng, rng_context
+
+DEFAULT_MEMORY_BUDGET = 1 << 28  # bytes
+
+
+class MemmapState:
+    # a state whose amplitudes live in a file, ordered as [*spaces] (and then [*bra_spaces] if mixed)
+    def __init__(self,
+            values: np.memmap,
+            spaces: Iterable[KetSpace], *,
+            mixed: bool = False,
+            memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ):
+        spaces = tuple(spaces)
+        shape = tuple(space.n for space in spaces)
+        if np.shape(values) != (shape + shape if mixed else shape):
+            raise ValueError(f"The shape of values {np.shape(values)} does not match spaces={spaces}!")
+        self._values = values
+        self._spaces = spaces
+        self._mixed = mixed
+        self._memory_budget = memory_budget
+
+    @classmethod
+    def create(cls,
+            path: str,
+            spaces: Iterable[KetSpace], *,
+            mixed: bool = False,
+            memory_budget: int = DEFAULT_MEMORY_BUDGET,
+            dtype: np.dtype = np.complex128,
+    ) -> 'MemmapState':
+        # initialized as |0...0>, the file is created sparse, so only the touched pages take disk space
+        spaces = tuple(spaces)
+        shape = tuple(space.n for space in spaces)
+        values = np.memmap(path, dtype=dtype, mode='w+', shape=shape + shape if mixed else shape)
+        values[(0,) * np.ndim(values)] = 1
+        return cls(values, spaces, mixed=mixed, memory_budget=memory_budget)
+
+    @classmethod
+    def open(cls,
+            path: str,
+            spaces: Iterable[KetSpace], *,
+            mixed: bool = False,
+            memory_budget: int = DEFAULT_MEMORY_BUDGET,
+            dtype: np.dtype = np.complex128,
+            mode: str = 'r+',
+    ) -> 'MemmapState':
+        spaces = tuple(spaces)
+        shape = tuple(space.n for space in spaces)
+        values = np.memmap(path, dtype=dtype, mode=mode, shape=shape + shape if mixed else shape)
+        return cls(values, spaces, mixed=mixed, memory_budget=memory_budget)
+
+    @classmethod
+    def from_tensor(cls,
+            path: str,
+            tensor: Union[PureStateTensor, MixedStateTensor], *,
+            memory_budget: int = DEFAULT_MEMORY_BUDGET,
+            dtype: np.dtype = np.complex128,
+    ) -> 'MemmapState':
+        if not isinstance(tensor, (PureStateTensor, MixedStateTensor)):
+            raise TypeError(f"Unexpected type of tensor: {type(tensor)}")
+        spaces = tensor.ket_spaces
+        if len(spaces) != len(tuple(space for space in tensor.spaces if isinstance(space, KetSpace))):
+            raise ValueError("Batched tensors are not supported!")
+        mixed = isinstance(tensor, MixedStateTensor)
+        state = cls.create(path, spaces, mixed=mixed, memory_budget=memory_budget, dtype=dtype)
+        if mixed:
+            state.values[...] = tensor.values(*spaces, *(space.ct for space in spaces))
+        else:
+            state.values[...] = tensor.values(*spaces)
+        return state
+
+    @property
+    def values(self) -> np.memmap:
+        return self._values
+
+    @property
+    def spaces(self) -> tuple[KetSpace, ...]:
+        return self._spaces
+
+    @property
+    def mixed(self) -> bool:
+        return self._mixed
+
+    @property
+    def memory_budget(self) -> int:
+        return self._memory_budget
+
+    @property
+    def chunk_size(self) -> int:
+        # the number of elements in a chunk, leaving room for the copies made by the kernels
+        return max(1, self._memory_budget // (4 * self._values.itemsize))
+
+    def to_tensor(self) -> Union[PureStateTensor, MixedStateTensor]:
+        # loads the whole state into memory
+        if self.mixed:
+            spaces = (*self.spaces, *(space.ct for space in self.spaces))
+            return MixedStateTensor(np.array(self.values), spaces, numpy_backend)
+        return PureStateTensor(np.array(self.values), self.spaces, numpy_backend)
+
+    def norm(self) -> float:
+        if self.mixed:
+            return float(np.sum(streaming_marginal_probabilities(self.values, (), self.chunk_size, len(self.spaces))))
+        total = 0.0
+        for chunk in iter_chunks(np.shape(self.values), (), self.chunk_size):
+            total += float(np.sum(np.abs(np.asarray(self.values[chunk])) ** 2))
+        return total
+
+    def probabilities(self, spaces: Iterable[KetSpace]) -> np.ndarray:
+        # the marginal probabilities on spaces, shaped as [*spaces], by a streaming reduction
+        axes = tuple(self.spaces.index(space) for space in spaces)
+        bra_base = len(self.spaces) if self.mixed else None
+        return streaming_marginal_probabilities(self.values, axes, self.chunk_size, bra_base)
+
+    def flush(self):
+        self.values.flush()
+
+    def __repr__(self):
+        return f"<MemmapState spaces={self.spaces}, mixed={self.mixed}, memory_budget={self.memory_budget}>"
+
+
+def run_out_of_core(
+        operation: QOperation,
+        state: MemmapState,
+        spaces: Optional[KetSpaces] = None, *,
+        rng: Optional[Rng] = None,
+) -> tuple[MeasurementResult, ...]:
+    # applies operation on state in place, reading and writing the file chunk by chunk
+    if spaces is None:
+        spaces = state.spaces
+    tape = compile_tape(operation, spaces, state_spaces=state.spaces)
+    check_out_of_core(tape.instructions)
+    if rng is None:
+        rng = get_rng()
+
+    results = []
+    for instruction in tape.instructions:
+        result = run_instruction_out_of_core(instruction, state, rng)
+        if result is not None:
+            results.append(result)
+    state.flush()
+    return tuple(results)
+
+
+def check_out_of_core(instructions: Iterable[TapeInstruction]):
+    # all the instructions are checked before any of them is run, since the kernels rewrite the file in place
+    for instruction in instructions:
+        if not isinstance(instruction, (
+                KernelInstruction, ProjectiveMeasurementInstruction, DesiredMeasurementInstruction)):
+            raise ValueError(f"{instruction} can not be run out of core, only matrix, diagonal, permutation and "
+                             f"controlled kernels and measurements are supported!")
+
+
+def run_instruction_out_of_core(
+        instruction: TapeInstruction,
+        state: MemmapState,
+        rng: Rng,
+) -> Optional[MeasurementResult]:
+    if isinstance(instruction, KernelInstruction):
+        apply_kernel_out_of_core(instruction, state.values, 0, False, state.chunk_size)
+        if state.mixed:
+            apply_kernel_out_of_core(instruction, state.values, len(state.spaces), True, state.chunk_size)
+        return None
+
+    if isinstance(instruction, ProjectiveMeasurementInstruction):
+        flat_spaces = instruction.layout.spaces
+        probs = state.probabilities(flat_spaces)
+        with rng_context(rng):
+            values, prob = choose_values(probs, 0)
+        values = tuple(int(value) for value in values)
+        collapse_out_of_core(state, flat_spaces, values, float(prob))
+        return MeasurementResult(
+            values=instruction.layout.restore(values), probability=float(prob), operation=instruction.operation)
+
+    if isinstance(instruction, DesiredMeasurementInstruction):
+        flat_spaces = instruction.flat_spaces
+        values = tuple(int(value) for value in instruction.flat_values)
+        probs = state.probabilities(flat_spaces)
+        prob = float(probs[values] / np.sum(probs))
+        collapse_out_of_core(state, flat_spaces, values, prob)
+        return MeasurementResult(
+            values=instruction.operation.values, probability=prob, operation=instruction.operation)
+
+    raise ValueError(f"{instruction} can not be run out of core, only matrix, diagonal, permutation and controlled "
+                     f"kernels and measurements are supported!")
+
+
+def apply_kernel_out_of_core(
+        instruction: KernelInstruction,
+        values: np.ndarray,
+        base: int,
+        conjugate: bool,
+        chunk_size: int,
+):
+    # the controls select a (strided) view of values, so only the kernels on the targets are chunked
+    if isinstance(instruction, ControlledInstruction):
+        slices = [slice(None)] * np.ndim(values)
+        for axis, key in zip(instruction.control_axes, instruction.keys):
+            slices[base + axis] = key
+        sub_values = values[tuple(slices)]
+        for sub_instruction in instruction.instructions:
+            apply_kernel_out_of_core(sub_instruction, sub_values, base, conjugate, chunk_size)
+        return
+
+    # each chunk holds the full fibers along the target axes
+    target_axes = tuple(base + axis for axis in instruction.axes)
+    map_chunks(values, lambda chunk_values, _: (
+        instruction.apply(chunk_values, base, conjugate)), target_axes, chunk_size)
+
+
+def collapse_out_of_core(state: MemmapState, spaces: Iterable[KetSpace], values: tuple[int, ...], prob: float):
+    axes = tuple(state.spaces.index(space) for space in spaces)
+    if state.mixed:
+        bra_axes = tuple(len(state.spaces) + axis for axis in axes)
+        streaming_collapse(state.values, (*axes, *bra_axes), (*values, *values), 1 / prob, state.chunk_size)
+    else:
+        streaming_collapse(state.values, axes, values, 1 / np.sqrt(prob), state.chunk_size)
@@ -0,0 +1,114 @@
+import copyreg
+import io
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, Optional, Union
+
+import numpy as np
+
+from braandket import BraSpace, KetSpace, MixedStateTensor, PureStateTensor
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.traits import KetSpaces
+from .sampling import sample
+
+Job = tuple[QOperation, Union[PureStateTensor, MixedStateTensor], KetSpaces]
+
+
+def sample_parallel(
+        operation: QOperation,
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: KetSpaces,
+        shots: int, *,
+        seed: Union[None, int, np.random.SeedSequence] = None,
+        chunks: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        fork: bool = False,
+) -> dict[tuple, int]:
+    # the shots are split into chunks, each sampled with a Generator spawned from the root seed,
+    # so the counts depend on seed and chunks but not on the number of workers
+    # the job is pickled for the workers, unless fork=True, with which forked workers inherit it,
+    # so that operations with lambda mappings need not be pickled
+    if chunks is None:
+        chunks = 64
+    chunks = max(1, min(chunks, shots))
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    chunks_seed = root.spawn(chunks)
+    chunks_shots = split_shots(shots, chunks)
+
+    job = (operation, tensor, spaces)
+    if fork:
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise ValueError("Forking workers is not supported on this platform!")
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers, mp_context=context, initializer=set_worker_job, initargs=(job,)) \
+                as executor:
+            futures = [
+                executor.submit(sample_worker_chunk, chunk_shots, chunk_seed)
+                for chunk_shots, chunk_seed in zip(chunks_shots, chunks_seed)]
+            return merge_counts(future.result() for future in futures)
+
+    job_bytes = dump_job(job)
+    with ProcessPoolExecutor(max_workers) as executor:
+        futures = [
+            executor.submit(sample_pickled_chunk, job_bytes, chunk_shots, chunk_seed)
+            for chunk_shots, chunk_seed in zip(chunks_shots, chunks_seed)]
+        return merge_counts(future.result() for future in futures)
+
+
+def sample_chunk(job: Job, shots: int, seed: np.random.SeedSequence) -> dict[tuple, int]:
+    # all the draws (including those of nested measurements and Kraus sampling) go through the chunk generator,
+    # instead of the global random state inherited by every forked worker
+    operation, tensor, spaces = job
+    return sample(operation, tensor, spaces, shots, rng=np.random.default_rng(seed))
+
+
+def sample_pickled_chunk(job_bytes: bytes, shots: int, seed: np.random.SeedSequence) -> dict[tuple, int]:
+    return sample_chunk(pickle.loads(job_bytes), shots, seed)
+
+
+# the job of a forked worker, set in the worker process only (by the initializer)
+_worker_job: Optional[Job] = None
+
+
+def set_worker_job(job: Job):
+    global _worker_job
+    _worker_job = job
+
+
+def sample_worker_chunk(shots: int, seed: np.random.SeedSequence) -> dict[tuple, int]:
+    return sample_chunk(_worker_job, shots, seed)
+
+
+def dump_job(job: Job) -> bytes:
+    # the spaces are pickled by (n, name), with the memo keeping them shared within the job
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer)
+    pickler.dispatch_table = {**copyreg.dispatch_table, KetSpace: reduce_ket_space, BraSpace: reduce_bra_space}
+    try:
+        pickler.dump(job)
+    except (pickle.PicklingError, AttributeError, TypeError) as e:
+        raise ValueError(f"The job can not be pickled ({e}), consider sampling with fork=True!") from e
+    return buffer.getvalue()
+
+
+def reduce_ket_space(space: KetSpace) -> tuple[Any, tuple]:
+    return KetSpace, (space.n, space.name)
+
+
+def reduce_bra_space(space: BraSpace) -> tuple[Any, tuple]:
+    return getattr, (space.ket, 'ct')
+
+
+def split_shots(shots: int, chunks: int) -> list[int]:
+    quotient, remainder = divmod(shots, chunks)
+    return [quotient + (1 if i < remainder else 0) for i in range(chunks)]
+
+
+def merge_counts(counts_list: Iterable[dict[tuple, int]]) -> dict[tuple, int]:
+    merged = {}
+    for counts in counts_list:
+        for key, count in counts.items():
+            merged[key] = merged.get(key, 0) + count
+    return merged
+
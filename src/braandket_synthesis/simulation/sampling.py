@@ -0,0 +1,142 @@
+import operator
+from typing import Callable, Iterable, Optional, Union
+
+import numpy as np
+
+from braandket import MixedStateTensor, NumSpace, PureStateTensor
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.kernels import collapse_state_tensor, marginal_probabilities
+from braandket_synthesis.operations import DesiredMeasurement, KrausOperation, ProjectiveMeasurement, iter_steps
+from braandket_synthesis.traits import Apply, KetSpaces, Measure, is_sampling_kraus
+from braandket_synthesis.traits.measure import QOperationMeasure
+from braandket_synthesis.utils import Rng, get_rng, layout_of, rng_context
+
+
+def sample(
+        operation: QOperation,
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: KetSpaces,
+        shots: int, *,
+        rng: Optional[Rng] = None,
+) -> dict[tuple, int]:
+    # counts of the results of all ProjectiveMeasurement steps, keyed by a tuple with one value per measurement
+    if any(isinstance(space, NumSpace) for space in tensor.spaces):
+        raise ValueError("Sampling on batched state tensors is not supported!")
+    if rng is None:
+        rng = get_rng()
+    with rng_context(rng):
+        return sample_by_branching(tuple(iter_steps(operation, spaces)), tensor, shots, rng)
+
+
+def sample_by_branching(
+        steps: Iterable[tuple[QOperation, KetSpaces]],
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        shots: int,
+        rng: Rng,
+) -> dict[tuple, int]:
+    # the shots are split among the outcomes of each measurement, every distinct branch is simulated once,
+    # except after a random step (e.g. a measurement nested in Controlled), which is simulated for each shot
+    steps = tuple(steps)
+    # the top-level measurements are branched on, instead of being simulated for each shot
+    random_steps = tuple(
+        not isinstance(step, ProjectiveMeasurement) and is_random_step(step)
+        for step, _ in steps)
+    terminal_i = len(steps)
+    while terminal_i > 0 and isinstance(steps[terminal_i - 1][0], ProjectiveMeasurement):
+        terminal_i -= 1
+
+    # the branches are visited depth-first from an explicit stack, so deep circuits do not hit the recursion limit,
+    # the children are pushed in reverse (so the draws are made in the order of the outcomes),
+    # each holding the parent tensor and collapsed only when popped
+    results = {}
+    stack = [(0, tensor, shots, (), None)]
+    while stack:
+        step_i, branch_tensor, branch_shots, key, collapse = stack.pop()
+        if collapse is not None:
+            branch_tensor = collapse_state_tensor(branch_tensor, *collapse)
+        while step_i < terminal_i and not isinstance(steps[step_i][0], ProjectiveMeasurement):
+            if random_steps[step_i] and branch_shots > 1:
+                break
+            step, step_spaces = steps[step_i]
+            branch_tensor = step.trait(Apply).apply_on_state_tensor(branch_tensor, step_spaces)
+            step_i += 1
+
+        if step_i < terminal_i and random_steps[step_i] and branch_shots > 1:
+            # each shot draws its own outcome of the random step
+            stack.extend((step_i, branch_tensor, 1, key, None) for _ in range(branch_shots))
+            continue
+        if step_i >= len(steps):
+            results[key] = results.get(key, 0) + branch_shots
+            continue
+        if step_i >= terminal_i:
+            for terminal_key, count in sample_terminal(steps[step_i:], branch_tensor, branch_shots, rng).items():
+                results[key + terminal_key] = results.get(key + terminal_key, 0) + count
+            continue
+
+        _, step_spaces = steps[step_i]
+        layout = layout_of(step_spaces)
+        measured_spaces = layout.spaces
+        probs = marginal_probabilities(branch_tensor, measured_spaces)
+        shape = np.shape(probs)
+        probs = np.ravel(probs) / np.sum(probs)
+        counts = rng.multinomial(branch_shots, probs)
+        for case_i in reversed(np.flatnonzero(counts)):
+            values = tuple(int(value) for value in np.unravel_index(case_i, shape))
+            case_key = key + (layout.restore(values),)
+            collapse = measured_spaces, values, probs[case_i]
+            stack.append((step_i + 1, branch_tensor, int(counts[case_i]), case_key, collapse))
+
+    return results
+
+
+def is_random_step(operation: QOperation) -> bool:
+    # whether applying operation may draw random numbers, by a measurement or a sampled Kraus branch (maybe nested)
+    if isinstance(operation, DesiredMeasurement):
+        return False
+    if isinstance(operation, KrausOperation):
+        return is_sampling_kraus() and len(operation.matrices) > 1
+    children = operation.children()
+    if children:
+        return any(is_random_step(child) for child in children)
+    return not isinstance(operation.trait(Measure), QOperationMeasure)
+
+
+def sample_terminal(
+        measurements: Iterable[tuple[QOperation, KetSpaces]],
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        shots: int,
+        rng: Rng,
+) -> dict[tuple, int]:
+    measurements = tuple(measurements)
+    measured_spaces = tuple(dict.fromkeys(
+        space for _, step_spaces in measurements for space in layout_of(step_spaces).spaces))
+
+    probs = marginal_probabilities(tensor, measured_spaces)
+    shape = np.shape(probs)
+    probs = np.ravel(probs)
+    counts = rng.multinomial(shots, probs / np.sum(probs))
+
+    positions = {space: i for i, space in enumerate(measured_spaces)}
+    layouts = tuple(layout_of(step_spaces) for _, step_spaces in measurements)
+    builders = tuple(
+        key_builder(layout.restore(tuple(positions[space] for space in layout.spaces)))
+        for layout in layouts)
+
+    cases_i = np.flatnonzero(counts)
+    cases_values = np.stack(np.unravel_index(cases_i, shape), axis=-1).tolist()
+    results = {}
+    for case_count, case_values in zip(counts[cases_i].tolist(), cases_values):
+        key = tuple(builder(case_values) for builder in builders)
+        results[key] = results.get(key, 0) + case_count
+    return results
+
+
+def key_builder(template: Union[int, tuple]) -> Callable[[list[int]], Union[int, tuple]]:
+    # template holds the positions of values in the structure of the measured spaces
+    if not isinstance(template, tuple):
+        return operator.itemgetter(template)
+    if template and all(isinstance(item, int) for item in template):
+        getter = operator.itemgetter(*template)
+        return (lambda values: (getter(values),)) if len(template) == 1 else getter
+    builders = tuple(key_builder(item) for item in template)
+    return lambda values: tuple(builder(values) for builder in builders)
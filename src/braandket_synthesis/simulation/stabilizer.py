@@ -0,0 +1,283 @@
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.operations import DesiredMeasurement, MeasurementResult, ProjectiveMeasurement, iter_steps
+from braandket_synthesis.traits import IsClifford, KetSpaces, ToTensor
+from braandket_synthesis.utils import Rng, conjugation_table, get_rng, iter_structure, layout_of
+
+Table = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class StabilizerTableau:
+    # Aaronson-Gottesman tableau: rows [0, n) are destabilizers and [n, 2n) stabilizers,
+    # each row is (-1)^r times a Hermitian Pauli string with (x, z) = (1, 1) meaning Y
+    def __init__(self, n: int):
+        self._n = n
+        self.x = np.zeros((2 * n, n), dtype=bool)
+        self.z = np.zeros((2 * n, n), dtype=bool)
+        self.r = np.zeros((2 * n,), dtype=bool)
+        self.x[np.arange(n), np.arange(n)] = True
+        self.z[np.arange(n) + n, np.arange(n)] = True
+
+    @property
+    def n(self) -> int:
+        return self._n
+
+    def copy(self) -> 'StabilizerTableau':
+        tableau = StabilizerTableau.__new__(StabilizerTableau)
+        tableau._n = self._n
+        tableau.x = self.x.copy()
+        tableau.z = self.z.copy()
+        tableau.r = self.r.copy()
+        return tableau
+
+    def apply_table(self, qubits: Iterable[int], table: Table):
+        # conjugates every row by a Clifford, given the images of the generators X_i and Z_i on qubits:
+        # a row (x, z) is i^|x & z| prod_i X_i^x_i prod_i Z_i^z_i, so its image is the product of the generator images
+        qubits = list(qubits)
+        new_x, new_z, flip = table
+        k = len(qubits)
+        x, z = self.x[:, qubits], self.z[:, qubits]
+        image_x = np.zeros_like(x)
+        image_z = np.zeros_like(z)
+        exponents = np.sum(x & z, axis=-1, dtype=np.int64)  # of i
+        for generator, generator_bits in enumerate((*x.T, *z.T)):
+            rows = np.flatnonzero(generator_bits)
+            if len(rows) == 0:
+                continue
+            g = pauli_phase(image_x[rows], image_z[rows], new_x[generator][None], new_z[generator][None])
+            exponents[rows] += np.sum(g, axis=-1, dtype=np.int64) + 2 * int(flip[generator])
+            image_x[rows] ^= new_x[generator]
+            image_z[rows] ^= new_z[generator]
+        self.x[:, qubits] = image_x
+        self.z[:, qubits] = image_z
+        self.r ^= np.mod(exponents, 4) == 2
+
+    def measure(self, qubit: int, rng: Rng, desired: Optional[int] = None) -> tuple[int, float]:
+        # a desired outcome contradicting a deterministic one is given probability 0, leaving the tableau untouched
+        outcome = self.peek(qubit)
+        if outcome is None:
+            outcome = int(rng.random() < 0.5) if desired is None else int(desired)
+            self.collapse(qubit, outcome)
+            return outcome, 0.5
+        if desired is not None and int(desired) != outcome:
+            return int(desired), 0.0
+        return outcome, 1.0
+
+    def peek(self, qubit: int) -> Optional[int]:
+        # the outcome of measuring qubit if it is deterministic, otherwise None, without changing the tableau
+        n = self.n
+        if np.any(self.x[n:2 * n, qubit]):
+            return None
+        # the sign of the product of the stabilizers paired with the destabilizers on qubit
+        return int(self._product_sign(np.flatnonzero(self.x[:n, qubit]) + n))
+
+    def collapse(self, qubit: int, outcome: int):
+        # collapses a qubit with a random outcome (see peek) onto the given one
+        n = self.n
+        p = n + int(np.flatnonzero(self.x[n:2 * n, qubit])[0])
+        rows = np.flatnonzero(self.x[:2 * n, qubit])
+        self._rowsum(rows[rows != p], p)
+        self.x[p - n], self.z[p - n], self.r[p - n] = self.x[p], self.z[p], self.r[p]
+        self.x[p] = False
+        self.z[p] = False
+        self.z[p, qubit] = True
+        self.r[p] = bool(outcome)
+
+    def _rowsum(self, rows: np.ndarray, i: int):
+        # rows <- rows * row i, with the phase exponents summed mod 4
+        if len(rows) == 0:
+            return
+        g = pauli_phase(self.x[i], self.z[i], self.x[rows], self.z[rows])
+        total = 2 * self.r[rows].astype(np.int64) + 2 * int(self.r[i]) + np.sum(g, axis=-1, dtype=np.int64)
+        self.r[rows] = np.mod(total, 4) == 2
+        self.x[rows] ^= self.x[i]
+        self.z[rows] ^= self.z[i]
+
+    def _product_sign(self, rows: np.ndarray) -> bool:
+        # the sign of rows[0] * rows[1] * ..., multiplying each row onto the product of the preceding ones
+        if len(rows) == 0:
+            return False
+        x, z = self.x[rows], self.z[rows]
+        columns = np.flatnonzero(np.any(x | z, axis=0))  # the qubits on which the product is non-trivial
+        x, z = x[:, columns], z[:, columns]
+        prefix_x = np.zeros_like(x)
+        prefix_z = np.zeros_like(z)
+        np.logical_xor.accumulate(x[:-1], axis=0, out=prefix_x[1:])
+        np.logical_xor.accumulate(z[:-1], axis=0, out=prefix_z[1:])
+        g = pauli_phase(x, z, prefix_x, prefix_z)
+        total = 2 * np.sum(self.r[rows], dtype=np.int64) + np.sum(g, dtype=np.int64)
+        return bool(np.mod(total, 4) == 2)
+
+    def __repr__(self):
+        return f"<StabilizerTableau n={self.n}>"
+
+
+class StabilizerGate:
+    def __init__(self, qubits: tuple[int, ...], table: Table):
+        self.qubits = qubits
+        self.table = table
+
+    def run(self, tableau: StabilizerTableau, rng: Rng) -> Optional[MeasurementResult]:
+        tableau.apply_table(self.qubits, self.table)
+        return None
+
+
+class StabilizerMeasurement:
+    def __init__(self, operation: QOperation, spaces: KetSpaces, qubits: tuple[int, ...]):
+        self.operation = operation
+        self.layout = layout_of(spaces)
+        self.qubits = qubits
+        if isinstance(operation, DesiredMeasurement):
+            self.desired = tuple(iter_structure(operation.values))
+        else:
+            self.desired = (None,) * len(qubits)
+
+    def run(self, tableau: StabilizerTableau, rng: Rng) -> Optional[MeasurementResult]:
+        # a desired outcome may become contradicted only after collapsing the preceding qubits,
+        # so they are collapsed on a copy, which is kept only if the whole outcome is possible
+        working = tableau.copy() if isinstance(self.operation, DesiredMeasurement) and len(self.qubits) > 1 \
+            else tableau
+        values = []
+        prob = 1.0
+        for qubit, desired in zip(self.qubits, self.desired):
+            value, value_prob = working.measure(qubit, rng, desired)
+            values.append(value)
+            prob *= value_prob
+            if prob == 0.0:
+                values.extend(self.desired[len(values):])
+                break
+        if working is not tableau and prob != 0.0:
+            tableau.x, tableau.z, tableau.r = working.x, working.z, working.r
+        values = self.layout.restore(values)
+        return MeasurementResult(values=values, probability=prob, operation=self.operation)
+
+
+def _pauli_phase_table() -> np.ndarray:
+    table = np.zeros((16,), dtype=np.int8)
+    for code in range(16):
+        x1, z1, x2, z2 = (code >> 3) & 1, (code >> 2) & 1, (code >> 1) & 1, code & 1
+        if x1 and z1:
+            table[code] = z2 - x2
+        elif x1:
+            table[code] = z2 * (2 * x2 - 1)
+        elif z1:
+            table[code] = x2 * (1 - 2 * z2)
+    return table
+
+
+_PAULI_PHASE_TABLE = _pauli_phase_table()
+
+
+def pauli_phase(x1: np.ndarray, z1: np.ndarray, x2: np.ndarray, z2: np.ndarray) -> np.ndarray:
+    # the exponent of i picked up by each qubit when multiplying Pauli (x1, z1) onto (x2, z2)
+    codes = (x1.view(np.uint8) << 3) | (z1.view(np.uint8) << 2) | (x2.view(np.uint8) << 1) | z2.view(np.uint8)
+    return _PAULI_PHASE_TABLE[codes]
+
+
+StabilizerInstruction = Union[StabilizerGate, StabilizerMeasurement]
+
+
+def compile_stabilizer(operation: QOperation, spaces: KetSpaces) -> list[StabilizerInstruction]:
+    qubits = {space: i for i, space in enumerate(layout_of(spaces).spaces)}
+    for space in qubits:
+        if space.n != 2:
+            raise ValueError(f"The stabilizer simulation only supports qubits, got {space}!")
+
+    tables: dict[tuple, Table] = {}
+    instructions = []
+    for step, step_spaces in iter_steps(operation, spaces):
+        if not step.trait(IsClifford).is_clifford():
+            raise ValueError(f"{step} is not a Clifford operation!")
+        step_qubits = tuple(qubits[space] for space in layout_of(step_spaces).spaces)
+        if isinstance(step, (ProjectiveMeasurement, DesiredMeasurement)):
+            instructions.append(StabilizerMeasurement(step, step_spaces, step_qubits))
+            continue
+
+        flat_spaces = layout_of(step_spaces).spaces
+        matrix, _ = step.trait(ToTensor).to_tensor(step_spaces).flatten(ket_spaces=flat_spaces)
+        matrix = np.asarray(matrix)
+        key = (matrix.shape, matrix.tobytes())
+        if key not in tables:
+            table = conjugation_table(matrix)
+            if table is None:
+                raise ValueError(f"{step} is not a Clifford operation!")
+            tables[key] = table
+        instructions.append(StabilizerGate(step_qubits, tables[key]))
+    return instructions
+
+
+def run_stabilizer(
+        operation: QOperation,
+        spaces: KetSpaces, *,
+        tableau: Optional[StabilizerTableau] = None,
+        rng: Optional[Rng] = None,
+) -> tuple[StabilizerTableau, tuple[MeasurementResult, ...]]:
+    # starts from |0...0> on spaces unless a tableau is given
+    instructions = compile_stabilizer(operation, spaces)
+    if tableau is None:
+        tableau = StabilizerTableau(len(layout_of(spaces)))
+    if rng is None:
+        rng = get_rng()
+
+    results = []
+    for instruction in instructions:
+        result = instruction.run(tableau, rng)
+        if result is not None:
+            results.append(result)
+    return tableau, tuple(results)
+
+
+def sample_stabilizer(
+        operation: QOperation,
+        spaces: KetSpaces,
+        shots: int, *,
+        rng: Optional[Rng] = None,
+) -> dict[tuple, int]:
+    # counts keyed like sample(), with one value per ProjectiveMeasurement step
+    instructions = compile_stabilizer(operation, spaces)
+    if rng is None:
+        rng = get_rng()
+
+    # the shots are split among the outcomes of each random qubit measurement, so every distinct branch is run once,
+    # the branches are visited depth-first from an explicit stack, each holding its own tableau
+    counts = {}
+    stack = [(0, 0, StabilizerTableau(len(layout_of(spaces))), shots, (), ())] if shots > 0 else []
+    while stack:
+        instruction_i, qubit_i, tableau, branch_shots, key, values = stack.pop()
+        while instruction_i < len(instructions):
+            instruction = instructions[instruction_i]
+            if isinstance(instruction, StabilizerGate):
+                instruction.run(tableau, rng)
+                instruction_i += 1
+                continue
+            if qubit_i == len(instruction.qubits):
+                if isinstance(instruction.operation, ProjectiveMeasurement):
+                    key += (instruction.layout.restore(values),)
+                instruction_i, qubit_i, values = instruction_i + 1, 0, ()
+                continue
+
+            qubit, desired = instruction.qubits[qubit_i], instruction.desired[qubit_i]
+            outcome = tableau.peek(qubit)
+            if outcome is None and desired is None:
+                ones = int(rng.binomial(branch_shots, 0.5))
+                if 0 < ones < branch_shots:
+                    one_tableau = tableau.copy()
+                    one_tableau.collapse(qubit, 1)
+                    stack.append((instruction_i, qubit_i + 1, one_tableau, ones, key, values + (1,)))
+                    branch_shots -= ones
+                    outcome = 0
+                else:
+                    outcome = int(ones > 0)
+                tableau.collapse(qubit, outcome)
+            elif outcome is None:
+                outcome = int(desired)
+                tableau.collapse(qubit, outcome)
+            elif desired is not None and int(desired) != outcome:
+                raise ValueError(f"The desired outcome of {instruction.operation} has zero probability!")
+            values += (outcome,)
+            qubit_i += 1
+        counts[key] = counts.get(key, 0) + branch_shots
+    return counts
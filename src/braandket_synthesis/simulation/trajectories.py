@@ -0,0 +1,91 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+from braandket import NumSpace, PureStateTensor
+from braandket_synthesis.basics import QOperation
+from braandket_synthesis.operations import ProjectiveMeasurement, iter_steps
+from braandket_synthesis.traits import Apply, Expectation, KetSpaces, Measure, sampling_kraus
+from braandket_synthesis.utils import Rng, get_rng, rng_context
+
+
+class TrajectoriesResult:
+    def __init__(self, *,
+            trajectories: int,
+            counts: dict[tuple, int],
+            expectations: np.ndarray,
+            standard_errors: np.ndarray,
+    ):
+        self._trajectories = trajectories
+        self._counts = counts
+        self._expectations = expectations
+        self._standard_errors = standard_errors
+
+    @property
+    def trajectories(self) -> int:
+        return self._trajectories
+
+    @property
+    def counts(self) -> dict[tuple, int]:
+        return self._counts
+
+    @property
+    def expectations(self) -> np.ndarray:
+        return self._expectations
+
+    @property
+    def standard_errors(self) -> np.ndarray:
+        return self._standard_errors
+
+    def __repr__(self):
+        return (f"<TrajectoriesResult trajectories={self.trajectories}, counts={self.counts}, "
+                f"expectations={self.expectations}>")
+
+
+def run_trajectories(
+        operation: QOperation,
+        tensor: PureStateTensor,
+        spaces: KetSpaces,
+        trajectories: int, *,
+        observables: Iterable[tuple[QOperation, KetSpaces]] = (),
+        rng: Optional[Rng] = None,
+) -> TrajectoriesResult:
+    # Monte Carlo wavefunction: every Kraus channel samples one branch so the state stays pure
+    if not isinstance(tensor, PureStateTensor):
+        raise TypeError(f"Trajectories can only start from a PureStateTensor, got {type(tensor)}!")
+    if any(isinstance(space, NumSpace) for space in tensor.spaces):
+        raise ValueError("Trajectories on batched state tensors are not supported!")
+    if rng is None:
+        rng = get_rng()
+
+    steps = tuple(iter_steps(operation, spaces))
+    observables = tuple(observables)
+
+    counts = {}
+    samples = np.zeros((trajectories, len(observables)))
+    with rng_context(rng), sampling_kraus():
+        for trajectory_i in range(trajectories):
+            trajectory_tensor = tensor
+            key = []
+            for step, step_spaces in steps:
+                if isinstance(step, ProjectiveMeasurement):
+                    trajectory_tensor, result = step.trait(Measure).measure_on_state_tensor(
+                        trajectory_tensor, step_spaces)
+                    key.append(result.value)
+                else:
+                    trajectory_tensor = step.trait(Apply).apply_on_state_tensor(trajectory_tensor, step_spaces)
+            key = tuple(key)
+            counts[key] = counts.get(key, 0) + 1
+
+            for observable_i, (observable, observable_spaces) in enumerate(observables):
+                samples[trajectory_i, observable_i] = np.real(observable.trait(Expectation).expectation_on_state_tensor(
+                    trajectory_tensor, observable_spaces))
+
+    expectations = np.mean(samples, axis=0)
+    standard_errors = np.std(samples, axis=0) / np.sqrt(max(trajectories, 1))
+    return TrajectoriesResult(
+        trajectories=trajectories,
+        counts=counts,
+        expectations=expectations,
+        standard_errors=standard_errors)
+
@@ -1,6 +1,11 @@
 from .apply import Apply, KetSpaces
+from .clifford import IsClifford
 from .diagonal import IsDiagonal
+from .expectation import Expectation, expectation
+from .fingerprint import ToFingerprint, fingerprint_axes, fingerprint_of
 from .hermitian import IsHermitian
 from .measure import Measure, R
-from .tensor import ToKraus, ToTensor
+from .permutation import Monomial, ToMonomial
+from .tensor import ToKraus, ToTensor, cached_operators, caching_operators, is_caching_operators, is_sampling_kraus, \
+    operators_cache, sample_kraus_branch, sampling_kraus
 from .unitary import IsUnitary
@@ -0,0 +1,19 @@
+import abc
+from typing import Optional
+
+from braandket_synthesis import Op, QOperation, QOperationTrait
+
+
+class IsClifford(QOperationTrait[Op], abc.ABC):
+    # whether the operation can be simulated on a stabilizer tableau (Clifford unitaries and Z-basis measurements)
+    def __call__(self) -> Optional[bool]:
+        return self.is_clifford()
+
+    @abc.abstractmethod
+    def is_clifford(self) -> Optional[bool]:
+        pass
+
+
+class QOperationIsClifford(IsClifford[QOperation], abc.ABC):
+    def is_clifford(self) -> Optional[bool]:
+        return None
@@ -0,0 +1,63 @@
+import abc
+from typing import Union
+
+import numpy as np
+
+from braandket import MixedStateTensor, OperatorTensor, PureStateTensor, QComposed, QModel, QParticle, prod
+from braandket_synthesis.basics import Op, QOperation, QOperationTrait
+from braandket_synthesis.kernels import matrix_expectation_values
+from braandket_synthesis.utils import layout_of
+from .apply import KetSpaces
+from .hermitian import IsHermitian
+from .tensor import ToTensor
+
+
+class Expectation(QOperationTrait[Op], abc.ABC):
+    # the expectation value of the operation as an observable, the state is left untouched,
+    # batched as [*num_spaces of the operation, *other num_spaces of the state]
+    def __call__(self, tensor: Union[PureStateTensor, MixedStateTensor], spaces: KetSpaces) -> np.ndarray:
+        return self.expectation_on_state_tensor(tensor, spaces)
+
+    @abc.abstractmethod
+    def expectation_on_state_tensor(self,
+            tensor: Union[PureStateTensor, MixedStateTensor],
+            spaces: KetSpaces
+    ) -> np.ndarray:
+        pass
+
+    def expectation_on_model(self, model: QModel) -> np.ndarray:
+        assert isinstance(model, (QParticle, QComposed))
+
+        state_tensor = model.state.tensor
+        assert isinstance(state_tensor, (PureStateTensor, MixedStateTensor))
+
+        return self.expectation_on_state_tensor(state_tensor, model)
+
+    def hermitian_values(self, values: np.ndarray) -> np.ndarray:
+        # the expectation values of hermitian observables are real
+        if self.operation.trait(IsHermitian).is_hermitian():
+            return np.real(values)
+        return values
+
+
+class QOperationExpectation(Expectation[QOperation]):
+    def expectation_on_state_tensor(self,
+            tensor: Union[PureStateTensor, MixedStateTensor],
+            spaces: KetSpaces
+    ) -> np.ndarray:
+        flat_spaces = layout_of(spaces).spaces
+        operator = self.operation.trait(ToTensor).to_tensor(spaces, backend=tensor.backend)
+        missing_spaces = tuple(space for space in flat_spaces if space not in operator.spaces)
+        if missing_spaces:
+            operator = OperatorTensor.of(operator @ prod(*(space.identity() for space in missing_spaces)))
+        matrix, (*num_spaces, _, _) = operator.flatten(ket_spaces=flat_spaces)
+        values = matrix_expectation_values(tensor, matrix, flat_spaces, num_spaces)
+        return self.hermitian_values(values)
+
+
+def expectation(
+        operation: QOperation,
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        spaces: KetSpaces
+) -> np.ndarray:
+    return operation.trait(Expectation).expectation_on_state_tensor(tensor, spaces)
@@ -0,0 +1,35 @@
+import abc
+from typing import Optional
+
+from braandket_synthesis import Op, QOperation, QOperationTrait
+from braandket_synthesis.utils import SpaceLayout, layout_of, stable_digest
+from .apply import KetSpaces
+
+
+class ToFingerprint(QOperationTrait[Op], abc.ABC):
+    def __call__(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        return self.fingerprint(spaces, layout)
+
+    @abc.abstractmethod
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        # a digest of the operation acting on spaces, stable across processes,
+        # the spaces are identified by their positions in layout (defaults to the layout of spaces),
+        # None if the operation can not be fingerprinted (e.g. it holds arbitrary functions)
+        pass
+
+
+class QOperationToFingerprint(ToFingerprint[QOperation], abc.ABC):
+    def fingerprint(self, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+        return None
+
+
+def fingerprint_axes(spaces: KetSpaces, layout: Optional[SpaceLayout]) -> tuple[tuple[int, int], ...]:
+    # the (position, dim) of each flat space in layout
+    spaces_layout = layout_of(spaces)
+    if layout is None:
+        layout = spaces_layout
+    return tuple((layout.index(space), space.n) for space in spaces_layout.spaces)
+
+
+def fingerprint_of(operation: QOperation, spaces: KetSpaces, layout: Optional[SpaceLayout] = None) -> Optional[str]:
+    return operation.trait(ToFingerprint).fingerprint(spaces, layout)
@@ -0,0 +1,24 @@
+import abc
+from typing import Optional
+
+import numpy as np
+
+from braandket_synthesis import Op, QOperation, QOperationTrait
+
+# (sources, phases): the operator maps the amplitude at sources[i] to i and multiplies it by phases[i],
+# sources is None for no reordering and phases is None for all ones
+Monomial = tuple[Optional[np.ndarray], Optional[np.ndarray]]
+
+
+class ToMonomial(QOperationTrait[Op], abc.ABC):
+    def __call__(self) -> Optional[Monomial]:
+        return self.to_monomial()
+
+    @abc.abstractmethod
+    def to_monomial(self) -> Optional[Monomial]:
+        pass
+
+
+class QOperationToMonomial(ToMonomial[QOperation], abc.ABC):
+    def to_monomial(self) -> Optional[Monomial]:
+        return None
@@ -1,10 +1,56 @@
 import abc
-from typing import Optional, Union
+import functools
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator, Optional, Union
 
-from braandket import Backend, MixedStateTensor, OperatorTensor, PureStateTensor
-from braandket_synthesis.basics import Op
+import numpy as np
+
+from braandket import Backend, MixedStateTensor, NumSpace, OperatorTensor, PureStateTensor, sum
+from braandket_synthesis.basics import Op, QOperation, QOperationTrait
+from braandket_synthesis.kernels import choose_values, norm_values
+from braandket_synthesis.utils import LRUCache, structure_of
 from .apply import Apply, KetSpaces
 
+_sampling_kraus: ContextVar[bool] = ContextVar('sampling_kraus', default=False)
+_caching_operators: ContextVar[bool] = ContextVar('caching_operators', default=False)
+
+# the to_tensor and to_kraus results shared by structurally equal operations across the process,
+# only used within caching_operators()
+operators_cache = LRUCache(max_bytes=1 << 28, max_entries=4096)
+
+# the estimated bytes of an entry besides the operator values (the key, weak references and tensor objects)
+OPERATORS_ENTRY_BYTES = 2048
+
+
+def is_sampling_kraus() -> bool:
+    return _sampling_kraus.get()
+
+
+@contextmanager
+def sampling_kraus(enabled: bool = True) -> Iterator[bool]:
+    # when enabled, ToKraus keeps pure states pure by sampling one Kraus branch (quantum trajectories)
+    token = _sampling_kraus.set(enabled)
+    try:
+        yield enabled
+    finally:
+        _sampling_kraus.reset(token)
+
+
+def is_caching_operators() -> bool:
+    return _caching_operators.get()
+
+
+@contextmanager
+def caching_operators(enabled: bool = True) -> Iterator[bool]:
+    # when enabled, the results of to_tensor and to_kraus are kept in operators_cache (opt-in)
+    token = _caching_operators.set(enabled)
+    try:
+        yield enabled
+    finally:
+        _caching_operators.reset(token)
+
 
 class ToKraus(Apply[Op], abc.ABC):
     def __call__(self, spaces: KetSpaces, *, backend: Optional[Backend] = None) -> tuple[OperatorTensor, ...]:
@@ -17,25 +63,29 @@ class ToKraus(Apply[Op], abc.ABC):
     def apply_on_state_tensor(self,
             tensor: Union[PureStateTensor, MixedStateTensor],
             spaces: KetSpaces
-    ) -> tuple[Union[PureStateTensor, MixedStateTensor], None]:
+    ) -> Union[PureStateTensor, MixedStateTensor]:
         kraus_ops = self.to_kraus(spaces, backend=tensor.backend)
 
         # case when there is no Kraus operator, returning 0
         if len(kraus_ops) == 0:
             if isinstance(tensor, PureStateTensor):
-                return PureStateTensor.of(0, ()), None
+                return PureStateTensor.of(0, ())
             elif isinstance(tensor, MixedStateTensor):
-                return MixedStateTensor.of(0, ()), None
+                return MixedStateTensor.of(0, ())
 
         # case when the resulting state can be pure (performing the tensor product)
         if len(kraus_ops) == 1:
             if isinstance(tensor, PureStateTensor):
-                return kraus_ops[0] @ tensor, None
+                return kraus_ops[0] @ tensor
+
+        # case when sampling a trajectory, the resulting state stays pure
+        if isinstance(tensor, PureStateTensor) and is_sampling_kraus():
+            return sample_kraus_branch(tensor, (kop @ tensor for kop in kraus_ops))
 
         # case when the resulting is mixed (performing the Kraus-sum)
         if isinstance(tensor, PureStateTensor):
             tensor = tensor @ tensor.ct
-        return MixedStateTensor.of(sum(kop @ tensor @ kop.ct for kop in kraus_ops)), None
+        return MixedStateTensor.of(sum(*(kop @ tensor @ kop.ct for kop in kraus_ops)))
 
 
 class ToTensor(ToKraus[Op], abc.ABC):
@@ -48,3 +98,102 @@ class ToTensor(ToKraus[Op], abc.ABC):
 
     def to_kraus(self, spaces: KetSpaces, *, backend: Optional[Backend] = None) -> tuple[OperatorTensor]:
         return self.to_tensor(spaces, backend=backend),
+
+
+def cached_operators(method: Callable) -> Callable:
+    # decorates to_tensor or to_kraus, keyed by (operation, spaces, backend), where the operation is compared
+    # by its structural key (the matrix digests cover the dtype), or by identity if it has none;
+    # the spaces (and the operation without a structural key) are only weakly referenced,
+    # so an entry is dropped once any of them is collected
+    @functools.wraps(method)
+    def wrapper(self: QOperationTrait, spaces: KetSpaces, *, backend: Optional[Backend] = None):
+        if not _caching_operators.get() or operators_cache.max_bytes <= 0:
+            return method(self, spaces, backend=backend)
+        try:
+            key = operators_key(method.__name__, self.operation, spaces, backend)
+        except TypeError:
+            return method(self, spaces, backend=backend)  # unhashable or not weakly referable spaces (e.g. lists)
+        entry = operators_cache.get(key, None)
+        if entry is not None:
+            output = unpack_operators(entry)
+            if output is not None:
+                return output
+        output = method(self, spaces, backend=backend)
+        operators_cache.put(key, pack_operators(output), operators_bytes(output) + OPERATORS_ENTRY_BYTES)
+        return output
+
+    return wrapper
+
+
+def operators_key(name: str, operation: QOperation, spaces: KetSpaces, backend: Optional[Backend]) -> tuple:
+    # the weak references compare (and hash) as their referents while alive
+    holder = []
+
+    def drop(_):
+        if holder:
+            operators_cache.pop(holder[0])
+
+    def weak_structure(structure):
+        if isinstance(structure, tuple):
+            return tuple(weak_structure(sub_structure) for sub_structure in structure)
+        return weakref.ref(structure, drop)
+
+    operation_key = operation.structural_key()
+    if operation_key is None:
+        operation_key = weakref.ref(operation, drop)
+    key = name, operation_key, weak_structure(structure_of(spaces)), backend
+    hash(key)
+    holder.append(key)
+    return key
+
+
+def pack_operators(output: Union[OperatorTensor, tuple[OperatorTensor, ...]]) -> tuple:
+    # the values with weak references to the spaces, so that the cached tensors do not keep the spaces alive
+    tensors = output if isinstance(output, tuple) else (output,)
+    packed = tuple(
+        (type(tensor), tensor.values(), tuple(weakref.ref(space) for space in tensor.spaces), tensor.backend)
+        for tensor in tensors)
+    return isinstance(output, tuple), packed
+
+
+def unpack_operators(entry: tuple) -> Optional[Union[OperatorTensor, tuple[OperatorTensor, ...]]]:
+    # None if some space has been collected
+    is_tuple, packed = entry
+    tensors = []
+    for tensor_type, values, space_refs, backend in packed:
+        spaces = tuple(space_ref() for space_ref in space_refs)
+        if any(space is None for space in spaces):
+            return None
+        tensors.append(tensor_type(values, spaces, backend))
+    return tuple(tensors) if is_tuple else tensors[0]
+
+
+def operators_bytes(output: Union[OperatorTensor, tuple[OperatorTensor, ...]]) -> int:
+    tensors = output if isinstance(output, tuple) else (output,)
+    return int(np.sum([getattr(tensor.values(), 'nbytes', 0) for tensor in tensors]))
+
+
+def sample_kraus_branch(tensor: PureStateTensor, branches: Iterable[PureStateTensor]) -> PureStateTensor:
+    # chooses one branch for each batch with probability proportional to its norm,
+    # rescaled to the total norm so that the average over trajectories equals the Kraus-sum
+    branches = tuple(branches)
+    spaces = branches[0].spaces
+    num_spaces = tuple(space for space in spaces if isinstance(space, NumSpace))
+    ket_spaces = tuple(space for space in spaces if not isinstance(space, NumSpace))
+
+    branches_norm = np.stack([norm_values(branch, num_spaces) for branch in branches], axis=-1)
+    (branch_i,), _ = choose_values(branches_norm, len(num_spaces))
+    branch_i = np.asarray(branch_i)[..., None]
+    branch_norm = np.take_along_axis(branches_norm, branch_i, axis=-1)[..., 0]
+    total_norm = np.sum(branches_norm, axis=-1)
+
+    scale = np.sqrt(total_norm / branch_norm)
+    if len(num_spaces) == 0:
+        branch = branches[int(branch_i[0])]
+        return PureStateTensor(branch.values(*ket_spaces) * scale, ket_spaces, tensor.backend)
+
+    branches_values = np.stack([branch.values(*num_spaces, *ket_spaces) for branch in branches], axis=-1)
+    branch_i = np.reshape(branch_i, (*np.shape(branch_i)[:-1], *(1 for _ in ket_spaces), 1))
+    values = np.take_along_axis(branches_values, branch_i, axis=-1)[..., 0]
+    values = values * np.reshape(scale, (*np.shape(scale), *(1 for _ in ket_spaces)))
+    return PureStateTensor(values, (*num_spaces, *ket_spaces), tensor.backend)
@@ -1 +1,7 @@
 from .iter_structured import iter_structure, iter_zip_structures, restore_structure
+from .random import Rng, get_rng, rng_context, set_default_rng
+from .contraction import ContractionPlan, ContractionTree, chain_signature, contract_tree, plan_chain
+from .pauli import conjugation_table, monomial_conjugation_table, pauli_basis
+from .space_layout import SpaceLayout, layout_of, structure_of
+from .digest import stable_digest
+from .lru import LRUCache
@@ -0,0 +1,208 @@
+import functools
+from typing import Callable, Hashable, Iterable, Sequence, TypeVar, Union
+
+T = TypeVar('T')
+
+# a contraction tree is either the index of an operand or a pair of sub-trees
+ContractionTree = Union[int, tuple['ContractionTree', 'ContractionTree']]
+
+
+class ContractionPlan:
+    def __init__(self, *,
+            tree: ContractionTree,
+            operands: int,
+            flops: int,
+            peak_size: int,
+            naive_flops: int,
+            naive_peak_size: int,
+    ):
+        self._tree = tree
+        self._operands = operands
+        self._flops = flops
+        self._peak_size = peak_size
+        self._naive_flops = naive_flops
+        self._naive_peak_size = naive_peak_size
+
+    @property
+    def tree(self) -> ContractionTree:
+        return self._tree
+
+    @property
+    def operands(self) -> int:
+        return self._operands
+
+    @property
+    def flops(self) -> int:
+        return self._flops
+
+    @property
+    def peak_size(self) -> int:
+        # the number of elements alive at the same time
+        return self._peak_size
+
+    @property
+    def naive_flops(self) -> int:
+        return self._naive_flops
+
+    @property
+    def naive_peak_size(self) -> int:
+        return self._naive_peak_size
+
+    def peak_bytes(self, itemsize: int = 16) -> int:
+        return self.peak_size * itemsize
+
+    def contract(self, operand: Callable[[int], T], combine: Callable[[T, T], T]) -> T:
+        return contract_tree(self.tree, operand, combine)
+
+    def __repr__(self):
+        return (f"<ContractionPlan operands={self.operands}, flops={self.flops}, peak_size={self.peak_size}, "
+                f"naive_flops={self.naive_flops}, naive_peak_size={self.naive_peak_size}>")
+
+
+def contract_tree(tree: ContractionTree, operand: Callable[[int], T], combine: Callable[[T, T], T]) -> T:
+    if isinstance(tree, int):
+        return operand(tree)
+    left, right = tree
+    return combine(contract_tree(left, operand, combine), contract_tree(right, operand, combine))
+
+
+def chain_signature(
+        supports: Iterable[Iterable[Hashable]],
+        dims: Callable[[Hashable], int],
+) -> tuple[tuple[tuple[int, int], ...], ...]:
+    # relabels the indices by their first appearance, so that equal structures share a plan
+    labels = {}
+    signature = []
+    for support in supports:
+        operand = []
+        for index in support:
+            if index not in labels:
+                labels[index] = len(labels)
+            operand.append((labels[index], dims(index)))
+        signature.append(tuple(operand))
+    return tuple(signature)
+
+
+def plan_chain(
+        supports: Iterable[Iterable[Hashable]],
+        dims: Callable[[Hashable], int], *,
+        max_exact: int = 48,
+) -> ContractionPlan:
+    # plans the product of a chain of operators, each acting on (ket and bra) indices of its support
+    return plan_chain_signature(chain_signature(supports, dims), max_exact)
+
+
+@functools.lru_cache(maxsize=1024)
+def plan_chain_signature(signature: tuple[tuple[tuple[int, int], ...], ...], max_exact: int) -> ContractionPlan:
+    dims = {label: n for operand in signature for label, n in operand}
+    supports = tuple(frozenset(label for label, _ in operand) for operand in signature)
+    if len(supports) == 0:
+        raise ValueError("Can not plan the contraction of an empty chain!")
+
+    def size(support: frozenset) -> int:
+        value = 1
+        for label in support:
+            value *= dims[label]
+        return value
+
+    if len(supports) <= max_exact:
+        tree, flops, peak_size = plan_chain_exact(supports, size)
+    else:
+        tree, flops, peak_size = plan_chain_greedy(supports, size)
+
+    naive_flops, naive_peak_size = estimate_naive(supports, size)
+
+    return ContractionPlan(
+        tree=tree,
+        operands=len(supports),
+        flops=flops,
+        peak_size=peak_size,
+        naive_flops=naive_flops,
+        naive_peak_size=naive_peak_size)
+
+
+def pair_cost(left: frozenset, right: frozenset, size: Callable[[frozenset], int]) -> tuple[int, int]:
+    # an operator on `union` has size(union)**2 elements, each summing over the shared indices
+    union_size = size(left | right) ** 2
+    return union_size * size(left & right), union_size
+
+
+def plan_chain_exact(
+        supports: Sequence[frozenset],
+        size: Callable[[frozenset], int],
+) -> tuple[ContractionTree, int, int]:
+    # matrix-chain dynamic programming over the intervals, minimizing flops then peak size
+    n = len(supports)
+    unions = [[frozenset()] * n for _ in range(n)]
+    best: list[list[tuple]] = [[None] * n for _ in range(n)]
+    for i in range(n):
+        unions[i][i] = supports[i]
+        best[i][i] = (0, size(supports[i]) ** 2, i)
+
+    for length in range(2, n + 1):
+        for i in range(0, n - length + 1):
+            j = i + length - 1
+            unions[i][j] = unions[i][j - 1] | supports[j]
+            candidate = None
+            for k in range(i, j):
+                left_flops, left_peak, left_tree = best[i][k]
+                right_flops, right_peak, right_tree = best[k + 1][j]
+                flops, out_size = pair_cost(unions[i][k], unions[k + 1][j], size)
+                left_size = size(unions[i][k]) ** 2
+                right_size = size(unions[k + 1][j]) ** 2
+                peak = max(left_peak, left_size + right_peak, left_size + right_size + out_size)
+                cost = (left_flops + right_flops + flops, peak)
+                if candidate is None or cost < candidate[:2]:
+                    candidate = (*cost, (left_tree, right_tree))
+            best[i][j] = candidate
+
+    flops, peak_size, tree = best[0][n - 1]
+    return tree, flops, peak_size
+
+
+def plan_chain_greedy(
+        supports: Sequence[frozenset],
+        size: Callable[[frozenset], int],
+) -> tuple[ContractionTree, int, int]:
+    # repeatedly contracts the cheapest adjacent pair, for chains too long for the exact search
+    items = [(support, i) for i, support in enumerate(supports)]
+    while len(items) > 1:
+        costs = [pair_cost(items[i][0], items[i + 1][0], size) for i in range(len(items) - 1)]
+        i = min(range(len(costs)), key=lambda index: costs[index])
+        (left, left_tree), (right, right_tree) = items[i], items[i + 1]
+        items[i:i + 2] = [(left | right, (left_tree, right_tree))]
+    tree = items[0][1]
+    flops, peak_size = estimate_tree(tree, supports, size)
+    return tree, flops, peak_size
+
+
+def estimate_naive(supports: Sequence[frozenset], size: Callable[[frozenset], int]) -> tuple[int, int]:
+    # the cost of contracting from left to right
+    union = supports[0]
+    total_flops, peak_size = 0, size(union) ** 2
+    for support in supports[1:]:
+        flops, out_size = pair_cost(union, support, size)
+        peak_size = max(peak_size, size(union) ** 2 + size(support) ** 2 + out_size)
+        total_flops += flops
+        union = union | support
+    return total_flops, peak_size
+
+
+def estimate_tree(
+        tree: ContractionTree,
+        supports: Sequence[frozenset],
+        size: Callable[[frozenset], int],
+) -> tuple[int, int]:
+    def visit(sub_tree: ContractionTree) -> tuple[frozenset, int, int]:
+        if isinstance(sub_tree, int):
+            support = supports[sub_tree]
+            return support, 0, size(support) ** 2
+        left, left_flops, left_peak = visit(sub_tree[0])
+        right, right_flops, right_peak = visit(sub_tree[1])
+        flops, out_size = pair_cost(left, right, size)
+        left_size, right_size = size(left) ** 2, size(right) ** 2
+        peak = max(left_peak, left_size + right_peak, left_size + right_size + out_size)
+        return left | right, left_flops + right_flops + flops, peak
+
+    _, total_flops, peak_size = visit(tree)
+    return total_flops, peak_size
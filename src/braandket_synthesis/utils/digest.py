@@ -0,0 +1,39 @@
+import hashlib
+from typing import Any
+
+import numpy as np
+
+
+def stable_digest(*parts: Any) -> str:
+    # a sha256 hex digest that is the same across processes (unlike hash()),
+    # parts are made of None, bool, int, float, complex, str, bytes, np.ndarray and tuples of them
+    hasher = hashlib.sha256()
+    update_digest(hasher, parts)
+    return hasher.hexdigest()
+
+
+def update_digest(hasher: Any, part: Any):
+    if part is None:
+        hasher.update(b'N')
+    elif isinstance(part, (bool, np.bool_)):
+        hasher.update(b'B1' if part else b'B0')
+    elif isinstance(part, (int, np.integer)):
+        hasher.update(b'I' + str(int(part)).encode() + b';')
+    elif isinstance(part, (float, complex, np.floating, np.complexfloating)):
+        hasher.update(b'F' + repr(complex(part)).encode() + b';')
+    elif isinstance(part, str):
+        encoded = part.encode()
+        hasher.update(b'S' + str(len(encoded)).encode() + b':' + encoded)
+    elif isinstance(part, bytes):
+        hasher.update(b'Y' + str(len(part)).encode() + b':' + part)
+    elif isinstance(part, np.ndarray):
+        array = np.ascontiguousarray(part)
+        hasher.update(b'A' + array.dtype.str.encode() + repr(array.shape).encode() + b':')
+        hasher.update(array.data if array.dtype != object else repr(array.tolist()).encode())
+    elif isinstance(part, (tuple, list)):
+        hasher.update(b'T' + str(len(part)).encode() + b'(')
+        for item in part:
+            update_digest(hasher, item)
+        hasher.update(b')')
+    else:
+        raise TypeError(f"Unexpected type of digest part: {type(part)}")
@@ -7,7 +7,7 @@ def iter_structure(
 ) -> Iterator[Any]:
     sub_items = None
 
-    if structure not in item_types:
+    if not isinstance(structure, tuple(item_types)):
         try:
             sub_items = iter(structure)
         except TypeError:
@@ -26,7 +26,7 @@ def iter_zip_structures(
 ) -> Iterator[tuple]:
     sub_items = None
 
-    if structures[0] not in item_types:
+    if not isinstance(structures[0], tuple(item_types)):
         try:
             sub_items = zip(*[iter(item) for item in structures])
         except TypeError:
@@ -47,13 +47,15 @@ def restore_structure(
     values = iter(values)
 
     sub_structures = None
-    if structure not in item_types:
+    if not isinstance(structure, tuple(item_types)):
         try:
             sub_structures = iter(structure)
         except TypeError:
             sub_structures = None
 
     if sub_structures is not None:
-        return tuple(restore_structure(values, sub_structure) for sub_structure in sub_structures)
+        return tuple(
+            restore_structure(values, sub_structure, item_types=item_types)
+            for sub_structure in sub_structures)
     else:
         return next(values)
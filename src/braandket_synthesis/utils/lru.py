@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    # a least-recently-used cache bounded by the total bytes of its values (as given on put),
+    # and by the number of its entries if max_entries is given
+    NoDefault = object()
+
+    def __init__(self, max_bytes: int, max_entries: Optional[int] = None):
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._max_bytes = max_bytes
+        self._max_entries = max_entries
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def max_entries(self) -> Optional[int]:
+        return self._max_entries
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    @property
+    def hit_rate(self) -> float:
+        total = self._hits + self._misses
+        return self._hits / total if total > 0 else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = NoDefault) -> Any:
+        try:
+            value, _ = self._entries[key]
+        except KeyError:
+            self._misses += 1
+            if default is self.NoDefault:
+                raise
+            return default
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, nbytes: int):
+        # values larger than max_bytes are not kept at all
+        self.pop(key)
+        if nbytes > self._max_bytes:
+            return
+        self._entries[key] = value, nbytes
+        self._bytes += nbytes
+        self.evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        value, nbytes = entry
+        self._bytes -= nbytes
+        return value
+
+    def evict(self, max_bytes: Optional[int] = None):
+        max_bytes = self._max_bytes if max_bytes is None else max_bytes
+        max_entries = len(self._entries) if self._max_entries is None else self._max_entries
+        while self._entries and (self._bytes > max_bytes or len(self._entries) > max_entries):
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self._evictions += 1
+
+    def resize(self, max_bytes: int, max_entries: Optional[int] = NoDefault):
+        self._max_bytes = max_bytes
+        if max_entries is not self.NoDefault:
+            self._max_entries = max_entries
+        self.evict()
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def reset_stats(self):
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'entries': len(self), 'max_entries': self.max_entries, 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+            'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.hit_rate}
+
+    def __repr__(self):
+        return f"<LRUCache entries={len(self)}, max_entries={self.max_entries}, bytes={self.bytes}, " \
+               f"max_bytes={self.max_bytes}, " \
+               f"hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.3f}>"
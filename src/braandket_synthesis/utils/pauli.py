@@ -0,0 +1,147 @@
+import functools
+from typing import Optional
+
+import numpy as np
+
+PAULI_MATRICES = (
+    np.array([[1, 0], [0, 1]], dtype=complex),  # (x, z) = (0, 0)
+    np.array([[1, 0], [0, -1]], dtype=complex),  # (0, 1), Z
+    np.array([[0, 1], [1, 0]], dtype=complex),  # (1, 0), X
+    np.array([[0, -1j], [1j, 0]], dtype=complex),  # (1, 1), Y
+)
+
+
+@functools.lru_cache(maxsize=8)
+def pauli_basis(k: int) -> np.ndarray:
+    # all the 4**k Pauli strings, indexed by (x_code << k) | z_code, the first qubit being the most significant
+    basis = np.empty((4 ** k, 2 ** k, 2 ** k), dtype=complex)
+    for code in range(4 ** k):
+        x_bits, z_bits = code_bits(code, k)
+        matrix = np.ones((1, 1), dtype=complex)
+        for x, z in zip(x_bits, z_bits):
+            matrix = np.kron(matrix, PAULI_MATRICES[2 * x + z])
+        basis[code] = matrix
+    return basis
+
+
+def code_bits(code: int, k: int) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    x_code, z_code = code >> k, code & ((1 << k) - 1)
+    x_bits = tuple((x_code >> (k - 1 - i)) & 1 for i in range(k))
+    z_bits = tuple((z_code >> (k - 1 - i)) & 1 for i in range(k))
+    return x_bits, z_bits
+
+
+def conjugation_table(
+        matrix: np.ndarray, *,
+        atol: float = 1e-8,
+) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    # how U P U^dagger maps the 2k generators X_0, ..., X_{k-1}, Z_0, ..., Z_{k-1} on k qubits to (-1)^flip P',
+    # returns (new_x [2k, k], new_z [2k, k], flip [2k]), or None if the matrix is not a Clifford
+    matrix = np.asarray(matrix)
+    if np.ndim(matrix) != 2 or matrix.shape[0] != matrix.shape[1]:
+        return None
+    d = matrix.shape[0]
+    k = d.bit_length() - 1
+    if d != 2 ** k:
+        return None
+
+    # the non-zero entries of a Clifford all have the same magnitude, cheaper to check than the unitarity
+    magnitudes = np.abs(matrix)
+    nonzero = magnitudes > atol
+    if not np.allclose(magnitudes[nonzero], magnitudes[nonzero][0], atol=atol):
+        return None
+    if not np.allclose(matrix @ np.conj(matrix.T), np.eye(d), atol=atol):
+        return None
+
+    indices = np.arange(d)
+    new_x = np.zeros((2 * k, k), dtype=bool)
+    new_z = np.zeros((2 * k, k), dtype=bool)
+    flip = np.zeros((2 * k,), dtype=bool)
+    for generator in range(2 * k):
+        bit = 1 << (k - 1 - generator % k)
+        if generator < k:
+            image = matrix[:, indices ^ bit] @ np.conj(matrix.T)  # U X_i U^dagger
+        else:
+            image = (matrix * np.where(indices & bit, -1, 1)) @ np.conj(matrix.T)  # U Z_i U^dagger
+        pauli = pauli_form(image, atol)
+        if pauli is None:
+            return None  # e.g. T, mapping X to (X + Y) / sqrt(2)
+        new_x[generator], new_z[generator], flip[generator] = pauli
+    return new_x, new_z, flip
+
+
+def monomial_conjugation_table(
+        sources: Optional[np.ndarray],
+        phases: Optional[np.ndarray], *,
+        size: int,
+        atol: float = 1e-8,
+) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    # like conjugation_table, for the monomial matrix with [i, sources[i]] = phases[i] (None for identity and ones),
+    # in O(size) for each generator, without the dense matrix
+    k = size.bit_length() - 1
+    if size != 2 ** k:
+        return None
+    indices = np.arange(size)
+    sources = indices if sources is None else np.asarray(sources)
+    phases = np.ones(size) if phases is None else np.asarray(phases)
+    if not np.allclose(np.abs(phases), 1, atol=atol):
+        return None
+    targets = np.empty_like(sources)
+    targets[sources] = indices
+
+    new_x = np.zeros((2 * k, k), dtype=bool)
+    new_z = np.zeros((2 * k, k), dtype=bool)
+    flip = np.zeros((2 * k,), dtype=bool)
+    for generator in range(2 * k):
+        bit = 1 << (k - 1 - generator % k)
+        # row i of U P U^dagger, with P[j, j ^ x] = p[j]: source targets[(sources[i] ^ x)], value ph_i p_(s_i) ph_t^*
+        if generator < k:
+            image_sources = targets[sources ^ bit]
+            image_values = phases * np.conj(phases[image_sources])
+        else:
+            image_sources = indices
+            image_values = np.where(sources & bit, -1, 1)
+        pauli = monomial_pauli_form(image_sources, image_values, atol)
+        if pauli is None:
+            return None
+        new_x[generator], new_z[generator], flip[generator] = pauli
+    return new_x, new_z, flip
+
+
+def pauli_form(matrix: np.ndarray, atol: float) -> Optional[tuple[tuple[int, ...], tuple[int, ...], bool]]:
+    # matrix as a signed Hermitian Pauli string, see monomial_pauli_form
+    indices = np.arange(matrix.shape[0])
+    sources = np.argmax(np.abs(matrix), axis=1)
+    values = matrix[indices, sources]
+    if not np.isclose(np.sum(np.abs(matrix) ** 2), np.sum(np.abs(values) ** 2), atol=atol):
+        return None  # not monomial
+    return monomial_pauli_form(sources, values, atol)
+
+
+def monomial_pauli_form(
+        sources: np.ndarray,
+        values: np.ndarray,
+        atol: float,
+) -> Optional[tuple[tuple[int, ...], tuple[int, ...], bool]]:
+    # the monomial matrix ([i, sources[i]] = values[i]) as (-1)^flip P, where P = i^|x & z| X^x Z^z has
+    # P[i, i ^ x] = i^|x & z| (-1)^|z & (i ^ x)|, returns (x_bits, z_bits, flip), or None if it is not such a string
+    d = len(sources)
+    k = d.bit_length() - 1
+    indices = np.arange(d)
+    x = int(sources[0])
+    if not np.array_equal(sources, indices ^ x):
+        return None
+    ratios = values / values[0]  # (-1)^|z & i|
+    z = sum(1 << (k - 1 - i) for i in range(k) if np.real(ratios[1 << (k - 1 - i)]) < 0)
+    parities = np.zeros(d, dtype=np.int64)
+    for i in range(k):
+        parities ^= (sources >> i) & (z >> i) & 1
+    pauli_values = 1j ** (bin(x & z).count('1') % 4) * (1 - 2 * parities)
+    sign = np.real(values[0] / pauli_values[0])
+    if abs(abs(sign) - 1) > atol:
+        return None
+    flip = sign < 0
+    if not np.allclose(values, pauli_values * (-1 if flip else 1), atol=atol):
+        return None
+    x_bits, z_bits = code_bits((x << k) | z, k)
+    return x_bits, z_bits, bool(flip)
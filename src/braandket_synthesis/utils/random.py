@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Union
+
+import numpy as np
+
+Rng = Union[np.random.Generator, np.random.RandomState]
+
+_rng: ContextVar[Optional[Rng]] = ContextVar('rng', default=None)
+_default_rng: Rng = np.random.default_rng()
+
+
+def get_rng() -> Rng:
+    # falls back to the default rng when no rng is set in the context
+    rng = _rng.get()
+    return _default_rng if rng is None else rng
+
+
+def set_default_rng(rng: Optional[Rng] = None) -> Rng:
+    # replaces the default rng (a freshly seeded one if None) for all the contexts, returns the previous one
+    global _default_rng
+    previous = _default_rng
+    _default_rng = np.random.default_rng() if rng is None else rng
+    return previous
+
+
+@contextmanager
+def rng_context(rng: Rng) -> Iterator[Rng]:
+    token = _rng.set(rng)
+    try:
+        yield rng
+    finally:
+        _rng.reset(token)
@@ -0,0 +1,150 @@
+import operator
+from typing import Any, Callable, Iterable, Union
+
+Template = Union[int, tuple['Template', ...]]
+
+
+class SpaceLayout:
+    # a structure of spaces flattened once, with the flat spaces, their dims and a compiled restore function
+    def __init__(self, structure: Union[Any, Iterable]):
+        spaces = []
+        template, plain = flatten_template(structure, spaces)
+        self._structure = structure
+        self._spaces = tuple(spaces)
+        self._dims = tuple(space.n for space in self._spaces)
+        self._indices = {space: i for i, space in enumerate(self._spaces)}
+        self._template = template
+        self._plain = plain
+        self._restore = compile_restore(template)
+        self._axes_cache: dict[tuple, tuple[int, ...]] = {}
+
+    @property
+    def structure(self) -> Union[Any, Iterable]:
+        return self._structure
+
+    @property
+    def spaces(self) -> tuple:
+        return self._spaces
+
+    @property
+    def dims(self) -> tuple[int, ...]:
+        return self._dims
+
+    @property
+    def size(self) -> int:
+        size = 1
+        for n in self._dims:
+            size *= n
+        return size
+
+    @property
+    def template(self) -> Template:
+        return self._template
+
+    @property
+    def plain(self) -> bool:
+        # whether the structure is made of tuples only, so that it can not change after flattening
+        return self._plain
+
+    def __len__(self) -> int:
+        return len(self._spaces)
+
+    def index(self, space: Any) -> int:
+        try:
+            return self._indices[space]
+        except KeyError:
+            raise ValueError(f"Space {space} is not found in the layout!") from None
+
+    def axes(self, tensor_spaces: tuple) -> tuple[int, ...]:
+        # the axes of the flat spaces among tensor_spaces (e.g. tensor.spaces), cached for each tuple
+        axes = self._axes_cache.get(tensor_spaces)
+        if axes is None:
+            positions = {space: axis for axis, space in enumerate(tensor_spaces)}
+            try:
+                axes = tuple(positions[space] for space in self._spaces)
+            except KeyError as e:
+                raise ValueError(f"Space {e.args[0]} is not found in the tensor!") from None
+            if len(self._axes_cache) >= 64:
+                self._axes_cache.clear()
+            self._axes_cache[tensor_spaces] = axes
+        return axes
+
+    def restore(self, values: Iterable[Any]) -> Union[Any, tuple]:
+        # the inverse of flattening, values are ordered as the flat spaces
+        if not isinstance(values, (tuple, list)):
+            values = tuple(values)
+        return self._restore(values)
+
+    def __repr__(self):
+        return f"<SpaceLayout structure={self.structure}>"
+
+
+# the layouts are kept by the first leaf of their structures (usually a space), so that they are collected with it,
+# or in _layouts if it can not hold them (e.g. an integer)
+LAYOUTS_ATTR = '_space_layouts'
+_layouts: dict[Any, SpaceLayout] = {}
+_layouts_max_size = 64
+
+
+def layout_of(structure: Union[SpaceLayout, Any, Iterable]) -> SpaceLayout:
+    # returns an interned layout for (hashable) structures made of tuples
+    if isinstance(structure, SpaceLayout):
+        return structure
+    layouts = anchor_layouts(structure)
+    try:
+        layout = layouts.get(structure)
+    except TypeError:
+        return SpaceLayout(structure)
+    if layout is None:
+        layout = SpaceLayout(structure)
+        if layout.plain:
+            if len(layouts) >= _layouts_max_size:
+                del layouts[next(iter(layouts))]
+            layouts[structure] = layout
+    return layout
+
+
+def anchor_layouts(structure: Union[Any, Iterable]) -> dict[Any, SpaceLayout]:
+    anchor = structure
+    while isinstance(anchor, tuple) and len(anchor) > 0:
+        anchor = anchor[0]
+    try:
+        return vars(anchor).setdefault(LAYOUTS_ATTR, {})
+    except (TypeError, AttributeError):
+        return _layouts  # no __dict__, or a read-only one (e.g. of a class)
+
+
+def structure_of(structure: Union[SpaceLayout, Any, Iterable]) -> Union[Any, Iterable]:
+    if isinstance(structure, SpaceLayout):
+        return structure.structure
+    return structure
+
+
+def flatten_template(structure: Union[Any, Iterable], items: list) -> tuple[Template, bool]:
+    # appends the leaves to items, returning the template of their indices and whether all nodes are tuples
+    try:
+        sub_structures = iter(structure)
+    except TypeError:
+        items.append(structure)
+        return len(items) - 1, True
+
+    plain = isinstance(structure, tuple)
+    template = []
+    for sub_structure in sub_structures:
+        sub_template, sub_plain = flatten_template(sub_structure, items)
+        template.append(sub_template)
+        plain = plain and sub_plain
+    return tuple(template), plain
+
+
+def compile_restore(template: Template) -> Callable[[tuple], Union[Any, tuple]]:
+    if isinstance(template, int):
+        return operator.itemgetter(template)
+    if all(isinstance(sub_template, int) for sub_template in template):
+        if len(template) == 0:
+            return lambda values: ()
+        start, stop = template[0], template[-1] + 1
+        if template == tuple(range(start, stop)):
+            return lambda values: tuple(values[start:stop])
+    sub_restores = tuple(compile_restore(sub_template) for sub_template in template)
+    return lambda values: tuple(sub_restore(values) for sub_restore in sub_restores)
@@ -0,0 +1,95 @@
+from typing import Iterable, Union
+
+import numpy as np
+
+from braandket import KetSpace, MixedStateTensor, OperatorTensor, PureStateTensor, numpy_backend
+from braandket_synthesis import QOperation, ToTensor
+from braandket_synthesis.utils import iter_structure
+
+
+def qubits(n: int, d: int = 2) -> tuple[KetSpace, ...]:
+    return tuple(KetSpace(d, name=f"q{i}") for i in range(n))
+
+
+def random_unitary(size: int, rng: np.random.Generator) -> np.ndarray:
+    q, r = np.linalg.qr(rng.normal(size=(size, size)) + 1j * rng.normal(size=(size, size)))
+    return q * (np.diag(r) / np.abs(np.diag(r)))
+
+
+def random_pure_state(spaces: Iterable[KetSpace], rng: np.random.Generator) -> PureStateTensor:
+    spaces = tuple(spaces)
+    shape = tuple(space.n for space in spaces)
+    values = rng.normal(size=shape) + 1j * rng.normal(size=shape)
+    values /= np.linalg.norm(values)
+    return PureStateTensor(values, spaces, numpy_backend)
+
+
+def random_mixed_state(spaces: Iterable[KetSpace], rng: np.random.Generator) -> MixedStateTensor:
+    a = random_pure_state(spaces, rng)
+    b = random_pure_state(spaces, rng)
+    return MixedStateTensor.of(0.3 * (a @ a.ct) + 0.7 * (b @ b.ct))
+
+
+def zero_state(spaces: Iterable[KetSpace]) -> PureStateTensor:
+    spaces = tuple(spaces)
+    values = np.zeros(tuple(space.n for space in spaces), dtype=complex)
+    values[(0,) * len(spaces)] = 1
+    return PureStateTensor(values, spaces, numpy_backend)
+
+
+def state_values(tensor: Union[PureStateTensor, MixedStateTensor], spaces: Iterable[KetSpace]) -> np.ndarray:
+    # ordered as [*spaces] or [*spaces, *bra_spaces]
+    spaces = tuple(spaces)
+    if isinstance(tensor, MixedStateTensor):
+        return np.asarray(tensor.values(*spaces, *(space.ct for space in spaces)))
+    return np.asarray(tensor.values(*spaces))
+
+
+def dense_matrix(operation: QOperation, spaces) -> np.ndarray:
+    # the matrix of operation on the flattened spaces, built by ToTensor
+    flat_spaces = tuple(iter_structure(spaces))
+    tensor = operation.trait(ToTensor).to_tensor(spaces)
+    missing_spaces = tuple(space for space in flat_spaces if space not in tensor.spaces)
+    for space in missing_spaces:
+        tensor = OperatorTensor.of(tensor @ space.identity())
+    matrix, _ = tensor.flatten(ket_spaces=flat_spaces)
+    return np.asarray(matrix)
+
+
+def dense_apply(
+        matrix: np.ndarray,
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        targets: Iterable[KetSpace],
+        spaces: Iterable[KetSpace],
+) -> np.ndarray:
+    # the reference result of applying matrix on targets, as values ordered by spaces
+    targets = tuple(targets)
+    spaces = tuple(spaces)
+    others = tuple(space for space in spaces if space not in targets)
+    order = (*targets, *others)
+    target_size = int(np.prod([space.n for space in targets]))
+    other_size = int(np.prod([space.n for space in others]))
+    full = np.kron(matrix, np.eye(other_size))
+    values = state_values(tensor, order)
+    if isinstance(tensor, MixedStateTensor):
+        values = np.reshape(values, (target_size * other_size,) * 2)
+        values = full @ values @ np.conj(full).T
+        values = np.reshape(values, [space.n for space in order] * 2)
+        axes = [order.index(space) for space in spaces]
+        return np.transpose(values, (*axes, *(len(order) + axis for axis in axes)))
+    values = full @ np.reshape(values, (-1,))
+    values = np.reshape(values, [space.n for space in order])
+    return np.transpose(values, [order.index(space) for space in spaces])
+
+
+def assert_state_close(
+        tensor: Union[PureStateTensor, MixedStateTensor],
+        expected: Union[PureStateTensor, MixedStateTensor, np.ndarray],
+        spaces: Iterable[KetSpace], *,
+        atol: float = 1e-9,
+):
+    spaces = tuple(spaces)
+    if not isinstance(expected, np.ndarray):
+        assert type(tensor) is type(expected)
+        expected = state_values(expected, spaces)
+    np.testing.assert_allclose(state_values(tensor, spaces), expected, atol=atol)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from braandket import NumSpace, NumericTensor
+from braandket_synthesis import Apply, CX, Controlled, D, H, Measure, Remapped, Rx, Ry, Rz, Sequential
+from helpers import qubits, random_mixed_state, random_pure_state, state_values
+
+
+def on(operation, *indices):
+    if len(indices) == 1:
+        return Remapped(operation, lambda s, i=indices[0]: s[i])
+    return Remapped(operation, lambda s, indices=indices: tuple(s[i] for i in indices))
+
+
+def circuit(theta, phi):
+    return Sequential([on(H(), 0), on(Rx(theta), 1), on(Controlled(Ry(theta)), 0, 2), on(Rz(phi), 2), on(CX(), 2, 1)])
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_sweep_matches_each_parameter(rng, mixed):
+    spaces = qubits(3)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    thetas = np.linspace(0, np.pi, 5)
+    phis = np.linspace(0, 1, 3)
+    theta_space = NumSpace(len(thetas))
+
+    operation = circuit(NumericTensor.of(thetas, (theta_space,)), phis)
+    output = operation.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    phi_space, = (space for space in output.spaces if isinstance(space, NumSpace) and space is not theta_space)
+    bra_spaces = (space.ct for space in spaces) if mixed else ()
+    values = np.asarray(output.values(theta_space, phi_space, *spaces, *bra_spaces))
+    for i, theta in enumerate(thetas):
+        for j, phi in enumerate(phis):
+            expected = circuit(theta, phi).trait(Apply).apply_on_state_tensor(tensor, spaces)
+            np.testing.assert_allclose(values[i, j], state_values(expected, spaces), atol=1e-9)
+
+
+def test_batched_desired_measurement_probabilities(rng):
+    spaces = qubits(2)
+    tensor = random_pure_state(spaces, rng)
+    thetas = np.linspace(0, np.pi, 4)
+    operation = Sequential([on(Rx(thetas), 0), on(D(1), 0)])
+    _, results = operation.trait(Measure).measure_on_state_tensor(tensor, spaces)
+    probability = np.ravel(results[-1].probability)
+    for theta, prob in zip(thetas, probability):
+        _, expected = Sequential([on(Rx(theta), 0), on(D(1), 0)]).trait(Measure).measure_on_state_tensor(tensor, spaces)
+        assert np.isclose(prob, expected[-1].probability)
+
+
+
+def test_batched_controlled_bullet_matches_each_parameter(rng):
+    spaces = qubits(2)
+    tensor = random_pure_state(spaces, rng)
+    thetas = np.linspace(0, 1, 3)
+    output = Controlled(Rx(thetas)).trait(Apply).apply_on_state_tensor(tensor, spaces)
+    num_space, = (space for space in output.spaces if isinstance(space, NumSpace))
+    values = np.asarray(output.values(num_space, *spaces))
+    for i, theta in enumerate(thetas):
+        expected = Controlled(Rx(theta)).trait(Apply).apply_on_state_tensor(tensor, spaces)
+        np.testing.assert_allclose(values[i], state_values(expected, spaces), atol=1e-9)
@@ -0,0 +1,33 @@
+import json
+import os
+import sys
+
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from cases import cases  # noqa: E402
+from run import BASELINE_PATH, compare_results, time_callable  # noqa: E402
+
+
+@pytest.mark.parametrize('name', sorted(cases))
+def test_case_runs(name):
+    factory, params = cases[name]
+    func = factory(params[0])
+    func()
+
+
+def test_baseline_covers_cases():
+    with open(BASELINE_PATH) as file:
+        baseline = json.load(file)
+    keys = {f"{name}[{param}]" for name, (_, params) in cases.items() for param in params}
+    assert keys <= set(baseline['results'])
+
+
+def test_timing_and_comparison():
+    result = time_callable(lambda: None, repeat=2, min_time=0.001)
+    assert result['repeat'] == 2 and result['min'] <= result['median']
+    results = {'a[1]': {'min': 2.0}, 'b[1]': {'min': 1.0}, 'c[1]': {'min': 1.0}}
+    baseline = {'a[1]': {'min': 1.0}, 'b[1]': {'min': 1.0}}
+    assert compare_results(results, baseline, threshold=1.25) == ['a[1]']
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from braandket import PureStateTensor
+from braandket_synthesis import Apply, Controlled, H, MatrixOperation, Remapped, Sequential, ToTensor, X, \
+    plan_sequential
+from braandket_synthesis.utils import plan_chain
+from helpers import assert_state_close, dense_matrix, qubits, random_pure_state, random_unitary
+
+
+def brickwork(spaces, layers: int, rng) -> Sequential:
+    n = len(spaces)
+    return Sequential([
+        Remapped(MatrixOperation(random_unitary(4, rng)), lambda s, i=i: (s[i], s[i + 1]))
+        for _ in range(layers) for i in range(n - 1)])
+
+
+def test_sequential_tensor_matches_step_product(rng):
+    spaces = qubits(5)
+    operation = brickwork(spaces, 2, rng)
+    expected = np.eye(2 ** 5)
+    for step in operation.steps:
+        expected = dense_matrix(step, spaces) @ expected
+    np.testing.assert_allclose(dense_matrix(operation, spaces), expected, atol=1e-9)
+
+
+def test_sequential_tensor_agrees_with_apply(rng):
+    spaces = qubits(6)
+    operation = brickwork(spaces, 3, rng)
+    tensor = random_pure_state(spaces, rng)
+    expected = operation.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    output = PureStateTensor.of(operation.trait(ToTensor).to_tensor(spaces) @ tensor)
+    assert_state_close(output, expected, spaces)
+
+
+def test_plan_is_not_worse_than_left_to_right(rng):
+    spaces = qubits(8)
+    plan = plan_sequential(brickwork(spaces, 3, rng), spaces)
+    assert plan.operands == 3 * 7
+    assert plan.flops <= plan.naive_flops
+
+
+def test_plan_chain_contracts_every_operand_once():
+    supports = [('a', 'b'), ('b', 'c'), ('c', 'd'), ('a', 'd'), ('b',)]
+    plan = plan_chain(supports, lambda _: 2)
+    leaves = plan.contract(lambda i: (i,), lambda left, right: left + right)
+    assert sorted(leaves) == list(range(len(supports)))
+
+
+@pytest.mark.parametrize('keys', [(1, 0), (0, 1)])
+def test_controlled_tensor_matches_dense(rng, keys):
+    spaces = qubits(4)
+    matrix = random_unitary(4, rng)
+    operation = Controlled(MatrixOperation(matrix), keys=keys)
+    structure = ((spaces[0], spaces[3]), (spaces[1], spaces[2]))
+
+    control_index = int(''.join(str(key) for key in keys), 2)
+    expected = np.eye(16, dtype=complex)
+    block = slice(control_index * 4, control_index * 4 + 4)
+    expected[block, block] = matrix
+    np.testing.assert_allclose(dense_matrix(operation, structure), expected, atol=1e-9)
+
+
+def test_controlled_sequential_tensor_order(rng):
+    spaces = qubits(3)
+    operation = Controlled(Sequential([Remapped(X(), lambda s: s[0]), Remapped(H(), lambda s: s[1])]))
+    bullet = dense_matrix(operation.bullet, spaces[1:])
+    expected = np.eye(8, dtype=complex)
+    expected[4:, 4:] = bullet
+    np.testing.assert_allclose(dense_matrix(operation, (spaces[0], spaces[1:])), expected, atol=1e-9)
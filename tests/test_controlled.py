@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from braandket_synthesis import Apply, CX, CY, CZ, Controlled, MatrixOperation
+from helpers import assert_state_close, dense_apply, qubits, random_mixed_state, random_pure_state, random_unitary
+
+
+def controlled_matrix(matrix: np.ndarray, keys: tuple[int, ...]) -> np.ndarray:
+    # the dense reference, on (*controls, *targets)
+    size = np.shape(matrix)[0]
+    control_index = int(''.join(str(key) for key in keys), 2)
+    full = np.eye((2 ** len(keys)) * size, dtype=complex)
+    block = slice(control_index * size, (control_index + 1) * size)
+    full[block, block] = matrix
+    return full
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_controlled_gates_match_dense(rng, mixed):
+    spaces = qubits(5)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    x = np.array([[0, 1], [1, 0]])
+    y = np.array([[0, -1j], [1j, 0]])
+    z = np.diag([1, -1])
+    for operation, matrix, targets in (
+            (CX(), controlled_matrix(x, (1,)), (spaces[0], spaces[3])),
+            (CY(), controlled_matrix(y, (1,)), (spaces[4], spaces[1])),
+            (CZ(), controlled_matrix(z, (1,)), (spaces[2], spaces[0])),
+    ):
+        output = operation.trait(Apply).apply_on_state_tensor(tensor, targets)
+        assert_state_close(output, dense_apply(matrix, tensor, targets, spaces), spaces)
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+@pytest.mark.parametrize('keys', [(1, 0), (0, 0), (1, 1)])
+def test_multi_controlled_matrix_matches_dense(rng, mixed, keys):
+    spaces = qubits(5)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    matrix = random_unitary(4, rng)
+    operation = Controlled(MatrixOperation(matrix), keys=keys)
+    controls, targets = (spaces[2], spaces[0]), (spaces[4], spaces[1])
+
+    output = operation.trait(Apply).apply_on_state_tensor(tensor, (controls, targets))
+    expected = dense_apply(controlled_matrix(matrix, keys), tensor, (*controls, *targets), spaces)
+    assert_state_close(output, expected, spaces)
+
+
+def test_nested_controlled_matches_dense(rng):
+    spaces = qubits(4)
+    tensor = random_pure_state(spaces, rng)
+    operation = Controlled(CY(), keys=0)
+    output = operation.trait(Apply).apply_on_state_tensor(tensor, (spaces[3], (spaces[1], spaces[2])))
+    matrix = controlled_matrix(controlled_matrix(np.array([[0, -1j], [1j, 0]]), (1,)), (0,))
+    assert_state_close(output, dense_apply(matrix, tensor, (spaces[3], spaces[1], spaces[2]), spaces), spaces)
+
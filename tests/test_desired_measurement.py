@@ -0,0 +1,88 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from braandket import KetSpace, MixedStateTensor, NumSpace, PureStateTensor, numpy_backend
+from braandket_synthesis import DesiredMeasurement, Measure, desired_measure_batched
+from braandket_synthesis.kernels import block_probabilities, norm_values
+from braandket_synthesis.operations.measurement.desired import desired_measure
+from helpers import assert_state_close, qubits, random_mixed_state, random_pure_state, state_values
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_batched_matches_single_outcomes(rng, mixed):
+    spaces = qubits(5)
+    targets = (spaces[3], spaces[1])
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    outcomes = list(itertools.product(range(2), repeat=2))
+    outcome_space = NumSpace(len(outcomes))
+    collapsed, probs = desired_measure_batched(tensor, targets, outcomes, collapse=True, outcome_space=outcome_space)
+    assert probs.shape == (4,) and np.isclose(np.sum(probs), 1)
+    for i, outcome in enumerate(outcomes):
+        expected, expected_prob = desired_measure(tensor, targets, outcome)
+        assert np.isclose(probs[i], expected_prob)
+        if mixed:
+            all_spaces = (*spaces, *(space.ct for space in spaces))
+            outcome_tensor = MixedStateTensor(collapsed.values(outcome_space, *all_spaces)[i], all_spaces, numpy_backend)
+        else:
+            outcome_tensor = PureStateTensor(collapsed.values(outcome_space, *spaces)[i], spaces, numpy_backend)
+        assert_state_close(outcome_tensor, expected, spaces)
+
+    _, array_probs = desired_measure_batched(tensor, targets, np.array(outcomes))
+    np.testing.assert_allclose(array_probs, probs)
+
+
+def test_batched_states_and_zero_probabilities(rng):
+    batch = NumSpace(3)
+    spaces = qubits(3, 3)
+    values = rng.normal(size=(3, 3, 3, 3)) + 0j
+    values[:, 2] = 0
+    tensor = PureStateTensor(values, (batch, *spaces), numpy_backend)
+    outcome_space = NumSpace(3)
+    collapsed, probs = desired_measure_batched(
+        tensor, spaces[0], np.arange(3), collapse=True, outcome_space=outcome_space)
+    np.testing.assert_allclose(probs, np.sum(np.abs(values) ** 2, axis=(2, 3)))
+    collapsed_values = collapsed.values(batch, outcome_space, *spaces)
+    assert np.all(np.isfinite(collapsed_values)) and not np.any(collapsed_values[:, 2])
+    for j in range(2):
+        expected, _ = desired_measure(tensor, [spaces[0]], [j])
+        np.testing.assert_allclose(collapsed_values[:, j], expected.values(batch, *spaces))
+
+    # a single zero-probability outcome collapses to zeros, instead of dividing by zero
+    tensor = PureStateTensor(values[0], spaces, numpy_backend)
+    output, result = DesiredMeasurement(2).trait(Measure).measure_on_state_tensor(tensor, spaces[0])
+    assert result.probability == 0
+    assert np.all(np.isfinite(state_values(output, spaces))) and not np.any(state_values(output, spaces))
+    tensor = MixedStateTensor.of(tensor @ tensor.ct)
+    output, result = DesiredMeasurement(2).trait(Measure).measure_on_state_tensor(tensor, spaces[0])
+    assert result.probability == 0
+    assert np.all(np.isfinite(state_values(output, spaces))) and not np.any(state_values(output, spaces))
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_block_probabilities(rng, mixed):
+    a, b, c = KetSpace(2), KetSpace(3), KetSpace(2)
+    n1, n2 = NumSpace(3), NumSpace(2)
+    values = rng.normal(size=(2, 3, 3, 2, 2)) + 1j * rng.normal(size=(2, 3, 3, 2, 2))
+    pure = PureStateTensor.of(values, (a, n1, b, n2, c))
+    if mixed:
+        tensor = MixedStateTensor.of(
+            np.einsum('aibjc,AiBjC->ijabcABC', values, np.conj(values)),
+            (n1, n2, a, b, c, a.ct, b.ct, c.ct))
+    else:
+        tensor = pure
+    for num_spaces in [(n1, n2), (n2, n1)]:
+        expected = norm_values(pure.component([(a, 1), (c, 0)]), num_spaces)
+        np.testing.assert_allclose(block_probabilities(tensor, (a, c), (1, 0), num_spaces), expected)
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_desired_measurement(rng, mixed):
+    spaces = qubits(3)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    output, result = DesiredMeasurement((1, 0)).trait(Measure).measure_on_state_tensor(tensor, (spaces[2], spaces[0]))
+    _, probs = desired_measure_batched(tensor, (spaces[2], spaces[0]), [(1, 0)])
+    assert result.value == (1, 0) and np.isclose(result.probability, probs[0])
+    expected, _ = desired_measure(tensor, (spaces[2], spaces[0]), (1, 0))
+    assert_state_close(output, expected, spaces)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from braandket_synthesis import Apply, CX, CZ, H, IsDiagonal, MatrixOperation, Remapped, Rz, S, Sequential, T, Z
+from braandket_synthesis.kernels import apply_diagonal_on_state_tensor
+from helpers import assert_state_close, dense_apply, dense_matrix, qubits, random_mixed_state, random_pure_state
+
+
+def test_is_diagonal():
+    for operation in (Z(), S(), T(), Rz(0.3), CZ(), Sequential([Z(), S()]), Remapped(T(), lambda s: s),
+                      MatrixOperation(np.diag([1, 1j, -1, 1]))):
+        assert operation.trait(IsDiagonal).is_diagonal(), operation
+    for operation in (H(), CX(), Sequential([H(), H()]), MatrixOperation(np.ones((2, 2)))):
+        assert not operation.trait(IsDiagonal).is_diagonal(), operation
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_diagonal_operations_match_dense(rng, mixed):
+    spaces = qubits(4)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    for operation, targets in (
+            (Z(), (spaces[1],)),
+            (Rz(0.7), (spaces[2],)),
+            (CZ(), (spaces[3], spaces[0])),
+            (MatrixOperation(np.diag(np.exp(1j * rng.normal(size=4)))), (spaces[3], spaces[1])),
+    ):
+        output = operation.trait(Apply).apply_on_state_tensor(tensor, targets)
+        matrix = dense_matrix(operation, targets)
+        assert_state_close(output, dense_apply(matrix, tensor, targets, spaces), spaces)
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_diagonal_kernel_matches_dense(rng, mixed):
+    spaces = qubits(3)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    diagonal = rng.normal(size=4) + 1j * rng.normal(size=4)
+    targets = (spaces[2], spaces[0])
+    output = apply_diagonal_on_state_tensor(tensor, diagonal, targets)
+    assert_state_close(output, dense_apply(np.diag(diagonal), tensor, targets, spaces), spaces)
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from braandket import NumSpace, PureStateTensor, numpy_backend
+from braandket_synthesis import Apply, CX, Controlled, IsHermitian, MatrixOperation, PauliSum, PermutationOperation, \
+    Remapped, Sequential, ToFingerprint, X, Y, Z, expectation, run_trajectories
+from helpers import dense_matrix, qubits, random_mixed_state, random_pure_state, random_unitary, state_values
+
+PAULIS = {'I': np.eye(2), 'X': np.array([[0, 1], [1, 0]]), 'Y': np.array([[0, -1j], [1j, 0]]), 'Z': np.diag([1, -1])}
+
+
+def pauli_matrix(terms) -> np.ndarray:
+    matrix = 0
+    for string, coefficient in terms:
+        term = np.eye(1)
+        for char in string:
+            term = np.kron(term, PAULIS[char])
+        matrix = matrix + coefficient * term
+    return matrix
+
+
+def dense_expectation(matrix, tensor, targets, spaces) -> complex:
+    # the targets are the leading spaces
+    others = int(np.prod([space.n for space in spaces[len(targets):]]))
+    full = np.kron(matrix, np.eye(others))
+    values = state_values(tensor, spaces)
+    if values.ndim == len(spaces):
+        vector = np.reshape(values, (-1,))
+        return np.vdot(vector, full @ vector)
+    return np.trace(full @ np.reshape(values, (len(full), -1)))
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_pauli_sum(rng, mixed):
+    n = 5
+    spaces = qubits(n + 2)
+    targets = spaces[:n]
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    before = state_values(tensor, spaces)
+
+    terms = [(''.join(rng.choice(list('IXYZ'), n)), float(rng.normal())) for _ in range(100)]
+    observable = PauliSum(terms)
+    matrix = pauli_matrix(observable.terms)
+    np.testing.assert_allclose(dense_matrix(observable, targets), matrix, atol=1e-12)
+    value = expectation(observable, tensor, targets)
+    assert np.isrealobj(value)
+    np.testing.assert_allclose(value, dense_expectation(matrix, tensor, targets, spaces).real)
+
+    # complex coefficients make the observable non-hermitian
+    observable = PauliSum({'XY' + 'I' * (n - 2): 0.3j, 'ZZ' + 'I' * (n - 2): 1.0})
+    assert not observable.trait(IsHermitian).is_hermitian()
+    np.testing.assert_allclose(
+        expectation(observable, tensor, targets),
+        dense_expectation(pauli_matrix(observable.terms), tensor, targets, spaces))
+
+    np.testing.assert_array_equal(state_values(tensor, spaces), before)
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_matrix_observables(rng, mixed):
+    spaces = qubits(4)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+
+    unitary = random_unitary(4, rng)
+    hermitian = unitary + unitary.conj().T
+    value = expectation(MatrixOperation(hermitian), tensor, spaces[:2])
+    np.testing.assert_allclose(value, dense_expectation(hermitian, tensor, spaces[:2], spaces).real)
+
+    diagonal = np.diag(rng.normal(size=4))
+    value = expectation(MatrixOperation(diagonal), tensor, spaces[:2])
+    np.testing.assert_allclose(value, dense_expectation(diagonal, tensor, spaces[:2], spaces).real)
+
+    general = rng.normal(size=(2, 2)) + 1j * rng.normal(size=(2, 2))
+    value = expectation(MatrixOperation(general), tensor, spaces[0])
+    np.testing.assert_allclose(value, dense_expectation(general, tensor, spaces[:1], spaces))
+
+    for observable, targets in ((X(), spaces[:1]), (Y(), spaces[:1]), (CX(), spaces[:2]),
+                                (PermutationOperation([1, 2, 0, 3], [1, 1j, -1, 1]), spaces[:2])):
+        value = expectation(observable, tensor, targets)
+        matrix = dense_matrix(observable, targets)
+        np.testing.assert_allclose(value, dense_expectation(matrix, tensor, targets, spaces), atol=1e-12)
+
+
+def test_batched_expectations(rng):
+    spaces = qubits(3)
+    tensor = random_pure_state(spaces, rng)
+    batch = NumSpace(3)
+    matrices = np.stack([random_unitary(4, rng) + random_unitary(4, rng).conj().T for _ in range(3)])
+    values = expectation(MatrixOperation(matrices, num_spaces=[batch]), tensor, spaces[:2])
+    vectors = np.reshape(state_values(tensor, spaces), (4, 2))
+    np.testing.assert_allclose(values, [np.einsum('ir,ij,jr->', vectors.conj(), m, vectors) for m in matrices])
+
+    batch = NumSpace(4)
+    batched_values = rng.normal(size=(4, 2, 2)) + 0j
+    batched_tensor = PureStateTensor(batched_values, (batch, *spaces[:2]), numpy_backend)
+    observable = PauliSum({'XZ': 1.0, 'YY': 0.5, 'ZI': -0.2})
+    matrix = pauli_matrix(observable.terms)
+    np.testing.assert_allclose(
+        expectation(observable, batched_tensor, spaces[:2]),
+        [np.vdot(vector.reshape(-1), matrix @ vector.reshape(-1)).real for vector in batched_values])
+
+
+def test_hermiticity():
+    assert PauliSum({'XZ': 1.0, 'YI': 2.0}).trait(IsHermitian).is_hermitian()
+    assert Controlled(Z()).trait(IsHermitian).is_hermitian()
+    assert Controlled(X()).trait(IsHermitian).is_hermitian()
+    assert not Controlled(MatrixOperation(np.diag([1, 1j]))).trait(IsHermitian).is_hermitian()
+    assert PermutationOperation([1, 0, 2]).trait(IsHermitian).is_hermitian()
+    assert not PermutationOperation([1, 2, 0]).trait(IsHermitian).is_hermitian()
+
+
+def test_pauli_sum_keys():
+    assert PauliSum({'XZ': 1.0}).structural_key() == PauliSum([('XZ', 1.0)]).structural_key()
+    assert PauliSum({'XZ': 1.0}).structural_key() != PauliSum([('XZ', 2.0)]).structural_key()
+    assert PauliSum([('XZ', 1.0), ('XZ', 1.0)]).terms == (('XZ', 2.0),)
+    assert PauliSum({'XZ': 1.0}).trait(ToFingerprint).fingerprint(qubits(2)) is not None
+    with pytest.raises(ValueError):
+        PauliSum({'XA': 1.0})
+    with pytest.raises(ValueError):
+        PauliSum({'X': 1.0, 'XZ': 1.0})
+
+
+def test_trajectory_observables(rng):
+    spaces = qubits(3)
+    tensor = random_pure_state(spaces, rng)
+    circuit = Sequential([
+        Remapped(MatrixOperation(random_unitary(4, rng)), lambda s: (s[0], s[1])),
+        Remapped(CX(), lambda s: (s[1], s[2])),
+    ])
+    observable = PauliSum({'XZ': 1.0, 'ZY': -0.5})
+    result = run_trajectories(circuit, tensor, spaces, 3, observables=[(observable, spaces[1:])])
+    output = circuit.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    np.testing.assert_allclose(result.expectations, [expectation(observable, output, spaces[1:])])
+    np.testing.assert_allclose(result.standard_errors, [0], atol=1e-12)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from braandket_synthesis import Apply, CX, D, H, MatrixOperation, Measure, Remapped, Rx, Rz, S, Sequential, T, X, \
+    Y, fuse
+from helpers import assert_state_close, qubits, random_mixed_state, random_pure_state, random_unitary
+
+
+def on(operation, *indices):
+    if len(indices) == 1:
+        return Remapped(operation, lambda s, i=indices[0]: s[i])
+    return Remapped(operation, lambda s, indices=indices: tuple(s[i] for i in indices))
+
+
+def circuit(rng):
+    return Sequential([
+        *(on(Rx(0.1 * i), i % 4) for i in range(12)),
+        on(H(), 1), on(H(), 1),
+        on(CX(), 0, 2), on(T(), 3), on(S(), 3),
+        on(MatrixOperation(random_unitary(4, rng)), 1, 3),
+        Sequential([on(Y(), 0), on(X(), 2)]),
+        on(Rz(0.3), 2),
+        on(CX(), 0, 2), on(CX(), 0, 2),
+    ])
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+@pytest.mark.parametrize('max_spaces', [1, 2, 3])
+def test_fused_circuit_is_equivalent(rng, mixed, max_spaces):
+    spaces = qubits(4)
+    operation = circuit(rng)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+
+    fused, stats = fuse(operation, spaces, max_spaces=max_spaces)
+    assert stats.fused_steps < stats.original_steps
+    expected = operation.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    output = fused.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    assert_state_close(output, expected, spaces)
+
+
+def test_inverse_pairs_are_cancelled():
+    spaces = qubits(2)
+    fused, stats = fuse(Sequential([on(H(), 0), on(H(), 0), on(CX(), 0, 1), on(CX(), 0, 1)]), spaces, max_spaces=2)
+    assert stats.cancelled_steps == 4
+    assert stats.fused_steps == 0
+
+
+def test_measurements_are_barriers(rng):
+    spaces = qubits(3)
+    operation = Sequential([on(H(), 0), on(CX(), 0, 1), on(D(1), 1), on(H(), 1), on(T(), 2), on(H(), 1)])
+    tensor = random_pure_state(spaces, rng)
+
+    fused, _ = fuse(operation, spaces, max_spaces=2)
+    expected, expected_results = operation.trait(Measure).measure_on_state_tensor(tensor, spaces)
+    output, results = fused.trait(Measure).measure_on_state_tensor(tensor, spaces)
+    assert_state_close(output, expected, spaces)
+    expected_results = [result for result in expected_results if result is not None]
+    results = [result for result in results if result is not None]
+    assert [result.value for result in results] == [result.value for result in expected_results]
+    assert np.allclose([result.probability for result in results],
+                       [result.probability for result in expected_results])
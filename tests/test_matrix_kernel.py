@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from braandket_synthesis import Apply, MatrixOperation, QubitsMatrixOperation, ToKraus
+from braandket_synthesis.kernels import apply_matrix_on_state_tensor
+from helpers import assert_state_close, dense_apply, qubits, random_mixed_state, random_pure_state, random_unitary
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+@pytest.mark.parametrize('targets_i', [(2,), (3, 0), (1, 3, 2)])
+def test_matrix_operation_matches_dense(rng, mixed, targets_i):
+    spaces = qubits(4)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    targets = tuple(spaces[i] for i in targets_i)
+    matrix = random_unitary(2 ** len(targets), rng)
+
+    output = MatrixOperation(matrix).trait(Apply).apply_on_state_tensor(tensor, targets)
+    assert_state_close(output, dense_apply(matrix, tensor, targets, spaces), spaces)
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_matrix_operation_matches_kraus(rng, mixed):
+    spaces = qubits(3)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    operation = QubitsMatrixOperation(random_unitary(4, rng))
+    targets = (spaces[2], spaces[0])
+
+    output = operation.trait(Apply).apply_on_state_tensor(tensor, targets)
+    expected = operation.trait(ToKraus).apply_on_state_tensor(tensor, targets)
+    assert_state_close(output, expected, spaces)
+
+
+def test_matrix_kernel_on_qudits(rng):
+    spaces = qubits(3, 3)
+    tensor = random_pure_state(spaces, rng)
+    matrix = random_unitary(9, rng)
+    output = apply_matrix_on_state_tensor(tensor, matrix, (spaces[2], spaces[1]))
+    assert_state_close(output, dense_apply(matrix, tensor, (spaces[2], spaces[1]), spaces), spaces)
+
+
+def test_non_unitary_matrix_is_not_normalized(rng):
+    spaces = qubits(2)
+    tensor = random_pure_state(spaces, rng)
+    matrix = np.diag([2.0, 0.5])
+    output = MatrixOperation(matrix).trait(Apply).apply_on_state_tensor(tensor, spaces[0])
+    assert_state_close(output, dense_apply(matrix, tensor, spaces[:1], spaces), spaces)
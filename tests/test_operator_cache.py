@@ -0,0 +1,123 @@
+import subprocess
+import sys
+
+import numpy as np
+
+from braandket import PureStateTensor
+from braandket_synthesis import CX, Controlled, H, KrausOperation, M, MatrixOperation, Measure, \
+    PermutationOperation, Remapped, Rx, Rz, S, Sequential, T, ToFingerprint, ToKraus, ToTensor, X, fuse
+from braandket_synthesis.compiling import OperatorCache
+from braandket_synthesis.utils import rng_context
+from helpers import assert_state_close, qubits, random_pure_state, random_unitary
+
+
+def make_circuit(unitary):
+    return Sequential([
+        Remapped(H(), lambda s: s[0]),
+        Remapped(CX(), lambda s: (s[0], s[5])),
+        Remapped(MatrixOperation(unitary), lambda s: (s[4], s[1])),
+        Remapped(PermutationOperation.from_function(lambda i: (i + 3) % 8, 8), lambda s: (s[5], s[2], s[0])),
+        Remapped(Controlled(Rx(0.3), keys=(1, 0)), lambda s: ((s[2], s[4]), s[3])),
+    ])
+
+
+def test_fingerprints(rng):
+    spaces = qubits(6)
+    unitary = random_unitary(4, rng)
+    fingerprint = make_circuit(unitary).trait(ToFingerprint).fingerprint(spaces)
+    assert fingerprint is not None
+    assert make_circuit(unitary.copy()).trait(ToFingerprint).fingerprint(spaces) == fingerprint
+    assert make_circuit(unitary).trait(ToFingerprint).fingerprint(qubits(6)) == fingerprint
+    assert make_circuit(random_unitary(4, rng)).trait(ToFingerprint).fingerprint(spaces) != fingerprint
+    assert Remapped(H(), lambda s: s[0]).trait(ToFingerprint).fingerprint(spaces) != \
+           Remapped(H(), lambda s: s[1]).trait(ToFingerprint).fingerprint(spaces)
+    assert M().trait(ToFingerprint).fingerprint(spaces[0]) is not None
+
+
+def test_fingerprints_are_stable_across_processes():
+    # the digests must not depend on hash randomization
+    code = "\n".join([
+        "from braandket import KetSpace",
+        "from braandket_synthesis import CX, Controlled, H, Remapped, Rz, Sequential, ToFingerprint",
+        "spaces = tuple(KetSpace(2) for _ in range(3))",
+        "print(Sequential([Remapped(CX(), lambda s: (s[0], s[2])), Remapped(Rz(0.5), lambda s: s[1]),",
+        "    Remapped(Controlled(H(), keys=0), lambda s: (s[1], s[0]))]).trait(ToFingerprint).fingerprint(spaces))",
+    ])
+    outputs = {
+        subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        for _ in range(3)}
+    assert len(outputs) == 1 and len(next(iter(outputs)).strip()) > 0
+
+
+def test_round_trip(rng, tmp_path):
+    spaces = qubits(6)
+    unitary = random_unitary(4, rng)
+    expected = make_circuit(unitary).trait(ToTensor).to_tensor(spaces)
+    tensor = random_pure_state(spaces, rng)
+
+    stored = OperatorCache(str(tmp_path)).to_tensor(make_circuit(unitary), spaces)
+    assert_state_close(PureStateTensor.of(stored @ tensor), PureStateTensor.of(expected @ tensor), spaces)
+
+    # a fresh cache on the same directory loads the stored operator as a memory map
+    cache = OperatorCache(str(tmp_path))
+    loaded = cache.to_tensor(make_circuit(unitary.copy()), spaces)
+    assert cache.hits == 1 and cache.misses == 0
+    values = loaded.values()
+    assert isinstance(values, np.memmap) or isinstance(getattr(values, 'base', None), np.memmap)
+    assert_state_close(PureStateTensor.of(loaded @ tensor), PureStateTensor.of(expected @ tensor), spaces)
+
+
+def test_kraus_and_dtypes(tmp_path):
+    spaces = qubits(2)
+    kraus = KrausOperation([np.sqrt(0.5) * np.eye(2), np.sqrt(0.5) * np.array([[0, 1], [1, 0]])])
+    expected = kraus.trait(ToKraus).to_kraus(spaces[1])
+    OperatorCache(str(tmp_path)).to_kraus(kraus, spaces[1])
+    cache = OperatorCache(str(tmp_path))
+    loaded = cache.to_kraus(kraus, spaces[1])
+    assert cache.hits == 1 and len(loaded) == len(expected)
+    for loaded_tensor, expected_tensor in zip(loaded, expected):
+        np.testing.assert_allclose(loaded_tensor.values(), expected_tensor.values())
+
+    expected = X().trait(ToTensor).to_tensor(spaces[0])
+    OperatorCache(str(tmp_path)).to_tensor(X(), spaces[0])
+    loaded = OperatorCache(str(tmp_path)).to_tensor(X(), spaces[0])
+    assert loaded.values().dtype == expected.values().dtype
+    complex_loaded = OperatorCache(str(tmp_path)).to_tensor(X(), spaces[0], dtype=np.complex128)
+    assert complex_loaded.values().dtype == np.complex128
+
+
+def test_eviction(rng, tmp_path):
+    spaces = qubits(6)
+    cache = OperatorCache(str(tmp_path), max_bytes=10 * 16 * 64 * 64)
+    for _ in range(15):
+        cache.to_tensor(MatrixOperation(random_unitary(64, rng)), spaces)
+        assert cache.size() <= cache.max_bytes
+    assert cache.evictions > 0 and 0 < len(cache) < 15
+    assert OperatorCache(str(tmp_path)).size() == cache.size()
+    cache.clear()
+    assert len(cache) == 0 and cache.size() == 0
+
+
+def test_fusion_with_cache(rng, tmp_path):
+    spaces = qubits(4)
+
+    def on(operation, *indices):
+        return Remapped(operation, lambda s: s[indices[0]] if len(indices) == 1 else tuple(s[i] for i in indices))
+
+    steps = [on(Rx(0.1 * i), i % 4) for i in range(20)] + [
+        on(H(), 1), on(H(), 1), on(CX(), 0, 2), on(T(), 3), on(S(), 3),
+        on(MatrixOperation(random_unitary(4, rng)), 1, 3), on(M(), 2), on(Rz(0.3), 2), on(CX(), 0, 2)]
+    circuit = Sequential(steps)
+    expected, expected_stats = fuse(circuit, spaces)
+    fuse(circuit, spaces, cache=OperatorCache(str(tmp_path)))
+    cache = OperatorCache(str(tmp_path))
+    fused, stats = fuse(circuit, spaces, cache=cache)
+    assert repr(stats) == repr(expected_stats)
+    assert cache.misses == 0 and cache.hits > 0
+
+    tensor = random_pure_state(spaces, rng)
+    with rng_context(np.random.default_rng(1)):
+        expected_output, _ = expected.trait(Measure).measure_on_state_tensor(tensor, spaces)
+    with rng_context(np.random.default_rng(1)):
+        output, _ = fused.trait(Measure).measure_on_state_tensor(tensor, spaces)
+    assert_state_close(output, expected_output, spaces)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from braandket_synthesis import CX, Controlled, D, H, KrausOperation, M, MatrixOperation, Measure, \
+    PermutationOperation, Remapped, Rx, Rz, Sequential, X
+from braandket_synthesis.kernels import iter_chunks
+from braandket_synthesis.simulation import MemmapState, run_out_of_core
+from braandket_synthesis.utils import rng_context
+from helpers import assert_state_close, qubits, random_mixed_state, random_pure_state, random_unitary, \
+    state_values
+
+
+@pytest.mark.parametrize('full_axes', [(), (1,), (0, 4), (2, 3)])
+@pytest.mark.parametrize('max_size', [1, 7, 30, 1000])
+def test_chunks_cover_once(full_axes, max_size):
+    shape = (2, 3, 4, 2, 5)
+    counts = np.zeros(shape, dtype=int)
+    for chunk in iter_chunks(shape, full_axes, max_size):
+        assert all(chunk[axis] == slice(None) for axis in full_axes)
+        counts[chunk] += 1
+    assert np.all(counts == 1)
+
+
+def make_circuit(rng):
+    unitary = random_unitary(4, rng)
+    return Sequential([
+        Remapped(H(), lambda s: s[0]),
+        Remapped(CX(), lambda s: (s[0], s[5])),
+        Remapped(MatrixOperation(unitary), lambda s: (s[4], s[1])),
+        Remapped(Rz(0.7), lambda s: s[3]),
+        Remapped(PermutationOperation.from_function(lambda i: (i + 3) % 8, 8), lambda s: (s[5], s[2], s[0])),
+        Remapped(Controlled(Sequential([
+            Remapped(X(), lambda s: s[0]),
+            Remapped(MatrixOperation(unitary), lambda s: s),
+        ]), keys=(1, 0)), lambda s: ((s[2], s[4]), (s[0], s[5]))),
+        Remapped(M(), lambda s: (s[1], s[3])),
+        Remapped(D(1), lambda s: s[5]),
+        Remapped(Rx(0.4), lambda s: s[4]),
+    ])
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_matches_in_memory(rng, tmp_path, mixed):
+    spaces = qubits(6)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    circuit = make_circuit(rng)
+    with rng_context(np.random.default_rng(3)):
+        expected, expected_results = circuit.trait(Measure).measure_on_state_tensor(tensor, spaces)
+    expected_results = [result for result in expected_results if result is not None]
+
+    # a budget of a few elements forces many chunks per step
+    path = str(tmp_path / 'state.bin')
+    state = MemmapState.from_tensor(path, tensor, memory_budget=16 * 5 * 4)
+    results = run_out_of_core(circuit, state, rng=np.random.default_rng(3))
+    assert len(results) == len(expected_results)
+    for result, expected_result in zip(results, expected_results):
+        assert result.value == expected_result.value
+        assert np.isclose(result.probability, expected_result.probability)
+    assert_state_close(state.to_tensor(), expected, spaces)
+    assert np.isclose(state.norm(), 1)
+
+    reopened = MemmapState.open(path, spaces, mixed=mixed)
+    assert_state_close(reopened.to_tensor(), expected, spaces)
+
+
+def test_created_state(tmp_path):
+    spaces = qubits(4)
+    state = MemmapState.create(str(tmp_path / 'state.bin'), spaces, memory_budget=256)
+    run_out_of_core(Sequential([Remapped(H(), lambda s: s[0]), Remapped(CX(), lambda s: (s[0], s[3]))]), state)
+    np.testing.assert_allclose(state.probabilities((spaces[0], spaces[3])), [[0.5, 0], [0, 0.5]], atol=1e-12)
+    values = state_values(state.to_tensor(), spaces)
+    assert np.isclose(values[0, 0, 0, 0], 2 ** -0.5) and np.isclose(values[1, 0, 0, 1], 2 ** -0.5)
+
+
+def test_unsupported_steps_keep_the_state(tmp_path):
+    spaces = qubits(3)
+    state = MemmapState.create(str(tmp_path / 'state.bin'), spaces)
+    before = np.array(state.values)
+    kraus = KrausOperation((np.eye(2) * 0.6, np.eye(2) * 0.8))
+    with pytest.raises(ValueError):
+        run_out_of_core(Sequential([Remapped(H(), lambda s: s[0]), Remapped(kraus, lambda s: s[1])]), state)
+    np.testing.assert_array_equal(np.array(state.values), before)
@@ -0,0 +1,56 @@
+import multiprocessing
+import operator
+
+import numpy as np
+import pytest
+
+from braandket_synthesis import H, M, MatrixOperation, Remapped, Sequential, sample, sample_parallel
+from helpers import qubits, random_pure_state, random_unitary
+
+
+def picklable_circuit(rng) -> Sequential:
+    return Sequential([
+        Remapped(MatrixOperation(random_unitary(4, rng)), operator.itemgetter(0, 1)),
+        Remapped(M(), operator.itemgetter(0)),
+        Remapped(H(), operator.itemgetter(1)),
+        M(),
+    ])
+
+
+def test_counts_depend_on_seed_but_not_on_workers(rng):
+    spaces = qubits(2)
+    tensor = random_pure_state(spaces, rng)
+    operation = picklable_circuit(rng)
+    first = sample_parallel(operation, tensor, spaces, 2000, seed=5, chunks=8, max_workers=1)
+    second = sample_parallel(operation, tensor, spaces, 2000, seed=5, chunks=8, max_workers=3)
+    assert first == second
+    assert sum(first.values()) == 2000
+    assert sample_parallel(operation, tensor, spaces, 2000, seed=6, chunks=8, max_workers=2) != first
+
+
+def test_counts_match_serial_sampling(rng):
+    spaces = qubits(2)
+    tensor = random_pure_state(spaces, rng)
+    operation = picklable_circuit(rng)
+    shots = 8000
+    parallel = sample_parallel(operation, tensor, spaces, shots, seed=1, chunks=8, max_workers=2)
+    serial = sample(operation, tensor, spaces, shots, rng=np.random.default_rng(1))
+    for key in set(parallel) | set(serial):
+        assert abs(parallel.get(key, 0) - serial.get(key, 0)) / shots < 0.04, key
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="fork is not available")
+def test_forked_workers_accept_lambda_mappings(rng):
+    spaces = qubits(2)
+    tensor = random_pure_state(spaces, rng)
+    operation = Sequential([Remapped(H(), lambda s: s[0]), Remapped(M(), lambda s: s[0])])
+    first = sample_parallel(operation, tensor, spaces, 500, seed=3, chunks=4, max_workers=2, fork=True)
+    second = sample_parallel(operation, tensor, spaces, 500, seed=3, chunks=4, max_workers=1, fork=True)
+    assert first == second and sum(first.values()) == 500
+
+
+def test_unpicklable_job_is_rejected(rng):
+    spaces = qubits(1)
+    tensor = random_pure_state(spaces, rng)
+    with pytest.raises(ValueError):
+        sample_parallel(Remapped(M(), lambda s: s[0]), tensor, spaces, 10)
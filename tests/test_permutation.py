@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from braandket_synthesis import Apply, CX, Controlled, IsClifford, IsDiagonal, IsUnitary, MatrixOperation, \
+    PermutationOperation, Remapped, S, Sequential, ToMonomial, X, Y, compile_tape
+from helpers import assert_state_close, dense_apply, dense_matrix, qubits, random_mixed_state, random_pure_state
+
+
+class CooMatrix:
+    # the part of the scipy.sparse interface used by MatrixOperation and PermutationOperation
+    def __init__(self, array: np.ndarray):
+        self.shape = array.shape
+        self.row, self.col = np.nonzero(array)
+        self.data = array[self.row, self.col]
+        self._array = array
+
+    def tocoo(self) -> 'CooMatrix':
+        return self
+
+    def toarray(self) -> np.ndarray:
+        return self._array
+
+
+def test_monomial_forms():
+    sources, phases = X().trait(ToMonomial).to_monomial()
+    assert list(sources) == [1, 0] and phases is None
+    sources, phases = Y().trait(ToMonomial).to_monomial()
+    assert list(sources) == [1, 0] and np.allclose(phases, [-1j, 1j])
+    sources, phases = S().trait(ToMonomial).to_monomial()
+    assert sources is None and np.allclose(phases, [1, 1j])
+    assert MatrixOperation(np.ones((2, 2))).trait(ToMonomial).to_monomial() is None
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_monomial_gates_match_dense(rng, mixed):
+    spaces = qubits(4)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    for operation, targets in ((X(), (spaces[1],)), (CX(), (spaces[0], spaces[2])), (Y(), (spaces[3],)),
+                               (S(), (spaces[0],)), (Controlled(X()), (spaces[0], spaces[3]))):
+        output = operation.trait(Apply).apply_on_state_tensor(tensor, targets)
+        matrix = dense_matrix(operation, targets)
+        assert_state_close(output, dense_apply(matrix, tensor, targets, spaces), spaces)
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_permutation_operation_matches_dense(rng, mixed):
+    spaces = qubits(4)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    operation = PermutationOperation.from_function(lambda i: (i + 3) % 16, 16)
+    matrix = np.zeros((16, 16))
+    matrix[(np.arange(16) + 3) % 16, np.arange(16)] = 1
+    np.testing.assert_array_equal(operation.matrix, matrix)
+    output = operation.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    assert_state_close(output, dense_apply(matrix, tensor, spaces, spaces), spaces)
+
+
+def test_sparse_matrices(rng):
+    spaces = qubits(2)
+    array = np.eye(4)[[0, 1, 3, 2]] * np.array([1, 1j, 1, -1])[:, None]
+    operation = PermutationOperation.from_matrix(CooMatrix(array))
+    np.testing.assert_allclose(operation.matrix, array)
+    np.testing.assert_allclose(MatrixOperation(CooMatrix(array)).matrix, array)
+    tensor = random_pure_state(spaces, rng)
+    output = operation.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    assert_state_close(output, dense_apply(array, tensor, spaces, spaces), spaces)
+    with pytest.raises(ValueError):
+        PermutationOperation.from_matrix(np.ones((2, 2)))
+
+
+def test_permutation_traits():
+    phased = PermutationOperation.from_matrix(np.eye(4)[[0, 1, 3, 2]] * np.array([1, 1j, 1, -1])[:, None])
+    assert phased.trait(IsUnitary).is_unitary()
+    assert not phased.trait(IsDiagonal).is_diagonal()
+    # diag(1, i, 1, -1) is a controlled-S, diag(1, i, 1, -i) is S with CZ
+    assert not phased.trait(IsClifford).is_clifford()
+    clifford = PermutationOperation([0, 1, 3, 2], [1, 1j, 1, -1j])
+    assert clifford.trait(IsClifford).is_clifford()
+    assert PermutationOperation(range(4), [1, 1j, -1, 1]).trait(IsDiagonal).is_diagonal()
+    assert not PermutationOperation([0, 1, 2], [1, 2, 3]).trait(IsUnitary).is_unitary()
+
+
+def test_matrix_is_built_once():
+    operation = PermutationOperation.from_function(lambda i: i ^ 1, 8)
+    matrix = operation.matrix
+    assert operation.matrix is matrix
+    assert not matrix.flags.writeable
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_permutations_on_tape(rng, mixed):
+    spaces = qubits(4)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    adder = PermutationOperation.from_function(lambda i: (i + 3) % 16, 16)
+    phased = PermutationOperation.from_matrix(np.eye(4)[[0, 1, 3, 2]] * np.array([1, 1j, 1, -1])[:, None])
+    operation = Sequential([
+        Remapped(adder, lambda s: s),
+        Remapped(CX(), lambda s: (s[0], s[1])),
+        Remapped(Controlled(phased), lambda s: (s[3], (s[0], s[1]))),
+    ])
+    output, _ = compile_tape(operation, spaces).run(tensor)
+    assert_state_close(output, operation.trait(Apply).apply_on_state_tensor(tensor, spaces), spaces)
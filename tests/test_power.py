@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from braandket_synthesis import Apply, CX, Controlled, H, IsClifford, M, MatrixOperation, Power, Remapped, Rz, \
+    Sequential, T, ToTensor, sample
+from braandket_synthesis.operations.structural.power import power_matrices
+from helpers import assert_state_close, dense_apply, dense_matrix, qubits, random_mixed_state, random_pure_state, \
+    random_unitary, zero_state
+
+
+@pytest.mark.parametrize('k', [0, 1, 2, 3, 5, 13, 300])
+@pytest.mark.parametrize('mixed', [False, True])
+def test_matrix_power(rng, k, mixed):
+    spaces = qubits(4)
+    targets = spaces[:3]
+    unitary = random_unitary(8, rng)
+    expected = np.linalg.matrix_power(unitary, k)
+    operation = Power(MatrixOperation(unitary), k)
+    np.testing.assert_allclose(dense_matrix(operation, targets), expected, atol=1e-9)
+
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    output = operation.trait(Apply).apply_on_state_tensor(tensor, targets)
+    assert_state_close(output, dense_apply(expected, tensor, targets, spaces), spaces)
+
+
+def test_diagonal_power(rng):
+    spaces = qubits(2)
+    tensor = random_pure_state(spaces, rng)
+    output = Power(Rz(0.3), 7).trait(Apply).apply_on_state_tensor(tensor, spaces[1])
+    assert_state_close(output, Rz(2.1).trait(Apply).apply_on_state_tensor(tensor, spaces[1]), spaces)
+
+
+@pytest.mark.parametrize('k', [3, 6])
+def test_structural_original(rng, k):
+    spaces = qubits(3)
+    circuit = Sequential([
+        Remapped(H(), lambda s: s[0]),
+        Remapped(CX(), lambda s: (s[0], s[1])),
+        Remapped(T(), lambda s: s[1]),
+    ])
+    repeated = Sequential([circuit] * k)
+    tensor = random_pure_state(spaces, rng)
+    output = Power(circuit, k).trait(Apply).apply_on_state_tensor(tensor, spaces)
+    assert_state_close(output, repeated.trait(Apply).apply_on_state_tensor(tensor, spaces), spaces)
+    np.testing.assert_allclose(
+        dense_matrix(Power(circuit, k), spaces[:2]), dense_matrix(repeated, spaces[:2]), atol=1e-9)
+
+
+def test_controlled_powers_share_squares(rng):
+    spaces = qubits(4)
+    unitary = random_unitary(8, rng)
+    original = MatrixOperation(unitary)
+    targets = (spaces[3], spaces[:3])
+    for j in range(6):
+        matrix = dense_matrix(Controlled(Power(original, 2 ** j)), targets)
+        np.testing.assert_allclose(matrix[8:, 8:], np.linalg.matrix_power(unitary, 2 ** j), atol=1e-9)
+        np.testing.assert_allclose(matrix[:8, :8], np.eye(8), atol=1e-12)
+    assert power_matrices(original, spaces[:3]) is power_matrices(original, spaces[:3])
+
+    tensor = random_pure_state(spaces, rng)
+    output = Controlled(Power(original, 5)).trait(Apply).apply_on_state_tensor(tensor, targets)
+    expected = Controlled(MatrixOperation(np.linalg.matrix_power(unitary, 5))).trait(Apply) \
+        .apply_on_state_tensor(tensor, targets)
+    assert_state_close(output, expected, spaces)
+
+
+def test_traits():
+    assert Power(H(), 2).trait(IsClifford).is_clifford()
+    assert Power(T(), 0).trait(IsClifford).is_clifford()
+    assert Power(T(), 2).trait(IsClifford).is_clifford() is None  # unknown, T^2 = S
+    assert Power(H(), 2).structural_key() == Power(H(), 2).structural_key()
+    assert Power(H(), 2).structural_key() != Power(H(), 3).structural_key()
+
+
+def test_cached_squares_are_bounded(rng):
+    spaces = qubits(5)
+    original = MatrixOperation(random_unitary(32, rng))
+    original.cache.max_bytes = 5 * 32 * 32 * 16
+    original.set_cache(ToTensor, 'marker', np.zeros(10))
+    operation = Power(original, 13)
+    np.testing.assert_allclose(
+        dense_matrix(operation, spaces), np.linalg.matrix_power(original.matrix, 13), atol=1e-9)
+    assert original.cache.bytes <= original.cache.max_bytes
+    assert original.get_cache(ToTensor, 'marker', None) is not None
+
+    # too large for the share of the cache, applied repeatedly instead
+    original.cache.max_bytes = 32 * 32 * 16
+    original.clear_cache()
+    assert power_matrices(original, spaces) is None
+    tensor = random_pure_state(spaces, rng)
+    output = Power(original, 3).trait(Apply).apply_on_state_tensor(tensor, spaces)
+    assert_state_close(output, dense_apply(np.linalg.matrix_power(original.matrix, 3), tensor, spaces, spaces), spaces)
+
+
+def test_nested_measurements_are_sampled_per_shot():
+    space, = qubits(1)
+    tensor = zero_state((space,))
+    operation = Sequential([H(), Power(M(), 1), M()])
+    counts = sample(operation, tensor, space, 1000, rng=np.random.default_rng(0))
+    assert 400 < counts.get((0,), 0) < 600
+    assert sample(operation, tensor, space, 100, rng=np.random.default_rng(5)) == \
+           sample(operation, tensor, space, 100, rng=np.random.default_rng(5))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from braandket import MixedStateTensor
+from braandket_synthesis.kernels import marginal_probabilities
+from braandket_synthesis.operations.measurement.projective import choose_values, projective_measure
+from helpers import qubits, random_pure_state, state_values
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_marginal_probabilities_match_dense(rng, mixed):
+    spaces = qubits(4)
+    tensor = random_pure_state(spaces, rng)
+    values = state_values(tensor, spaces)
+    if mixed:
+        tensor = MixedStateTensor.of(tensor @ tensor.ct)
+    expected = np.einsum('abcd->ca', np.abs(values) ** 2)
+    np.testing.assert_allclose(marginal_probabilities(tensor, (spaces[2], spaces[0])), expected, atol=1e-12)
+    np.testing.assert_allclose(marginal_probabilities(tensor, spaces), np.abs(values) ** 2, atol=1e-12)
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_projective_measure_collapses_consistently(rng, mixed):
+    spaces = qubits(3)
+    tensor = random_pure_state(spaces, rng)
+    if mixed:
+        tensor = MixedStateTensor.of(tensor @ tensor.ct)
+    targets = (spaces[2], spaces[0])
+    probs = marginal_probabilities(tensor, targets)
+    for _ in range(20):
+        output, values, prob = projective_measure(tensor, targets)
+        assert np.isclose(prob, probs[tuple(values)])
+        np.testing.assert_allclose(marginal_probabilities(output, targets)[tuple(values)], 1.0)
+
+
+def test_choose_values_follows_the_distribution():
+    probs = np.tile([0.2, 0.0, 0.3, 0.5, 0.0], (20000, 1))
+    (indices,), prob = choose_values(probs, 1)
+    frequencies = np.bincount(indices, minlength=5) / len(indices)
+    assert frequencies[1] == 0 and frequencies[4] == 0
+    np.testing.assert_allclose(frequencies, [0.2, 0.0, 0.3, 0.5, 0.0], atol=0.02)
+    assert np.all(prob > 0)
+
+
+def test_choose_values_never_chooses_zero_probability():
+    # nearly all the mass on the last non-zero outcome, with trailing zeros
+    probs = np.tile([0.0, 1e-17, 1.0 - 1e-17, 0.0, 0.0], (5000, 1))
+    (indices,), prob = choose_values(probs, 1)
+    assert np.all(probs[0, indices] > 0) and np.all(prob > 0)
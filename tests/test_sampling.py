@@ -0,0 +1,65 @@
+import numpy as np
+
+from braandket_synthesis import Apply, H, MatrixOperation, ProjectiveMeasurement, Remapped, Sequential, sample
+from braandket_synthesis.kernels import marginal_probabilities
+from helpers import qubits, random_mixed_state, random_pure_state, random_unitary, zero_state
+
+
+def assert_counts_match(counts: dict, expected: dict, shots: int):
+    assert sum(counts.values()) == shots
+    for key in counts:
+        assert expected.get(key, 0) > 0, key
+    for key, prob in expected.items():
+        tolerance = 5 * np.sqrt(prob * (1 - prob) / shots) + 1e-9
+        assert abs(counts.get(key, 0) / shots - prob) <= tolerance, (key, counts.get(key, 0), prob)
+
+
+def test_terminal_measurements_match_probabilities(rng):
+    spaces = qubits(3)
+    tensor = random_pure_state(spaces, rng)
+    unitary = MatrixOperation(random_unitary(4, rng))
+    operation = Sequential([
+        Remapped(unitary, lambda s: (s[0], s[1])),
+        Remapped(ProjectiveMeasurement(), lambda s: (s[0], s[2])),
+        Remapped(ProjectiveMeasurement(), lambda s: s[1]),
+    ])
+    shots = 20000
+    counts = sample(operation, tensor, spaces, shots, rng=np.random.default_rng(1))
+
+    output = Remapped(unitary, lambda s: (s[0], s[1])).trait(Apply).apply_on_state_tensor(tensor, spaces)
+    probs = marginal_probabilities(output, spaces)
+    expected = {((a, c), b): probs[a, b, c] for a in range(2) for b in range(2) for c in range(2)}
+    assert_counts_match(counts, expected, shots)
+
+
+def test_counts_are_reproducible(rng):
+    spaces = qubits(2)
+    tensor = random_mixed_state(spaces, rng)
+    operation = Sequential([Remapped(H(), lambda s: s[0]), ProjectiveMeasurement()])
+    first = sample(operation, tensor, spaces, 1000, rng=np.random.default_rng(7))
+    second = sample(operation, tensor, spaces, 1000, rng=np.random.default_rng(7))
+    assert first == second
+
+
+def test_mid_circuit_measurement(rng):
+    spaces = qubits(2)
+    operation = Sequential([
+        Remapped(H(), lambda s: s[0]),
+        Remapped(ProjectiveMeasurement(), lambda s: s[0]),
+        Remapped(H(), lambda s: s[0]),
+        Remapped(ProjectiveMeasurement(), lambda s: s[0]),
+    ])
+    shots = 4000
+    counts = sample(operation, zero_state(spaces), spaces, shots, rng=np.random.default_rng(3))
+    assert_counts_match(counts, {(a, b): 0.25 for a in range(2) for b in range(2)}, shots)
+
+
+def test_many_qubits_terminal_measurement():
+    spaces = qubits(12)
+    operation = Sequential([
+        *(Remapped(H(), lambda s, i=i: s[i]) for i in range(12)),
+        Remapped(ProjectiveMeasurement(), lambda s: s),
+    ])
+    counts = sample(operation, zero_state(spaces), spaces, 100000, rng=np.random.default_rng(0))
+    assert sum(counts.values()) == 100000
+    assert all(len(key) == 1 and len(key[0]) == 12 for key in counts)
@@ -0,0 +1,57 @@
+import numpy as np
+
+from braandket import PureStateTensor
+from braandket_synthesis import Apply, H, M, MatrixOperation, Remapped, Sequential, sample
+from braandket_synthesis.kernels import collapse_state_tensor, marginal_probabilities
+from helpers import qubits, random_mixed_state, random_pure_state, random_unitary, zero_state
+
+
+def test_mid_circuit_branches_match_exact_probabilities(rng):
+    spaces = qubits(3)
+    tensor = random_pure_state(spaces, rng)
+    u = MatrixOperation(random_unitary(4, rng))
+    v = MatrixOperation(random_unitary(4, rng))
+    steps = [
+        Remapped(u, lambda s: (s[0], s[1])),
+        Remapped(M(), lambda s: s[0]),
+        Remapped(v, lambda s: (s[0], s[2])),
+        Remapped(M(), lambda s: s[2]),
+        Remapped(H(), lambda s: s[1]),
+        Remapped(M(), lambda s: s[1]),
+    ]
+    shots = 100000
+    counts = sample(Sequential(steps), tensor, spaces, shots, rng=np.random.default_rng(0))
+    assert sum(counts.values()) == shots
+
+    first = steps[0].trait(Apply).apply_on_state_tensor(tensor, spaces)
+    first_probs = marginal_probabilities(first, [spaces[0]])
+    for a in range(2):
+        branch = collapse_state_tensor(first, [spaces[0]], [a], first_probs[a])
+        branch = steps[2].trait(Apply).apply_on_state_tensor(branch, spaces)
+        branch = steps[4].trait(Apply).apply_on_state_tensor(branch, spaces)
+        probs = marginal_probabilities(branch, [spaces[2], spaces[1]])
+        probs = probs / np.sum(probs)
+        for b in range(2):
+            for c in range(2):
+                expected = first_probs[a] * probs[b, c]
+                observed = counts.get((a, b, c), 0) / shots
+                assert abs(observed - expected) <= 5 * np.sqrt(expected * (1 - expected) / shots) + 1e-9
+
+
+def test_branching_on_mixed_states(rng):
+    spaces = qubits(2)
+    tensor = random_mixed_state(spaces, rng)
+    operation = Sequential([Remapped(M(), lambda s: s[0]), Remapped(H(), lambda s: s[0]), M()])
+    counts = sample(operation, tensor, spaces, 1000, rng=np.random.default_rng(2))
+    assert sum(counts.values()) == 1000
+    for first, (second_0, _) in counts:
+        assert first in (0, 1) and second_0 in (0, 1)
+
+
+def test_deep_circuits_do_not_recurse():
+    spaces = qubits(1)
+    tensor = zero_state(spaces)
+    operation = Sequential([step for _ in range(1200) for step in (H(), M())])
+    counts = sample(operation, tensor, spaces[0], 5, rng=np.random.default_rng(0))
+    assert sum(counts.values()) == 5
+    assert all(len(key) == 1200 for key in counts)
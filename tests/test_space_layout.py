@@ -0,0 +1,59 @@
+import gc
+import weakref
+
+import pytest
+
+from braandket import KetSpace
+from braandket_synthesis import Apply, Controlled, H, M, Remapped, Sequential, X
+from braandket_synthesis.utils import SpaceLayout, iter_structure, layout_of, restore_structure
+from helpers import assert_state_close, qubits, random_pure_state
+
+
+def test_layout_flattening():
+    spaces = qubits(5)
+    structure = (spaces[0], (spaces[1], (spaces[2], spaces[3])), spaces[4])
+    layout = layout_of(structure)
+    assert layout.spaces == tuple(iter_structure(structure))
+    assert layout.dims == (2,) * 5 and layout.size == 32 and len(layout) == 5
+    assert layout.restore(range(5)) == restore_structure(range(5), structure) == (0, (1, (2, 3)), 4)
+    assert layout_of(spaces[0]).restore([7]) == 7
+    assert layout_of(spaces).restore([1, 2, 3, 4, 5]) == (1, 2, 3, 4, 5)
+    assert layout.axes(tuple(reversed(spaces))) == (4, 3, 2, 1, 0)
+    assert layout.index(spaces[2]) == 2
+    with pytest.raises(ValueError):
+        layout.axes(spaces[:2])
+
+
+def test_layouts_are_interned():
+    spaces = qubits(3)
+    structure = (spaces[0], (spaces[1], spaces[2]))
+    assert layout_of(structure) is layout_of(structure)
+    assert layout_of(layout_of(structure)) is layout_of(structure)
+
+    # structures that may change after flattening are not interned
+    structure = [spaces[0], spaces[1]]
+    assert layout_of(structure) is not layout_of(structure)
+    assert not layout_of(structure).plain
+
+
+def test_layouts_are_collected_with_their_spaces():
+    space = KetSpace(2)
+    layout = layout_of((space, space))
+    layout_ref = weakref.ref(layout)
+    space_ref = weakref.ref(space)
+    del space, layout
+    gc.collect()
+    assert space_ref() is None and layout_ref() is None
+
+
+def test_layouts_as_spaces(rng):
+    spaces = qubits(3)
+    tensor = random_pure_state(spaces, rng)
+    controlled = Controlled(X(), 1)
+    output = controlled.trait(Apply).apply_on_state_tensor(tensor, layout_of((spaces[0], spaces[1])))
+    expected = controlled.trait(Apply).apply_on_state_tensor(tensor, (spaces[0], spaces[1]))
+    assert_state_close(output, expected, spaces)
+
+    operation = Sequential([Remapped(H(), lambda s: s[0]), Remapped(M(), lambda s: s[1:])])
+    operation.trait(Apply).apply_on_state_tensor(tensor, layout_of(spaces))
+    assert isinstance(layout_of(spaces), SpaceLayout)
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from braandket_synthesis import Apply, CX, CY, CZ, DesiredMeasurement, H, IsClifford, M, MatrixOperation, Remapped, \
+    S, Sequential, T, X, Y, Z, run_stabilizer, sample_stabilizer
+from braandket_synthesis.utils import conjugation_table
+from helpers import qubits, random_unitary, state_values, zero_state
+
+
+def random_clifford(n: int, depth: int, rng) -> Sequential:
+    gates_1q = (X, Y, Z, S, H)
+    gates_2q = (CX, CY, CZ)
+    swap_like = MatrixOperation(np.kron(np.array([[1, 1], [1, -1]]) / np.sqrt(2), np.diag([1, 1j])) @
+                                np.eye(4)[[0, 2, 1, 3]])
+    steps = []
+    for _ in range(depth):
+        kind = rng.integers(3)
+        if kind == 0:
+            i = int(rng.integers(n))
+            steps.append(Remapped(gates_1q[rng.integers(len(gates_1q))](), lambda s, i=i: s[i]))
+        else:
+            i, j = (int(k) for k in rng.choice(n, 2, replace=False))
+            gate = gates_2q[rng.integers(len(gates_2q))]() if kind == 1 else swap_like
+            steps.append(Remapped(gate, lambda s, i=i, j=j: (s[i], s[j])))
+    return Sequential(steps)
+
+
+def dense_probabilities(operation, spaces) -> np.ndarray:
+    output = operation.trait(Apply).apply_on_state_tensor(zero_state(spaces), spaces)
+    return np.abs(state_values(output, spaces)) ** 2
+
+
+def test_conjugation_table_rejects_non_clifford(rng):
+    assert conjugation_table(np.eye(64)[np.arange(64) ^ ((np.arange(64) >> 5) & 1)]) is not None
+    assert conjugation_table(np.diag([1, np.exp(1j * np.pi / 4)])) is None
+    assert conjugation_table(random_unitary(4, rng)) is None
+    assert not T().trait(IsClifford).is_clifford()
+    assert Sequential([H(), S()]).trait(IsClifford).is_clifford()
+
+
+@pytest.mark.parametrize('trial', range(5))
+def test_desired_probabilities_match_dense(trial):
+    spaces = qubits(4)
+    operation = random_clifford(4, 25, np.random.default_rng(trial))
+    probs = np.reshape(dense_probabilities(operation, spaces), (-1,))
+    for index in range(16):
+        values = tuple((index >> (3 - q)) & 1 for q in range(4))
+        _, results = run_stabilizer(Sequential([operation, DesiredMeasurement(values)]), spaces)
+        assert np.isclose(results[-1].probability, probs[index]), (index, results[-1].probability, probs[index])
+
+
+@pytest.mark.parametrize('trial', range(5))
+def test_sampled_counts_match_dense(trial):
+    spaces = qubits(4)
+    operation = random_clifford(4, 25, np.random.default_rng(100 + trial))
+    # the extra H layer makes the outcomes sensitive to the signs of the stabilizers
+    operation = Sequential([operation, *(Remapped(H(), lambda s, i=i: s[i]) for i in range(4))])
+    probs = dense_probabilities(operation, spaces)
+    shots = 4000
+    counts = sample_stabilizer(Sequential([operation, M()]), spaces, shots, rng=np.random.default_rng(trial))
+    assert sum(counts.values()) == shots
+    for (values,), count in counts.items():
+        assert probs[values] > 1e-9
+        assert abs(count / shots - probs[values]) < 5 * np.sqrt(probs[values] / shots) + 1e-9
+
+
+def test_mid_circuit_measurements_are_correlated():
+    spaces = qubits(3)
+    operation = Sequential([
+        Remapped(H(), lambda s: s[0]),
+        Remapped(CX(), lambda s: (s[0], s[1])),
+        Remapped(M(), lambda s: s[0]),
+        Remapped(CX(), lambda s: (s[1], s[2])),
+        Remapped(M(), lambda s: (s[1], s[2])),
+    ])
+    counts = sample_stabilizer(operation, spaces, 1000, rng=np.random.default_rng(0))
+    assert set(counts) <= {(0, (0, 0)), (1, (1, 1))}
+    assert abs(counts.get((0, (0, 0)), 0) - 500) < 100
+
+
+def test_impossible_desired_outcome():
+    spaces = qubits(2)
+    bell = [Remapped(H(), lambda s: s[0]), Remapped(CX(), lambda s: (s[0], s[1]))]
+    tableau, results = run_stabilizer(Sequential([*bell, DesiredMeasurement((0, 1))]), spaces)
+    assert results[-1].probability == 0.0
+    expected, _ = run_stabilizer(Sequential(bell), spaces)
+    assert np.array_equal(tableau.x, expected.x) and np.array_equal(tableau.z, expected.z)
+    assert np.array_equal(tableau.r, expected.r)
+
+    with pytest.raises(ValueError):
+        sample_stabilizer(Sequential([Remapped(X(), lambda s: s[0]), Remapped(DesiredMeasurement(0), lambda s: s[0])]),
+            spaces, 10)
+
+
+def test_many_qubits():
+    n = 300
+    spaces = qubits(n)
+    operation = Sequential([
+        Remapped(H(), lambda s: s[0]),
+        *(Remapped(CX(), lambda s, i=i: (s[i], s[i + 1])) for i in range(n - 1)),
+        Remapped(M(), lambda s: s),
+    ])
+    counts = sample_stabilizer(operation, spaces, 50, rng=np.random.default_rng(0))
+    assert set(counts) <= {((0,) * n,), ((1,) * n,)}
+    assert sum(counts.values()) == 50
@@ -0,0 +1,122 @@
+import gc
+
+import numpy as np
+
+from braandket_synthesis import CX, Controlled, H, KrausOperation, MatrixOperation, Remapped, Sequential, ToKraus, \
+    ToTensor, X, caching_operators, fuse, intern_operation, operators_cache
+from helpers import qubits, random_unitary
+
+OFFSET = 1
+
+
+def make_circuit():
+    return Sequential(
+        [Remapped(H(), lambda s, i=i: s[i]) for i in range(4)] +
+        [Remapped(CX(), lambda s: (s[0], s[1]))])
+
+
+def test_identity_equality():
+    a, b = make_circuit(), make_circuit()
+    assert a != b and a == a
+    assert X() not in [X()] and len({X(), X()}) == 2
+    assert a.structural_key() is not None and a.structural_key() == b.structural_key()
+    assert Sequential(make_circuit().steps[:3]).structural_key() != a.structural_key()
+    assert H(name='a').structural_key() == H(name='b').structural_key()
+    assert Controlled(X()).structural_key() != Controlled(H()).structural_key()
+
+
+def test_matrix_is_copied():
+    matrix = np.eye(2)
+    operation = MatrixOperation(matrix)
+    matrix[0, 0] = -1
+    np.testing.assert_array_equal(operation.matrix, np.eye(2))
+    assert not operation.matrix.flags.writeable
+    assert operation.structural_key() == MatrixOperation(np.eye(2)).structural_key()
+    assert operation.structural_key() != MatrixOperation(matrix).structural_key()
+    assert MatrixOperation(np.eye(2)).structural_key() != MatrixOperation(np.eye(2, dtype=complex)).structural_key()
+
+
+def test_mapping_keys():
+    def key(mapping):
+        return Remapped(H(), mapping).structural_key()
+
+    index = 1
+    mapping = lambda s: s[index]
+    assert key(mapping) is not None and key(mapping) == key(mapping)
+    # the same code with equal closure values (e.g. lambdas built in a loop)
+    same = [lambda s: s[index] for _ in range(2)]
+    assert key(same[0]) == key(same[1])
+    others = [lambda s, i=i: s[i] for i in range(2)]
+    assert key(others[0]) != key(others[1])
+
+    # the global names may be rebound, so such mappings are compared by identity
+    reading = [lambda s: s[OFFSET] for _ in range(2)]
+    assert key(reading[0]) != key(reading[1]) and key(reading[0]) == key(reading[0])
+
+    # mutable closure values
+    indices = [1]
+    mutable = [lambda s: s[indices[0]] for _ in range(2)]
+    assert key(mutable[0]) != key(mutable[1])
+
+    def make(value):
+        array = np.array([value])
+        return lambda s: s[int(array[0])]
+    assert key(make(0)) != key(make(0))
+
+
+def test_operators_cache():
+    spaces = qubits(4)
+    operators_cache.clear()
+    operators_cache.reset_stats()
+
+    # off by default
+    H().trait(ToTensor).to_tensor(spaces[0])
+    assert len(operators_cache) == 0
+
+    with caching_operators():
+        a, b = make_circuit(), make_circuit()
+        tensor_a = a.trait(ToTensor).to_tensor(spaces)
+        tensor_b = b.trait(ToTensor).to_tensor(spaces)
+        assert operators_cache.hits >= 1
+        np.testing.assert_allclose(tensor_a.values(), tensor_b.values())
+
+        # on other spaces, another entry
+        assert a.trait(ToTensor).to_tensor(qubits(4)) is not tensor_a
+
+        # structurally equal, kept while the spaces live
+        unitary = random_unitary(4, np.random.default_rng(0))
+        pair = qubits(2)
+        MatrixOperation(unitary.copy()).trait(ToTensor).to_tensor(pair)
+        operators_cache.reset_stats()
+        MatrixOperation(unitary.copy()).trait(ToTensor).to_tensor(pair)
+        assert operators_cache.hits == 1
+        gc.collect()
+        entries = len(operators_cache)
+        other = qubits(2)
+        MatrixOperation(unitary.copy()).trait(ToTensor).to_tensor(other)
+        assert len(operators_cache) == entries + 1
+        del other
+        gc.collect()
+        assert len(operators_cache) == entries
+
+        kraus = KrausOperation((np.eye(2) * 0.6, np.eye(2) * 0.8))
+        kraus.trait(ToKraus).to_kraus(spaces[0])
+        output = kraus.trait(ToKraus).to_kraus(spaces[0])
+        assert isinstance(output, tuple) and len(output) == 2
+
+        # lists of spaces are not cached
+        MatrixOperation(unitary).trait(ToTensor).to_tensor(list(pair))
+
+        fused_a, _ = fuse(make_circuit(), spaces)
+        fused_b, _ = fuse(make_circuit(), spaces)
+        assert fused_a.structural_key() is not None and fused_a.structural_key() == fused_b.structural_key()
+
+    operators_cache.clear()
+
+
+def test_intern_operation():
+    a = intern_operation(make_circuit())
+    assert intern_operation(make_circuit()) is a
+    assert intern_operation(Sequential(make_circuit().steps, name='other')) is not a
+    mapping = Remapped(H(), lambda s: s[OFFSET])
+    assert intern_operation(mapping) is mapping
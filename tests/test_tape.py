@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from braandket import NumSpace
+from braandket_synthesis import Apply, CX, CZ, Controlled, D, H, KrausOperation, M, MatrixOperation, Measure, \
+    Remapped, Rx, Ry, Rz, Sequential, X, compile_tape
+from braandket_synthesis.utils import rng_context
+from helpers import assert_state_close, qubits, random_mixed_state, random_pure_state, random_unitary
+
+
+def circuit(rng) -> Sequential:
+    unitary = MatrixOperation(random_unitary(4, rng))
+    return Sequential([
+        Remapped(H(), lambda s: s[0]),
+        Remapped(CX(), lambda s: (s[0], s[1])),
+        Remapped(Rx(0.3), lambda s: s[2]),
+        Remapped(Rz(0.7), lambda s: s[3]),
+        Remapped(Controlled(Controlled(unitary, keys=0), keys=1), lambda s: (s[4], (s[0], (s[1], s[3])))),
+        Remapped(Controlled(Sequential([Remapped(X(), lambda s: s[0]), Remapped(unitary, lambda s: s)]), keys=(1, 0)),
+            lambda s: ((s[2], s[4]), (s[0], s[1]))),
+        Remapped(Controlled(Rz(0.5)), lambda s: (s[1], s[3])),
+        Remapped(CZ(), lambda s: (s[4], s[2])),
+    ])
+
+
+@pytest.mark.parametrize('mixed', [False, True])
+def test_tape_matches_apply(rng, mixed):
+    spaces = qubits(5)
+    operation = circuit(rng)
+    tensor = random_mixed_state(spaces, rng) if mixed else random_pure_state(spaces, rng)
+    tape = compile_tape(operation, spaces)
+    output, _ = tape.run(tensor)
+    assert_state_close(output, operation.trait(Apply).apply_on_state_tensor(tensor, spaces), spaces)
+
+
+def test_tape_carries_other_spaces(rng):
+    spaces = qubits(6)
+    operation = circuit(rng)
+    tensor = random_pure_state(spaces, rng)
+    output, _ = compile_tape(operation, spaces[:5]).run(tensor)
+    assert_state_close(output, operation.trait(Apply).apply_on_state_tensor(tensor, spaces[:5]), spaces)
+
+
+def test_tape_is_reusable(rng):
+    spaces = qubits(5)
+    tape = compile_tape(circuit(rng), spaces)
+    tensor = random_pure_state(spaces, rng)
+    first, _ = tape.run(tensor)
+    second, _ = tape.run(tensor)
+    assert_state_close(first, second, spaces)
+
+
+def test_tape_with_generic_steps_and_measurements(rng):
+    spaces = qubits(5)
+    damping = KrausOperation([np.array([[1, 0], [0, np.sqrt(0.7)]]), np.array([[0, np.sqrt(0.3)], [0, 0]])])
+    operation = Sequential([
+        circuit(rng),
+        Remapped(damping, lambda s: s[1]),
+        Remapped(Ry(np.linspace(0, 1, 3)), lambda s: s[2]),
+        Remapped(M(), lambda s: (s[0], s[1])),
+        Remapped(D(1), lambda s: s[4]),
+    ])
+    tensor = random_pure_state(spaces, rng)
+    with rng_context(np.random.default_rng(5)):
+        expected, expected_results = operation.trait(Measure).measure_on_state_tensor(tensor, spaces)
+    with rng_context(np.random.default_rng(5)):
+        output, results = compile_tape(operation, spaces).run(tensor)
+
+    num_spaces = [space for space in expected.spaces if isinstance(space, NumSpace)]
+    bra_spaces = [space.ct for space in spaces]
+    np.testing.assert_allclose(
+        output.values(*num_spaces, *spaces, *bra_spaces),
+        expected.values(*num_spaces, *spaces, *bra_spaces), atol=1e-9)
+    assert len(results) == 2
+    for result, expected_result in zip(results, expected_results[-2:]):
+        np.testing.assert_array_equal(result.value, expected_result.value)
+        np.testing.assert_allclose(result.probability, expected_result.probability, atol=1e-9)
@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+import pytest
+
+from braandket_synthesis import Apply, Controlled, H, M, MatrixOperation, Remapped, S, Sequential, ToTensor, \
+    Tracer, X
+from helpers import qubits, random_mixed_state, random_pure_state, random_unitary
+
+
+def make_circuit(rng):
+    return Sequential([
+        Remapped(H(name='h0'), lambda s: s[0]),
+        Remapped(Controlled(Sequential([X(), S()]), 1), lambda s: (s[0], s[1])),
+        Remapped(MatrixOperation(random_unitary(4, rng), name='U'), lambda s: (s[2], s[3])),
+        Remapped(M(), lambda s: s[:3]),
+    ])
+
+
+def test_nodes_and_reports(rng):
+    spaces = qubits(6)
+    circuit = make_circuit(rng)
+    tensor = random_pure_state(spaces, rng)
+    with Tracer() as tracer:
+        circuit.trait(Apply).apply_on_state_tensor(tensor, spaces)
+        Sequential(circuit.steps[:3]).trait(ToTensor).to_tensor(spaces[:4])
+
+    assert len(tracer.roots) == 2
+    root = tracer.roots[0]
+    assert root.method == 'apply_on_state_tensor' and root.kind == 'pure' and root.size == 2 ** 6
+    assert [child.label for child in root.children] == ['Remapped'] * 4
+    labels = [node.label for node in root.iter_nodes()]
+    assert 'h0' in labels and 'U' in labels and 'ProjectiveMeasurement' in labels
+    matrix_node = next(node for node in root.iter_nodes() if node.label == 'U')
+    assert matrix_node.flops == 8 * 2 ** 6 * 4
+    assert matrix_node.bytes == 2 ** 6 * 16
+    assert root.time >= sum(child.time for child in root.children)
+    assert tracer.roots[1].method == 'to_tensor' and tracer.roots[1].kind is None
+
+    folded = tracer.folded('flops')
+    assert f"Sequential;Remapped;U {8 * 2 ** 6 * 4}\n" in folded
+    for line in tracer.folded().splitlines():
+        stack, weight = line.rsplit(' ', 1)
+        assert stack.split(';')[0] == 'Sequential' and int(weight) > 0
+    totals = tracer.totals()
+    assert totals['U']['calls'] == 2 and totals['U']['flops'] == 8 * 2 ** 6 * 4
+    with pytest.raises(ValueError):
+        tracer.folded('unknown')
+
+
+def test_mixed_states(rng):
+    spaces = qubits(3)
+    tensor = random_mixed_state(spaces, rng)
+    operation = MatrixOperation(random_unitary(2, rng), name='U')
+    with Tracer() as tracer:
+        operation.trait(Apply).apply_on_state_tensor(tensor, spaces[0])
+    node, = tracer.roots
+    assert node.kind == 'mixed' and node.size == 4 ** 3 and node.flops == 2 * 8 * 4 ** 3 * 2
+
+
+def test_nothing_recorded_outside(rng):
+    spaces = qubits(4)
+    tensor = random_pure_state(spaces, rng)
+    circuit = make_circuit(rng)
+    circuit.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    with Tracer() as tracer:
+        circuit.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    nodes = len(list(tracer.iter_nodes()))
+    circuit.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    assert len(list(tracer.iter_nodes())) == nodes
+
+    with Tracer():
+        with pytest.raises(RuntimeError):
+            Tracer().__enter__()
+
+
+def test_threads_are_isolated(rng):
+    spaces = qubits(4)
+    tensor = random_pure_state(spaces, rng)
+    circuit = make_circuit(rng)
+    entered, done = threading.Event(), threading.Event()
+    counts = {}
+
+    def trace():
+        with Tracer() as tracer:
+            entered.set()
+            done.wait(10)
+            circuit.trait(Apply).apply_on_state_tensor(tensor, spaces)
+        counts['traced'] = len(tracer.roots)
+
+    thread = threading.Thread(target=trace)
+    thread.start()
+    entered.wait(10)
+    with Tracer() as tracer:
+        for _ in range(3):
+            circuit.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    done.set()
+    thread.join()
+    assert len(tracer.roots) == 3 and counts['traced'] == 1
+    np.testing.assert_equal(len(list(tracer.iter_nodes())) % 3, 0)
@@ -0,0 +1,92 @@
+import gc
+
+import numpy as np
+import pytest
+
+from braandket_synthesis import Apply, CX, H, IsDiagonal, Remapped, Sequential, X
+from braandket_synthesis.basics import TraitCache, cache_usage, iter_operation_tree
+from braandket_synthesis.basics.trait_cache import NoValue
+from helpers import qubits, random_pure_state
+
+
+class Parent:
+    pass
+
+
+class Child(Parent):
+    pass
+
+
+class Payload:
+    pass
+
+
+def test_lookup_along_the_mro():
+    operation = H()
+    operation.set_cache(Parent, 'key', 1)
+    assert operation.get_cache(Child, 'key') == 1
+    operation.set_cache(Child, 'key', 2)
+    assert operation.get_cache(Child, 'key') == 2 and operation.get_cache(Parent, 'key') == 1
+    assert operation.get_cache(Payload, 'key', None) is None
+    with pytest.raises(KeyError):
+        operation.get_cache(Child, 'missing')
+
+
+def test_eviction():
+    cache = TraitCache(max_bytes=1000)
+    for i in range(10):
+        cache.set(Parent, i, np.zeros(50))  # 400 bytes each
+        assert cache.bytes <= 1000
+    assert [key for _, key, _, _ in cache.iter_entries()] == [8, 9]
+    assert cache.evictions == 8
+
+    # the least recently used entry is evicted first
+    cache.get(Parent, 8)
+    cache.set(Parent, 10, np.zeros(50))
+    assert [key for _, key, _, _ in cache.iter_entries()] == [8, 10]
+
+    # the most recent entry is kept even if it alone exceeds the bound
+    cache.set(Parent, 'large', np.zeros(1000))
+    assert len(cache) == 1 and cache.get(Parent, 'large') is not None
+
+    cache.max_bytes = 0
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_weak_entries():
+    cache = TraitCache()
+    value = Payload()
+    cache.set(Parent, 'weak', value, weak=True)
+    assert cache.get(Child, 'weak') is value and cache.bytes == 0
+    del value
+    gc.collect()
+    assert cache.get(Parent, 'weak') is NoValue and len(cache) == 0
+
+    # values without weak references are kept strongly
+    cache.set(Parent, 'tuple', (1, 2), weak=True)
+    assert cache.get(Parent, 'tuple') == (1, 2)
+
+
+def test_trait_get_or_set_cache():
+    trait = X().trait(IsDiagonal)
+    calls = []
+    for _ in range(3):
+        assert trait.get_or_set_cache('probe', lambda: calls.append(1) or 'value') == 'value'
+    assert len(calls) == 1
+    assert trait.operation.cache.hits >= 2
+
+
+def test_usage_over_the_tree(rng):
+    circuit = Sequential([Remapped(H(), lambda s: s[0]), Remapped(CX(), lambda s: (s[0], s[1]))])
+    spaces = qubits(2)
+    circuit.trait(Apply).apply_on_state_tensor(random_pure_state(spaces, rng), spaces)
+    operations = list(iter_operation_tree(circuit))
+    assert len(operations) == 6  # CX holds an X
+
+    usage = cache_usage(circuit)
+    assert usage['operations'] == 6
+    assert usage['entries'] == sum(len(operation.cache) for operation in operations) > 0
+    circuit.clear_cache(recursive=True)
+    assert cache_usage(circuit)['entries'] == 0
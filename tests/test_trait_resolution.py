@@ -0,0 +1,45 @@
+from braandket_synthesis import Apply, H, IsUnitary, MatrixOperation, QOperation, Sequential, ToTensor, X, \
+    find_trait_cls, trait_registry
+from braandket_synthesis.operations.numeric.matrix import MatrixOperationToTensor
+
+
+def test_resolved_trait_is_memoized():
+    trait_registry.clear()
+    assert find_trait_cls(X, ToTensor) is MatrixOperationToTensor
+    misses = trait_registry.misses
+    for _ in range(10):
+        assert X().trait(ToTensor).operation is not None
+    assert trait_registry.misses == misses
+    assert trait_registry.hits >= 10
+
+
+def test_missing_trait_is_memoized_as_none():
+    class Opaque(QOperation):
+        pass
+
+    assert Opaque().trait(ToTensor, required=False) is None
+    assert Opaque().trait(ToTensor, required=False) is None
+    assert (Opaque, ToTensor) in trait_registry._resolved
+
+
+def test_trait_defined_later_invalidates_the_registry():
+    class Custom(MatrixOperation):
+        pass
+
+    matrix_apply_cls = find_trait_cls(MatrixOperation, Apply)
+    assert type(Custom([[1]]).trait(Apply)) is matrix_apply_cls
+
+    class CustomApply(Apply[Custom]):
+        def apply_on_state_tensor(self, tensor, spaces):
+            return 'custom'
+
+    assert Custom([[1]]).trait(Apply).apply_on_state_tensor(None, ()) == 'custom'
+    assert type(H().trait(Apply)) is matrix_apply_cls
+
+
+def test_resolution_matches_unmemoized():
+    for op_cls in (X, H, MatrixOperation, Sequential):
+        for trait_cls in (Apply, ToTensor, IsUnitary):
+            trait_registry.invalidate()
+            cold = find_trait_cls(op_cls, trait_cls)
+            assert find_trait_cls(op_cls, trait_cls) is cold
@@ -0,0 +1,90 @@
+import numpy as np
+
+from braandket import MixedStateTensor, PureStateTensor
+from braandket_synthesis import Apply, KrausOperation, MatrixOperation, ProjectiveMeasurement, Remapped, Sequential, \
+    run_trajectories, sampling_kraus
+from braandket_synthesis.kernels import marginal_probabilities
+from braandket_synthesis.utils import get_rng, rng_context, set_default_rng
+from helpers import qubits, random_pure_state, random_unitary, state_values
+
+amplitude_damping = KrausOperation([np.array([[1, 0], [0, np.sqrt(0.7)]]), np.array([[0, np.sqrt(0.3)], [0, 0]])])
+depolarizing = KrausOperation([
+    np.sqrt(0.8) * np.eye(2),
+    np.sqrt(0.2 / 3) * np.array([[0, 1], [1, 0]]),
+    np.sqrt(0.2 / 3) * np.array([[0, -1j], [1j, 0]]),
+    np.sqrt(0.2 / 3) * np.diag([1, -1]),
+])
+
+
+def noisy_circuit(rng):
+    unitary = MatrixOperation(random_unitary(4, rng))
+    return Sequential([
+        Remapped(unitary, lambda s: (s[0], s[1])),
+        Remapped(amplitude_damping, lambda s: s[0]),
+        Remapped(depolarizing, lambda s: s[1]),
+        Remapped(unitary, lambda s: (s[1], s[2])),
+        Remapped(amplitude_damping, lambda s: s[2]),
+    ])
+
+
+def test_expectations_match_density_matrix(rng):
+    spaces = qubits(3)
+    tensor = random_pure_state(spaces, rng)
+    operation = noisy_circuit(rng)
+    rho = operation.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    assert isinstance(rho, MixedStateTensor)
+
+    z = MatrixOperation(np.diag([1.0, -1.0]))
+    result = run_trajectories(operation, tensor, spaces, 1000,
+        observables=[(z, space) for space in spaces], rng=np.random.default_rng(3))
+    exact = [np.dot(marginal_probabilities(rho, [space]), [1, -1]) for space in spaces]
+    assert np.all(np.abs(result.expectations - exact) <= 5 * result.standard_errors + 1e-9)
+
+
+def test_counts_match_density_matrix(rng):
+    spaces = qubits(3)
+    tensor = random_pure_state(spaces, rng)
+    operation = noisy_circuit(rng)
+    rho = operation.trait(Apply).apply_on_state_tensor(tensor, spaces)
+    probs = marginal_probabilities(rho, (spaces[0], spaces[2]))
+
+    measured = Sequential([operation, Remapped(ProjectiveMeasurement(), lambda s: (s[0], s[2]))])
+    result = run_trajectories(measured, tensor, spaces, 1500, rng=np.random.default_rng(4))
+    assert result.trajectories == 1500 and sum(result.counts.values()) == 1500
+    for (value,), count in result.counts.items():
+        assert abs(count / 1500 - probs[value]) < 0.06
+
+
+def test_trajectories_are_reproducible(rng):
+    spaces = qubits(3)
+    tensor = random_pure_state(spaces, rng)
+    measured = Sequential([noisy_circuit(rng), Remapped(ProjectiveMeasurement(), lambda s: s)])
+    first = run_trajectories(measured, tensor, spaces, 50, rng=np.random.default_rng(7))
+    second = run_trajectories(measured, tensor, spaces, 50, rng=np.random.default_rng(7))
+    assert first.counts == second.counts
+
+
+def test_sampled_kraus_branch_averages_to_the_channel(rng):
+    spaces = qubits(1)
+    tensor = random_pure_state(spaces, rng)
+    expected = amplitude_damping.trait(Apply).apply_on_state_tensor(tensor, spaces[0])
+    average = 0
+    with sampling_kraus(), rng_context(np.random.default_rng(5)):
+        for _ in range(4000):
+            branch = amplitude_damping.trait(Apply).apply_on_state_tensor(tensor, spaces[0])
+            assert isinstance(branch, PureStateTensor)
+            values = state_values(branch, spaces)
+            average = average + np.outer(values, np.conj(values))
+    np.testing.assert_allclose(average / 4000, state_values(expected, spaces), atol=0.03)
+
+
+def test_default_rng_is_replaceable():
+    generator = np.random.default_rng(0)
+    previous = set_default_rng(generator)
+    try:
+        assert get_rng() is generator
+        with rng_context(np.random.default_rng(1)) as inner:
+            assert get_rng() is inner
+        assert get_rng() is generator
+    finally:
+        set_default_rng(previous)